@@ -0,0 +1,165 @@
+"""
+Benchmark of the diarization runtimes.
+
+Diarizes the same sample of a recording with pyannote on torch and with
+the segmentation model exported to ONNX (float32 and int8) on onnxruntime,
+and compares time taken and the turns produced against the torch run. The
+SpeechBrain speaker embedding runs on torch in every case.
+
+Usage:
+    HF_TOKEN=... python benchmark_diarization_runtime.py --audio meeting.opus --seconds 600
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from cache import DEFAULT_CACHE_DIR
+from common import PCM_SUFFIX, SAMPLE_RATE, _decode_audio_cached, _format_timestamp, _load_pcm
+from diarization import DIARIZATION_RUNTIMES, _run_diarization
+from transcribe import _peak_rss_mb, _real_time_factor
+
+
+# Frame length for comparing two diarizations (seconds)
+FRAME = 0.01
+
+
+# =========================
+# COMPARISON
+# =========================
+
+def _frame_labels(turns, n_frames):
+    """
+    Rasterize turns into one label index per frame (-1 for silence).
+
+    Where turns overlap, the later one wins; that is good enough to compare
+    two runs on the same audio.
+
+    Returns:
+        tuple: (frames, labels) - int array and the label of each index
+    """
+    labels = sorted({label for _, _, label in turns})
+    index = {label: i for i, label in enumerate(labels)}
+    frames = np.full(n_frames, -1, dtype=np.int64)
+    for start, end, label in turns:
+        frames[int(start / FRAME):int(end / FRAME)] = index[label]
+    return frames, labels
+
+
+def _agreement(reference, turns, duration):
+    """
+    Share of the reference's speech labelled the same by another run.
+
+    Speaker labels of the two runs are arbitrary, so they are paired first,
+    most shared time first.
+
+    Returns:
+        float: Agreeing speech frames / reference speech frames
+    """
+    n_frames = int(duration / FRAME) + 1
+    ref_frames, ref_labels = _frame_labels(reference, n_frames)
+    frames, labels = _frame_labels(turns, n_frames)
+    speech = ref_frames >= 0
+    if not speech.any():
+        return 1.0
+
+    both = speech & (frames >= 0)
+    shared = np.zeros((len(ref_labels), max(1, len(labels))), dtype=np.int64)
+    np.add.at(shared, (ref_frames[both], frames[both]), 1)
+
+    agreed = 0
+    used_ref, used = set(), set()
+    for flat in np.argsort(shared, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, shared.shape)
+        if shared[i, j] == 0:
+            break
+        if i in used_ref or j in used:
+            continue
+        agreed += shared[i, j]
+        used_ref.add(i)
+        used.add(j)
+    return agreed / speech.sum()
+
+
+def _benchmark_runtime(pcm_path, hf_token, num_threads, runtime, cache_dir):
+    """
+    Diarize the sample with one runtime (runs in a fresh process).
+
+    The first run of an ONNX runtime exports the model, which is counted
+    in its load time; run the benchmark twice to see the steady state.
+
+    Returns:
+        tuple: (turns, load_seconds, run_span, peak_rss_mb)
+    """
+    turns, timings = _run_diarization(None, hf_token, num_threads, pcm_path=pcm_path, runtime=runtime,
+                                      cache_dir=cache_dir)
+    start, end = timings["diarization_load"]
+    return turns, end - start, timings["diarization_run"], _peak_rss_mb()
+
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark diarization runtimes")
+    parser.add_argument("--audio", "-i", type=Path, required=True, help="Recording to take the sample from")
+    parser.add_argument("--seconds", type=int, default=600, help="Sample length in seconds (default: 600)")
+    parser.add_argument("--offset", type=int, default=0, help="Sample start in seconds (default: 0)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Torch / onnxruntime intra-op threads (default: library default)")
+    parser.add_argument("--runtimes", nargs="+", default=DIARIZATION_RUNTIMES, choices=DIARIZATION_RUNTIMES,
+                        help="Runtimes to compare, the first is the reference (default: all)")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for decoded audio and exported models (default: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    hf_token = os.environ.get("HF_TOKEN")
+    if not hf_token:
+        parser.error("HF_TOKEN environment variable is required")
+
+    work_dir = args.cache_dir / "benchmark"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    samples = _load_pcm(_decode_audio_cached(args.audio, work_dir))
+    lo = min(len(samples), args.offset * SAMPLE_RATE)
+    hi = min(len(samples), lo + args.seconds * SAMPLE_RATE)
+    sample_path = work_dir / f"{args.audio.stem}.sample{PCM_SUFFIX}"
+    np.asarray(samples[lo:hi]).tofile(sample_path)
+    duration = (hi - lo) / SAMPLE_RATE
+    print(f"▶ {duration:.0f}s sample at {_format_timestamp(lo / SAMPLE_RATE)}, {args.threads or 'default'} threads")
+
+    # A fresh process per runtime keeps thread pools and peak RSS apart
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for runtime in args.runtimes:
+        print(f"▶ Runtime: {runtime}")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[runtime] = pool.submit(_benchmark_runtime, str(sample_path), hf_token, args.threads,
+                                               runtime, str(args.cache_dir)).result()
+        except Exception as e:
+            print(f"  ⚠️  {runtime} failed: {e}", file=sys.stderr)
+    sample_path.unlink(missing_ok=True)
+    if not results:
+        sys.exit(1)
+
+    reference_runtime = next(iter(results))
+    reference = results[reference_runtime][0]
+    print(f"  {'Runtime':<10} {'Load s':>8} {'Run s':>8} {'RTF':>7} {'RSS MB':>8} {'Turns':>6} {'Spk':>4} "
+          f"{'Agree':>7}")
+    for runtime, (turns, load_seconds, run_span, rss) in results.items():
+        speakers = len({label for _, _, label in turns})
+        agreement = _agreement(reference, turns, duration)
+        print(f"  {runtime:<10} {load_seconds:8.1f} {run_span[1] - run_span[0]:8.1f} "
+              f"{_real_time_factor(run_span, duration):7.3f} {rss:8.0f} {len(turns):6d} {speakers:4d} "
+              f"{100 * agreement:6.1f}%")
+    print(f"  Agreement: share of {reference_runtime} speech time with the same (paired) speaker")
+
+
+if __name__ == "__main__":
+    main()
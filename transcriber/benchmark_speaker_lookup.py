@@ -0,0 +1,98 @@
+"""
+Micro-benchmark for speaker lookup.
+
+Compares the original linear scan over diarization turns with the
+interval index and the overlap sweep join used by transcribe.py on a
+synthetic meeting.
+
+Usage:
+    python benchmark_speaker_lookup.py --segments 10000 --turns 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from common import _assign_speakers_overlap, _build_turn_index, _find_speakers
+
+
+# =========================
+# SYNTHETIC DATA
+# =========================
+
+def _synthetic_turns(n_turns, duration, n_speakers=12, seed=0):
+    """
+    Generate random diarization turns with gaps and occasional overlaps.
+
+    Args:
+        n_turns: Number of turns
+        duration: Recording length in seconds
+        n_speakers: Number of distinct speakers
+        seed: Random seed
+
+    Returns:
+        list: Turns as (start, end, label) tuples sorted by start
+    """
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.uniform(0, duration, n_turns))
+    lengths = rng.uniform(0.5, 2.5 * duration / n_turns, n_turns)
+    speakers = rng.integers(0, n_speakers, n_turns)
+    return [
+        (float(s), float(s + l), f"SPEAKER_{k:02d}")
+        for s, l, k in zip(starts, lengths, speakers)
+    ]
+
+
+def _linear_find_speaker(start_time, turns):
+    """Original O(m) lookup, kept here as the baseline."""
+    for start, end, label in turns:
+        if start <= start_time <= end:
+            return label
+    return "UNKNOWN"
+
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speaker lookup")
+    parser.add_argument("--segments", type=int, default=10000, help="Number of Whisper segments (default: 10000)")
+    parser.add_argument("--turns", type=int, default=10000, help="Number of diarization turns (default: 10000)")
+    parser.add_argument("--duration", type=float, default=4 * 3600, help="Recording length in seconds (default: 14400)")
+    parser.add_argument("--skip-linear", action="store_true", help="Skip the slow linear baseline")
+    args = parser.parse_args()
+
+    turns = _synthetic_turns(args.turns, args.duration)
+    seg_starts = np.sort(np.random.default_rng(1).uniform(0, args.duration, args.segments)).tolist()
+    seg_spans = [(s, s + 4.0) for s in seg_starts]
+
+    print(f"▶ {args.segments} segments × {args.turns} turns")
+
+    t0 = time.perf_counter()
+    index = _build_turn_index(turns)
+    t1 = time.perf_counter()
+    indexed = _find_speakers(seg_starts, index)
+    t2 = time.perf_counter()
+    overlap, _ = _assign_speakers_overlap(seg_spans, index)
+    t3 = time.perf_counter()
+    print(f"  Index build:    {(t1 - t0) * 1000:8.1f} ms")
+    print(f"  Indexed lookup: {(t2 - t1) * 1000:8.1f} ms")
+    print(f"  Overlap join:   {(t3 - t2) * 1000:8.1f} ms")
+    print(f"  Labels changed by overlap join: {sum(a != b for a, b in zip(indexed, overlap))}")
+
+    if args.skip_linear:
+        return
+
+    t0 = time.perf_counter()
+    linear = [_linear_find_speaker(t, turns) for t in seg_starts]
+    t1 = time.perf_counter()
+    print(f"  Linear lookup:  {(t1 - t0) * 1000:8.1f} ms")
+
+    mismatches = sum(a != b for a, b in zip(indexed, linear))
+    print(f"  Mismatches:     {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Result cache shared by all transcriber runs on this host.
+
+Stage results (transcription, diarization, speaker embeddings) are stored
+as gzipped JSONL entries keyed by their inputs; entries and decoded audio
+are evicted least recently used first.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Result cache shared by all runs on this host
+DEFAULT_CACHE_DIR = Path(os.environ.get("TRANSCRIBER_CACHE_DIR",
+                                        Path.home() / ".cache" / "zastupitelstvo-transcriber"))
+DEFAULT_CACHE_SIZE_GB = 2.0  # Least recently used entries are evicted above this
+AUDIO_CACHE_DIR = "audio"    # Decoded PCM inside the cache, evicted with the results
+
+
+# =========================
+# RESULT CACHE
+# =========================
+
+# Decoded audio files of running transcribe_audio() calls, never evicted
+_audio_in_use = set()
+
+
+def _cache_key(params):
+    """
+    Content-address a stage result by its inputs.
+
+    Args:
+        params: JSON-serializable dict with the audio hash and every option
+            that changes the result
+
+    Returns:
+        str: Hex digest used as cache entry name
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _cache_entry(cache_dir, kind, key):
+    """Return path of a cache entry ("asr", "diarization" or "speakers")."""
+    return cache_dir / kind / f"{key}.jsonl.gz"
+
+
+def _cache_get(cache_dir, kind, key):
+    """
+    Read a cache entry and mark it as recently used.
+
+    Entries are gzipped JSONL: a header line followed by one line per item.
+
+    Args:
+        cache_dir: Cache root directory
+        kind: Entry kind ("asr", "diarization" or "speakers")
+        key: Key from _cache_key()
+
+    Returns:
+        tuple: (header, items) or None on a miss
+    """
+    path = _cache_entry(cache_dir, kind, key)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            items = [json.loads(line) for line in f]
+    except (OSError, ValueError):
+        return None
+
+    # mtime doubles as last-use time for LRU eviction
+    os.utime(path)
+    return header, items
+
+
+def _cache_put(cache_dir, kind, key, header, items, max_bytes):
+    """
+    Store a cache entry and evict least recently used entries over budget.
+
+    Args:
+        cache_dir: Cache root directory
+        kind: Entry kind ("asr", "diarization" or "speakers")
+        key: Key from _cache_key()
+        header: JSON-serializable header (dict)
+        items: Iterable of JSON-serializable items, consumed lazily
+        max_bytes: Size budget of the whole cache in bytes
+    """
+    path = _cache_entry(cache_dir, kind, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    _cache_evict(cache_dir, max_bytes, keep=path)
+
+
+def _cache_evict(cache_dir, max_bytes, keep=None):
+    """
+    Delete least recently used cache entries until the cache fits max_bytes.
+
+    Decoded audio under <cache_dir>/audio/ counts as entries too. Files of
+    runs still in progress (_audio_in_use) and files still being written
+    (*.tmp) are neither evicted nor counted, so a long recording in use
+    cannot push every result out of the cache.
+
+    Args:
+        cache_dir: Cache root directory
+        max_bytes: Size budget in bytes
+        keep: Entry that is never evicted (the one just written)
+    """
+    in_use = set(_audio_in_use)
+    in_use_bytes = 0
+    entries = []
+    total = 0
+    for path in [*cache_dir.glob("*/*.jsonl.gz"), *cache_dir.glob(f"{AUDIO_CACHE_DIR}/*")]:
+        if path.suffix == ".tmp":
+            # ffmpeg or VAD of another run is writing it
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path in in_use:
+            in_use_bytes += stat.st_size
+            continue
+        total += stat.st_size
+        if path != keep:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    if in_use_bytes > max_bytes:
+        print(f"  ⚠️  Decoded audio in use ({in_use_bytes / 1024 ** 3:.1f} GB) alone exceeds the cache size "
+              f"({max_bytes / 1024 ** 3:.1f} GB), raise --cache-size")
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        print(f"  Evicted cache entry {path.name}")
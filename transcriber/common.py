@@ -0,0 +1,585 @@
+"""
+Configuration and helpers shared by the transcriber modules.
+
+Speaker attribution, transcript records, model loading and the Whisper
+decode calls used by the batch pipeline (transcribe.py) as well as by the
+diarization, loop guard, live and daemon modules.
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from datetime import timedelta
+
+import numpy as np
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Transcription language (council meetings are in Czech)
+LANGUAGE = "cs"
+
+# Decoded audio format shared by Whisper and pyannote (raw float32 mono)
+SAMPLE_RATE = 16000
+PCM_SUFFIX = ".pcm16k.f32"
+
+# Silence search for chunk and diarization window splits (see _find_split_points())
+SPLIT_SEARCH_WINDOW = 30     # Seconds searched around each target split for silence
+SPLIT_FRAME = 0.1            # Seconds per energy frame when looking for silence
+
+# Beam search width (faster-whisper default)
+DEFAULT_BEAM_SIZE = 5
+
+
+# =========================
+# HELPERS
+# =========================
+
+def _format_timestamp(seconds):
+    """
+    Convert seconds to HH:MM:SS format.
+
+    Args:
+        seconds: Time in seconds (float or int)
+
+    Returns:
+        str: Formatted timestamp (e.g., "1:23:45")
+    """
+    return str(timedelta(seconds=int(seconds)))
+
+
+# Sorted diarization turns as parallel arrays. `max_end` is the running
+# maximum of `ends`, which makes "first turn covering t" a binary search.
+TurnIndex = namedtuple("TurnIndex", ["starts", "ends", "labels", "max_end"])
+
+# Speaker attribution modes
+ATTRIBUTION_MODES = ["start", "overlap"]
+
+# Records labeled per vectorised lookup when writing the transcript
+LABEL_CHUNK_SIZE = 1000
+
+
+def _build_turn_index(turns):
+    """
+    Build sorted lookup arrays from diarization turns.
+
+    Built once per diarization result so that each segment lookup is a
+    binary search instead of a scan over all turns.
+
+    Args:
+        turns: Iterable of (start, end, speaker_label) tuples
+
+    Returns:
+        TurnIndex: Turn starts, ends and labels sorted by start time
+    """
+    turns = list(turns)
+    starts = np.array([t[0] for t in turns], dtype=np.float64)
+    ends = np.array([t[1] for t in turns], dtype=np.float64)
+    labels = np.array([t[2] for t in turns], dtype=object)
+
+    # Stable sort keeps pyannote's order for turns starting at the same time
+    order = np.argsort(starts, kind="stable")
+    starts, ends, labels = starts[order], ends[order], labels[order]
+    max_end = np.maximum.accumulate(ends) if len(ends) else ends
+
+    return TurnIndex(starts=starts, ends=ends, labels=labels, max_end=max_end)
+
+
+def _find_speakers(start_times, turn_index):
+    """
+    Find speaker labels for many timestamps at once.
+
+    For each timestamp returns the first turn (in start order) whose span
+    contains it, which matches a linear scan over `itertracks()`.
+    Runs in O((n + m) log m) for n timestamps and m turns.
+
+    Args:
+        start_times: Sequence of timestamps in seconds
+        turn_index: TurnIndex from _build_turn_index()
+
+    Returns:
+        list: Speaker label per timestamp ("UNKNOWN" where no turn matches)
+    """
+    times = np.asarray(start_times, dtype=np.float64)
+    if len(turn_index.starts) == 0:
+        return ["UNKNOWN"] * len(times)
+
+    # Turns that started at or before t
+    started = np.searchsorted(turn_index.starts, times, side="right")
+    # First turn whose end reaches t (running max is non-decreasing)
+    first = np.searchsorted(turn_index.max_end, times, side="left")
+
+    found = first < started
+    labels = np.full(len(times), "UNKNOWN", dtype=object)
+    labels[found] = turn_index.labels[first[found]]
+    return labels.tolist()
+
+
+def _iter_speakers_overlap(spans, turn_index, with_shares=False):
+    """
+    Assign each segment to the speaker with the largest overlap.
+
+    Single merge pass over segments and turns, both sorted by start time,
+    keeping a heap of currently active turns. Overlap is summed per speaker
+    over the whole [start, end] span; equal overlap goes to the speaker whose
+    turn starts first, as in "start" attribution. A segment that overlaps no
+    turn gets the nearest turn's speaker (by gap before or after, the earlier
+    turn on a tie) with zero confidence.
+
+    Args:
+        spans: Iterable of (start, end) tuples sorted by start; consumed lazily
+        turn_index: TurnIndex from _build_turn_index()
+        with_shares: Also yield the share covered by every overlapping speaker
+
+    Yields:
+        tuple: (label, confidence) - speaker label per segment and the
+               share of the segment covered by that speaker (0.0-1.0);
+               with_shares adds a dict of speaker -> share as third item
+    """
+    # Plain lists are much faster than NumPy scalars in a Python loop
+    starts = turn_index.starts.tolist()
+    ends = turn_index.ends.tolist()
+    labels = turn_index.labels.tolist()
+    n_turns = len(starts)
+
+    active = []       # Heap of (end, turn) for turns that may reach the segment
+    nxt = 0           # Next turn not yet pushed to the heap
+    last_ended = -1   # Turn with the latest end among those already retired
+
+    for seg_start, seg_end in spans:
+        while nxt < n_turns and starts[nxt] < seg_end:
+            heapq.heappush(active, (ends[nxt], nxt))
+            nxt += 1
+        while active and active[0][0] <= seg_start:
+            _, last_ended = heapq.heappop(active)
+
+        overlap = {}
+        following = nxt if nxt < n_turns else -1
+        zero = seg_start == seg_end   # A zero-length segment belongs to the turns containing it
+        for turn_end, turn in active:
+            covered = min(turn_end, seg_end) - max(starts[turn], seg_start)
+            if covered > 0 or (zero and covered == 0):
+                overlap[labels[turn]] = overlap.get(labels[turn], 0.0) + covered
+            elif starts[turn] >= seg_end and (following < 0 or starts[turn] < starts[following]):
+                following = turn
+
+        if overlap:
+            speaker = max(overlap, key=overlap.get)
+            best = overlap[speaker]
+            if len(overlap) > 1 and list(overlap.values()).count(best) > 1:
+                # Heap order is arbitrary, so a tie goes to the turn that starts first
+                first = n_turns
+                for turn_end, turn in active:
+                    covered = min(turn_end, seg_end) - max(starts[turn], seg_start)
+                    if overlap.get(labels[turn]) == best and (covered > 0 or (zero and covered == 0)):
+                        first = min(first, turn)
+                speaker = labels[first]
+            duration = seg_end - seg_start
+            if with_shares:
+                shares = {k: (min(v / duration, 1.0) if duration > 0 else 1.0) for k, v in overlap.items()}
+                yield speaker, shares[speaker], shares
+            else:
+                yield speaker, (min(overlap[speaker] / duration, 1.0) if duration > 0 else 1.0)
+            continue
+
+        # No overlap: nearest turn ending before or starting after the segment
+        gap_before = seg_start - ends[last_ended] if last_ended >= 0 else float("inf")
+        gap_after = starts[following] - seg_end if following >= 0 else float("inf")
+        if last_ended < 0 and following < 0:
+            speaker = "UNKNOWN"
+        elif gap_before <= gap_after:
+            speaker = labels[last_ended]
+        else:
+            speaker = labels[following]
+        yield (speaker, 0.0, {}) if with_shares else (speaker, 0.0)
+
+
+def _assign_speakers_overlap(spans, turn_index):
+    """
+    List version of _iter_speakers_overlap().
+
+    Args:
+        spans: Sequence of (start, end) tuples sorted by start
+        turn_index: TurnIndex from _build_turn_index()
+
+    Returns:
+        tuple: (labels, confidences) lists, one entry per segment
+    """
+    pairs = list(_iter_speakers_overlap(spans, turn_index))
+    return [label for label, _ in pairs], [confidence for _, confidence in pairs]
+
+
+def _find_speaker(start_time, turn_index):
+    """
+    Find speaker label for a given timestamp.
+
+    Args:
+        start_time: Timestamp in seconds (float)
+        turn_index: TurnIndex from _build_turn_index()
+
+    Returns:
+        str: Speaker label (e.g., "SPEAKER_00") or "UNKNOWN"
+    """
+    return _find_speakers([start_time], turn_index)[0]
+
+
+def _label_records(records, turn_index, attribution, stats, confidence=False):
+    """
+    Attach speaker labels to transcript records.
+
+    Consumes records lazily in fixed-size chunks, so memory stays bounded
+    when records are streamed from the journal.
+
+    Args:
+        records: Iterable of segment records sorted by start
+        turn_index: TurnIndex from _build_turn_index()
+        attribution: Attribution mode from ATTRIBUTION_MODES
+        stats: Dict updated with "segments", "unknown" and "changed" counts
+        confidence: Also compute the share of each segment covered by its
+            speaker in "start" mode (always computed in "overlap" mode)
+
+    Yields:
+        tuple: (record, speaker_label, confidence) - confidence is None
+               when it was not computed
+    """
+    records, span_source = itertools.tee(records)
+    overlap = None
+    if attribution == "overlap" or confidence:
+        overlap = _iter_speakers_overlap(((r["start"], r["end"]) for r in span_source), turn_index,
+                                         with_shares=True)
+
+    stats.update(segments=0, unknown=0, changed=0)
+    while True:
+        chunk = list(itertools.islice(records, LABEL_CHUNK_SIZE))
+        if not chunk:
+            break
+        start_speakers = _find_speakers([r["start"] for r in chunk], turn_index)
+        for record, speaker in zip(chunk, start_speakers):
+            share = None
+            if overlap is not None:
+                overlap_speaker, overlap_share, shares = next(overlap)
+                if attribution == "overlap":
+                    stats["changed"] += overlap_speaker != speaker
+                    speaker, share = overlap_speaker, overlap_share
+                else:
+                    share = shares.get(speaker, 0.0)
+            stats["segments"] += 1
+            stats["unknown"] += speaker == "UNKNOWN"
+            yield record, speaker, share
+
+
+def _segment_to_record(segment):
+    """
+    Convert a faster-whisper segment into a plain serializable record.
+
+    Args:
+        segment: faster-whisper Segment
+
+    Returns:
+        dict: Record with start, end, text and decoder scores, plus "words"
+              as [start, end, word, probability] lists when the segment
+              has word timings
+    """
+    record = {
+        "start": float(segment.start),
+        "end": float(segment.end),
+        "text": segment.text.strip(),
+        "avg_logprob": float(segment.avg_logprob),
+        "no_speech_prob": float(segment.no_speech_prob),
+        "compression_ratio": float(segment.compression_ratio),
+    }
+    if segment.words:
+        record["words"] = [[float(word.start), float(word.end), word.word.strip(), float(word.probability)]
+                           for word in segment.words]
+    return record
+
+
+def _offset_record(record, offset):
+    """Add `offset` seconds to a record's timestamps, word timings included."""
+    record["start"] += offset
+    record["end"] += offset
+    for word in record.get("words", ()):
+        word[0] += offset
+        word[1] += offset
+    return record
+
+
+def _read_json(path):
+    """Read a JSON file, returning None if it is missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, data):
+    """Write JSON via a temp file and rename, so readers never see partial data."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _transcript_entry(record, speaker):
+    """Format one segment in analyzer format."""
+    return f"[{_format_timestamp(record['start'])}] {speaker}:\n{record['text']}\n\n"
+
+
+def _status_path(output_path):
+    """Return path of the progress status file kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".status.json")
+
+
+def _write_status(status_path, state, stage=None, **fields):
+    """Replace the status file polled by external tools (see _track_progress())."""
+    _write_json_atomic(status_path, dict(state=state, stage=stage, updated=time.time(), **fields))
+
+
+# =========================
+# AUDIO
+# =========================
+
+def _file_hash(path, chunk_size=1 << 20):
+    """
+    Compute SHA-256 of a file's content.
+
+    Args:
+        path: Path to file
+        chunk_size: Read block size in bytes
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _decode_audio_cached(audio_path, cache_dir, digest=None):
+    """
+    Decode audio once to raw 16 kHz mono float32 PCM, cached by content hash.
+
+    The PCM file is keyed by the source file hash, so reruns on the same
+    recording skip ffmpeg entirely. Reuse refreshes its mtime, which the
+    result cache evicts decoded audio by (see _cache_evict()).
+
+    Args:
+        audio_path: Path to input audio file
+        cache_dir: Directory for the decoded PCM file
+        digest: Precomputed _file_hash() of audio_path
+
+    Returns:
+        Path: Path to raw float32 PCM file
+
+    Raises:
+        RuntimeError: If ffmpeg is missing or decoding fails
+    """
+    digest = digest or _file_hash(audio_path)
+    pcm_path = cache_dir / f"{audio_path.stem}.{digest[:16]}{PCM_SUFFIX}"
+    if pcm_path.exists():
+        print(f"▶ Reusing decoded audio: {pcm_path}")
+        os.utime(pcm_path)
+        return pcm_path
+
+    print(f"▶ Decoding audio to {SAMPLE_RATE} Hz mono PCM: {pcm_path}")
+    tmp_path = pcm_path.with_name(pcm_path.name + ".tmp")
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", "-y",
+        "-i", str(audio_path),
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-f", "f32le",
+        str(tmp_path)
+    ]
+    try:
+        result = subprocess.run(cmd, check=False)
+    except FileNotFoundError as e:
+        raise RuntimeError("ffmpeg not found, install it or use --no-audio-cache") from e
+    if result.returncode != 0:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"ffmpeg failed with exit code {result.returncode}")
+
+    os.replace(tmp_path, pcm_path)
+    return pcm_path
+
+
+def _load_pcm(pcm_path):
+    """
+    Memory-map a decoded PCM file.
+
+    Copy-on-write mapping: pages are shared with the page cache and with
+    other processes, and nothing is copied unless a consumer writes to it.
+
+    Args:
+        pcm_path: Path to raw float32 PCM file
+
+    Returns:
+        np.ndarray: 1-D float32 samples at SAMPLE_RATE
+    """
+    return np.memmap(pcm_path, dtype=np.float32, mode="c")
+
+
+def _find_split_points(samples, n_chunks, search_window=SPLIT_SEARCH_WINDOW):
+    """
+    Find low-energy sample offsets that cut audio into roughly equal chunks.
+
+    Around each evenly spaced target boundary, picks the quietest
+    SPLIT_FRAME-long frame within +/- search_window seconds.
+
+    Args:
+        samples: 1-D float32 PCM at SAMPLE_RATE
+        n_chunks: Desired number of chunks
+        search_window: Seconds searched on each side of a target boundary
+
+    Returns:
+        list: Chunk boundaries in samples, starting with 0 and ending with len(samples)
+    """
+    total = len(samples)
+    frame = int(SPLIT_FRAME * SAMPLE_RATE)
+    window = int(search_window * SAMPLE_RATE)
+    bounds = [0]
+
+    for k in range(1, n_chunks):
+        target = total * k // n_chunks
+        lo = max(bounds[-1] + frame, target - window)
+        hi = min(total - frame, target + window)
+        if hi - lo < frame:
+            continue
+        # RMS energy per frame in the search window
+        n_frames = (hi - lo) // frame
+        frames = np.asarray(samples[lo:lo + n_frames * frame]).reshape(n_frames, frame)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        quietest = int(np.argmin(energy))
+        bounds.append(lo + quietest * frame + frame // 2)
+
+    bounds.append(total)
+    return bounds
+
+
+# =========================
+# MODELS
+# =========================
+
+# Models loaded in this process, reused by later runs (daemon, batches)
+_loaded_models = {}
+_model_lock = threading.Lock()
+
+# A shared pyannote pipeline is not documented as thread-safe
+_diarization_lock = threading.Lock()
+
+
+def _model_dir():
+    """
+    Offline model bundle of this run, or None to resolve models on the hub.
+
+    Set through the environment by --model-dir so that spawned worker
+    processes and daemon jobs load from the same bundle.
+    """
+    path = os.environ.get("TRANSCRIBER_MODEL_DIR")
+    return Path(path) if path else None
+
+
+def _bundled(path):
+    """Return a path inside the model bundle, failing clearly if it is missing."""
+    if not path.exists():
+        raise FileNotFoundError(f"{path} is missing from the model bundle (create it with --bundle-models)")
+    return path
+
+
+def _load_whisper_model(whisper_model, device, compute_type, cpu_threads=0, num_workers=1):
+    """
+    Load a Whisper model once per process and parameter set.
+
+    Args:
+        whisper_model: Whisper model size (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        cpu_threads: Whisper CPU threads, 0 for library default (int)
+        num_workers: Concurrent transcribe() calls the model can serve (int)
+
+    Returns:
+        WhisperModel: Loaded (possibly already resident) model
+    """
+    from faster_whisper import WhisperModel
+
+    key = ("whisper", whisper_model, device, compute_type, cpu_threads, num_workers)
+    model_dir = _model_dir()
+    source = str(_bundled(model_dir / "whisper" / whisper_model)) if model_dir else whisper_model
+    with _model_lock:
+        if key not in _loaded_models:
+            _loaded_models[key] = WhisperModel(source, device=device, compute_type=compute_type,
+                                               cpu_threads=cpu_threads, num_workers=num_workers)
+        return _loaded_models[key]
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job after it has been cancelled."""
+
+
+def _check_cancelled(cancel_event):
+    """Raise JobCancelled if cancel_event is set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("Job cancelled")
+
+
+def _cancellable(records, cancel_event):
+    """Lazily pass records through, stopping once cancel_event is set."""
+    for record in records:
+        _check_cancelled(cancel_event)
+        yield record
+
+
+# =========================
+# DECODING
+# =========================
+
+def _decode(model, audio, batch_size=0, **options):
+    """
+    Start decoding with the sequential or batched faster-whisper path.
+
+    Args:
+        model: Loaded WhisperModel
+        audio: Audio file path (str) or 1-D float32 samples at SAMPLE_RATE
+        batch_size: Batch size for BatchedInferencePipeline, 0 = sequential
+        **options: Extra decoding options passed to transcribe()
+
+    Returns:
+        tuple: (segment generator, TranscriptionInfo)
+    """
+    if batch_size:
+        from faster_whisper import BatchedInferencePipeline
+        return BatchedInferencePipeline(model=model).transcribe(
+            audio, language=LANGUAGE, batch_size=batch_size, **options
+        )
+    return model.transcribe(audio, language=LANGUAGE, **options)
+
+
+def _redecode_window(model, samples, lo, hi, beam_size, word_timestamps=False, **options):
+    """
+    Decode [lo, hi) seconds of samples again and return records for it.
+
+    Extra keyword arguments are passed to transcribe().
+
+    Returns:
+        list: Records with absolute timestamps whose midpoint lies in the window
+    """
+    segments, _ = model.transcribe(np.asarray(samples[int(lo * SAMPLE_RATE):int(hi * SAMPLE_RATE)]),
+                                   language=LANGUAGE, beam_size=beam_size, word_timestamps=word_timestamps,
+                                   **options)
+    records = []
+    for segment in segments:
+        record = _offset_record(_segment_to_record(segment), lo)
+        midpoint = (record["start"] + record["end"]) / 2
+        if record["text"] and lo <= midpoint < hi:
+            records.append(record)
+    return records
@@ -0,0 +1,273 @@
+"""
+Transcription daemon keeping models resident (--serve) and its client.
+
+Jobs are submitted as JSON lines over a Unix socket and run one at a time.
+"""
+
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+from common import JobCancelled, _format_timestamp, _load_whisper_model, _read_json, _status_path
+from diarization import _load_diarization_pipeline
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Transcription daemon keeping models resident (Unix socket)
+DEFAULT_DAEMON_SOCKET = Path(os.environ.get("TRANSCRIBER_SOCKET", "/tmp/zastupitelstvo-transcriber.sock"))
+DAEMON_POLL_INTERVAL = 5     # Seconds between status polls of the client
+DAEMON_TIMEOUT = 30          # Seconds to wait for a daemon response
+DAEMON_SOCKET_MODE = 0o600   # Only the daemon's user may submit jobs
+# transcribe_audio() options a client may set; the daemon adds hf_token and cancel_event
+DAEMON_JOB_OPTIONS = {
+    "audio_path", "output_path", "started_at", "whisper_model", "device", "compute_type", "beam_size",
+    "draft_model", "redecode_model", "redecode_thresholds", "attribution", "segments_jsonl", "word_timestamps",
+    "speaker_registry", "speaker_threshold", "diarization_window", "diarization_workers", "diarization_runtime",
+    "diarize", "loop_guard", "streaming", "concurrent", "asr_threads", "diarization_threads", "audio_cache",
+    "chunk_workers", "batch_size", "compare_seconds", "vad_options", "resume", "cache_dir", "cache_size_gb",
+}
+
+
+# =========================
+# DAEMON
+# =========================
+
+class _JobQueue:
+    """
+    FIFO of transcription jobs processed one at a time by a worker thread.
+
+    Jobs run in the daemon process, so models loaded by one job stay
+    resident for the next (see _load_whisper_model()).
+    """
+
+    def __init__(self, run_job, hf_token):
+        self.run_job = run_job
+        self.hf_token = hf_token
+        self.jobs = {}
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def submit(self, options):
+        """
+        Queue a job with transcribe_audio() options, return its status.
+
+        Raises:
+            ValueError: If options is not an object, lacks the audio or
+                output path or has keys outside DAEMON_JOB_OPTIONS
+        """
+        if not isinstance(options, dict):
+            raise ValueError("Job options must be a JSON object")
+        unknown = sorted(set(options) - DAEMON_JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(unknown)}")
+        for key in ("audio_path", "output_path"):
+            if not isinstance(options.get(key), str):
+                raise ValueError(f"Job option {key} must be a path string")
+        with self.lock:
+            job_id = str(next(self.ids))
+            self.jobs[job_id] = {
+                "id": job_id,
+                "state": "queued",
+                "options": options,
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "error": None,
+                "cancel": threading.Event(),
+            }
+        self.pending.put(job_id)
+        return self.status(job_id)
+
+    def status(self, job_id):
+        """Return a JSON-serializable status of a job."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job: {job_id}")
+            status = {key: value for key, value in job.items() if key != "cancel"}
+            status["queue_position"] = (
+                [j for j in self.pending.queue if self.jobs[j]["state"] == "queued"].index(job_id)
+                if job["state"] == "queued" else None
+            )
+            status["progress"] = (
+                _read_json(_status_path(Path(job["options"]["output_path"])))
+                if job["state"] == "running" else None
+            )
+            return status
+
+    def list(self):
+        """Return status of all jobs."""
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running job to stop at its next check."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job: {job_id}")
+            job["cancel"].set()
+            if job["state"] == "queued":
+                job["state"] = "cancelled"
+                job["finished"] = time.time()
+        return self.status(job_id)
+
+    def run_forever(self):
+        """Process queued jobs one after another (worker thread)."""
+        while True:
+            job_id = self.pending.get()
+            with self.lock:
+                job = self.jobs[job_id]
+                if job["state"] != "queued":
+                    continue
+                job["state"] = "running"
+                job["started"] = time.time()
+
+            print(f"▶ Job {job_id}: {job['options']['audio_path']}")
+            try:
+                self.run_job(**job["options"], hf_token=self.hf_token, cancel_event=job["cancel"])
+                state, error = "done", None
+            except JobCancelled:
+                state, error = "cancelled", None
+            except Exception as e:
+                state, error = "failed", str(e)
+                print(f"❌ Job {job_id} failed: {e}", file=sys.stderr)
+
+            with self.lock:
+                job["state"] = state
+                job["error"] = error
+                job["finished"] = time.time()
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self):
+        jobs = self.server.jobs
+        try:
+            request = json.loads(self.rfile.readline())
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            action = request.get("action")
+            if action == "submit":
+                response = {"ok": True, "job": jobs.submit(request["options"])}
+            elif action == "status":
+                response = {"ok": True, "job": jobs.status(request["job_id"])}
+            elif action == "cancel":
+                response = {"ok": True, "job": jobs.cancel(request["job_id"])}
+            elif action == "list":
+                response = {"ok": True, "jobs": jobs.list()}
+            else:
+                response = {"ok": False, "error": f"Unknown action: {action}"}
+        except (KeyError, TypeError, ValueError) as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def _serve(socket_path, run_job, hf_token, whisper_model, device, compute_type, cpu_threads=0):
+    """
+    Run the transcription daemon on a Unix socket until interrupted.
+
+    Loads Whisper and pyannote up front so the first job starts warm.
+
+    Args:
+        socket_path: Path of the Unix socket to listen on
+        run_job: transcribe_audio(), called with the job options, hf_token
+            and cancel_event
+        hf_token: HuggingFace token for pyannote models (str)
+        whisper_model: Whisper model size to preload (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        cpu_threads: Whisper CPU threads of the preloaded model (int)
+    """
+    socket_path = Path(socket_path)
+    print(f"▶ Preloading Whisper model ({whisper_model}) and speaker diarization model...")
+    _load_whisper_model(whisper_model, device, compute_type, cpu_threads)
+    _load_diarization_pipeline(hf_token)
+
+    jobs = _JobQueue(run_job, hf_token)
+    threading.Thread(target=jobs.run_forever, daemon=True).start()
+
+    # A socket file left behind by a killed daemon would block bind()
+    socket_path.unlink(missing_ok=True)
+    # Jobs read and write any file the daemon's user can, so nobody else may connect:
+    # the umask covers the window between bind() and chmod()
+    umask = os.umask(0o777 & ~DAEMON_SOCKET_MODE)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(str(socket_path), _DaemonHandler)
+    finally:
+        os.umask(umask)
+    os.chmod(socket_path, DAEMON_SOCKET_MODE)
+    with server:
+        server.jobs = jobs
+        print(f"✅ Transcription daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("▶ Shutting down daemon...")
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def _daemon_request(socket_path, request, timeout=DAEMON_TIMEOUT):
+    """
+    Send one request to the daemon.
+
+    Args:
+        socket_path: Path of the daemon's Unix socket
+        request: Request dict with "action" and its arguments
+        timeout: Socket timeout in seconds
+
+    Returns:
+        dict: Daemon response
+
+    Raises:
+        OSError: If no daemon is listening on socket_path
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            return json.loads(f.readline())
+
+
+def _wait_for_job(socket_path, job_id):
+    """
+    Poll the daemon until a job finishes, printing state changes.
+
+    Args:
+        socket_path: Path of the daemon's Unix socket
+        job_id: Job identifier
+
+    Returns:
+        dict: Final job status
+    """
+    last_state = None
+    last_update = None
+    while True:
+        job = _daemon_request(socket_path, {"action": "status", "job_id": job_id})["job"]
+        if job["state"] != last_state:
+            position = f" (position {job['queue_position'] + 1})" if job["queue_position"] is not None else ""
+            print(f"  Job {job_id}: {job['state']}{position}")
+            last_state = job["state"]
+        progress = job.get("progress") or {}
+        if "eta_seconds" in progress and progress["updated"] != last_update:
+            print(f"  Job {job_id}: {100 * progress['progress']:5.1f}%  "
+                  f"RTF {progress['rolling_real_time_factor']:.3f}  ETA {_format_timestamp(progress['eta_seconds'])}")
+            last_update = progress["updated"]
+        if job["state"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(DAEMON_POLL_INTERVAL)
@@ -0,0 +1,737 @@
+"""
+Speaker diarization with pyannote.audio and naming of diarized speakers.
+
+Loads the pyannote pipeline (optionally with segmentation on onnxruntime),
+diarizes whole recordings or overlapping windows and matches diarized
+speakers against a registry of reference voices.
+"""
+
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from importlib import metadata
+
+import numpy as np
+
+from cache import DEFAULT_CACHE_DIR
+from common import (JobCancelled, SAMPLE_RATE, _bundled, _check_cancelled, _decode_audio_cached, _diarization_lock,
+                    _file_hash, _find_split_points, _format_timestamp, _load_pcm, _loaded_models, _model_dir,
+                    _model_lock)
+
+
+# =========================
+# CONFIG
+# =========================
+
+# pyannote diarization pipeline
+DIARIZATION_MODEL = "pyannote/speaker-diarization"
+DIARIZATION_WINDOW_OVERLAP = 30     # Extra seconds diarized on each side of a window (--diarization-window)
+DIARIZATION_LINK_THRESHOLD = 0.6    # Cosine similarity to link speakers of different windows
+
+# Diarization model runtimes (--diarization-runtime); ONNX models are exported to <cache dir>/onnx/
+DIARIZATION_RUNTIMES = ["torch", "onnx", "onnx-int8"]
+ONNX_OPSET = 17
+ONNX_EXPORT_SECONDS = 10            # Dummy input length for export (segmentation chunk length)
+ONNX_INTER_OP_THREADS = 1           # The exported graphs are sequential chains
+
+# Offline model bundles (--model-dir), see bundle_models()
+PYANNOTE_CHECKPOINT = "pytorch_model.bin"
+
+# Named speakers from a registry of reference voices (--speakers)
+SPEAKER_EMBEDDING_MODEL = "pyannote/embedding"
+DEFAULT_SPEAKER_THRESHOLD = 0.5     # Cosine similarity needed to name a diarized speaker
+SPEAKER_SAMPLE_SECONDS = 60         # Audio embedded per diarized speaker, longest turns first
+SPEAKER_MIN_TURN = 1.0              # Shorter turns are only used if a speaker has nothing longer
+SPEAKER_INDEX = "embeddings.npz"    # Clip embedding cache inside the registry directory
+SPEAKER_CLIP_EXTENSIONS = {".wav", ".mp3", ".opus", ".ogg", ".flac", ".m4a"}
+
+
+# =========================
+# MODELS
+# =========================
+
+def _write_bundle_pipeline_config(model_dir, config_path):
+    """
+    Write the bundled pipeline config with absolute model paths.
+
+    The bundle keeps paths relative to its config.yaml so it can be moved;
+    pyannote resolves them against the working directory instead.
+    """
+    import yaml
+
+    bundle_config = _bundled(model_dir / DIARIZATION_MODEL / "config.yaml")
+    config = yaml.safe_load(bundle_config.read_text(encoding="utf-8"))
+    params = config["pipeline"]["params"]
+    for key in ("segmentation", "embedding"):
+        if isinstance(params.get(key), str):
+            params[key] = str(_bundled((bundle_config.parent / params[key]).resolve()))
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+
+def _load_diarization_pipeline(hf_token, runtime="torch", cache_dir=DEFAULT_CACHE_DIR, num_threads=0):
+    """
+    Load the pyannote pipeline once per process and runtime.
+
+    Args:
+        hf_token: HuggingFace token for pyannote models (str)
+        runtime: One of DIARIZATION_RUNTIMES
+        cache_dir: Directory for exported ONNX models
+        num_threads: onnxruntime intra-op threads, 0 for its default (int)
+
+    Returns:
+        Pipeline: Loaded (possibly already resident) pipeline
+    """
+    from pyannote.audio import Pipeline
+
+    key = ("diarization", DIARIZATION_MODEL, runtime, num_threads if runtime != "torch" else 0)
+    model_dir = _model_dir()
+    with _model_lock:
+        if key not in _loaded_models:
+            if model_dir:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    config_path = Path(tmp_dir) / "config.yaml"
+                    _write_bundle_pipeline_config(model_dir, config_path)
+                    pipeline = Pipeline.from_pretrained(config_path)
+            else:
+                pipeline = Pipeline.from_pretrained(DIARIZATION_MODEL, use_auth_token=hf_token)
+            if runtime != "torch":
+                _use_onnx_runtime(pipeline, runtime, cache_dir, num_threads)
+            _loaded_models[key] = pipeline
+        return _loaded_models[key]
+
+
+def _load_speaker_embedding(hf_token):
+    """
+    Load the speaker embedding model once per process.
+
+    Args:
+        hf_token: HuggingFace token for pyannote models (str)
+
+    Returns:
+        Inference: One embedding per input waveform
+    """
+    from pyannote.audio import Inference, Model
+
+    key = ("embedding", SPEAKER_EMBEDDING_MODEL)
+    model_dir = _model_dir()
+    with _model_lock:
+        if key not in _loaded_models:
+            if model_dir:
+                model = Model.from_pretrained(_bundled(model_dir / SPEAKER_EMBEDDING_MODEL / PYANNOTE_CHECKPOINT))
+            else:
+                model = Model.from_pretrained(SPEAKER_EMBEDDING_MODEL, use_auth_token=hf_token)
+            _loaded_models[key] = Inference(model, window="whole")
+        return _loaded_models[key]
+
+
+def _onnx_path(cache_dir, model_name, quantize):
+    """Return path of an exported model, versioned by pyannote.audio since weights and graphs may change."""
+    name = re.sub(r"\W+", "-", model_name).strip("-")
+    precision = "int8" if quantize else "fp32"
+    return Path(cache_dir) / "onnx" / f"{name}.{metadata.version('pyannote.audio')}.{precision}.onnx"
+
+
+def _export_onnx(model, path, kind, quantize=False):
+    """
+    Export a pyannote model to ONNX once, optionally int8-quantized.
+
+    Quantization is dynamic: weights are stored as int8 and activations are
+    quantized on the fly, so no calibration audio is needed.
+
+    Args:
+        model: pyannote Model (torch module)
+        path: Target path from _onnx_path()
+        kind: "segmentation" (waveforms -> frame scores) or "embedding"
+            (waveforms, frame weights -> embeddings)
+        quantize: Quantize the exported float32 model to int8 (bool)
+
+    Returns:
+        Path: path
+    """
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fp32_path = path.with_name(path.name.replace(".int8.", ".fp32."))
+
+    if not fp32_path.exists():
+        print(f"▶ Exporting {kind} model to {fp32_path}...")
+        import torch
+        tmp_path = fp32_path.with_name(fp32_path.name + ".tmp")
+        waveforms = torch.zeros(1, 1, ONNX_EXPORT_SECONDS * SAMPLE_RATE)
+        dynamic_axes = {"waveforms": {0: "batch", 2: "samples"}}
+        if kind == "segmentation":
+            inputs, input_names, output_name = (waveforms,), ["waveforms"], "scores"
+            dynamic_axes["scores"] = {0: "batch", 1: "frames"}
+        else:
+            # Frame weights of another length are interpolated by the model
+            inputs, input_names, output_name = (waveforms, torch.ones(1, 100)), ["waveforms", "weights"], "embeddings"
+            dynamic_axes.update(weights={0: "batch", 1: "frames"}, embeddings={0: "batch"})
+        model.eval()
+        with torch.no_grad():
+            torch.onnx.export(model, inputs, str(tmp_path), input_names=input_names, output_names=[output_name],
+                              dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET)
+        os.replace(tmp_path, fp32_path)
+
+    if quantize:
+        print(f"▶ Quantizing {kind} model to int8: {path}")
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = path.with_name(path.name + ".tmp")
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _onnx_session(path, intra_op_threads=0, inter_op_threads=ONNX_INTER_OP_THREADS):
+    """
+    Open an onnxruntime CPU session.
+
+    Args:
+        path: Exported model
+        intra_op_threads: Threads inside one operator, 0 for onnxruntime's
+            default (one per physical core)
+        inter_op_threads: Operators run at the same time; the pyannote
+            graphs are chains, so more than 1 rarely helps
+
+    Returns:
+        InferenceSession
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1
+                              else ort.ExecutionMode.ORT_SEQUENTIAL)
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+
+def _route_to_onnx(model, session, kind):
+    """
+    Replace a pyannote model's forward() with an onnxruntime session.
+
+    Everything else about the model (specifications, frame resolution)
+    stays, so pyannote's inference code keeps working unchanged.
+    """
+    import torch
+
+    def forward(waveforms, weights=None):
+        inputs = {"waveforms": waveforms.detach().cpu().numpy().astype(np.float32, copy=False)}
+        if kind == "embedding":
+            # Uniform weights pool all frames, like weights=None
+            weights = torch.ones(len(waveforms), 1) if weights is None else weights
+            inputs["weights"] = weights.detach().cpu().numpy().astype(np.float32, copy=False)
+        return torch.from_numpy(session.run(None, inputs)[0])
+
+    model.forward = forward
+
+
+def _use_onnx_runtime(pipeline, runtime, cache_dir, num_threads=0):
+    """
+    Run a diarization pipeline's models through onnxruntime.
+
+    The configured pyannote/speaker-diarization pipeline embeds speakers with
+    SpeechBrain's ECAPA model, which stays on torch, so only its segmentation
+    model is exported. A pyannote embedding model (3.x pipelines) is exported
+    too, but no configuration of this repository exercises that path.
+
+    Args:
+        pipeline: Loaded pyannote Pipeline
+        runtime: "onnx" (float32) or "onnx-int8"
+        cache_dir: Directory for the exported models (`<cache_dir>/onnx/`)
+        num_threads: onnxruntime intra-op threads, 0 for its default (int)
+
+    Raises:
+        RuntimeError: If export fails
+    """
+    from pyannote.audio import Model
+
+    quantize = runtime == "onnx-int8"
+    models = [("segmentation", pipeline._segmentation.model)]
+    embedding = getattr(pipeline._embedding, "model_", None)
+    if isinstance(embedding, Model):
+        models.append(("embedding", embedding))
+    else:
+        print("  Speaker embedding is not a pyannote model (SpeechBrain), it stays on torch")
+
+    for kind, model in models:
+        try:
+            path = _export_onnx(model, _onnx_path(cache_dir, f"{DIARIZATION_MODEL}-{kind}", quantize), kind, quantize)
+        except Exception as e:
+            raise RuntimeError(f"ONNX export of the {kind} model failed (use --diarization-runtime torch): {e}") from e
+        _route_to_onnx(model, _onnx_session(path, num_threads), kind)
+
+
+# =========================
+# DIARIZATION
+# =========================
+
+def _diarization_to_turns(diarization):
+    """
+    Flatten pyannote diarization result into plain (start, end, label) tuples.
+
+    Args:
+        diarization: pyannote diarization result
+
+    Returns:
+        list: Turns as (start, end, speaker_label) tuples in pyannote order
+    """
+    return [
+        (float(turn.start), float(turn.end), speaker_label)
+        for turn, _, speaker_label in diarization.itertracks(yield_label=True)
+    ]
+
+
+def _diarize_window(pcm_path, hf_token, start, end, keep_start, keep_end, num_threads=0, runtime="torch",
+                    cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Diarize one window of the decoded audio in a worker process.
+
+    Args:
+        pcm_path: Decoded PCM from _decode_audio_cached()
+        hf_token: HuggingFace token for pyannote models (str)
+        start: Window start in samples (including overlap)
+        end: Window end in samples (including overlap)
+        keep_start: Start of the window's own span in seconds
+        keep_end: End of the window's own span in seconds
+        num_threads: Torch intra-op threads, 0 for library default (int)
+        runtime: Diarization runtime, one of DIARIZATION_RUNTIMES
+        cache_dir: Directory for exported ONNX models
+
+    Returns:
+        tuple: (turns, embeddings) - turns inside the window's own span as
+               (start, end, local_label) with absolute timestamps, and an
+               embedding per local speaker (lists, picklable)
+    """
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    samples = _load_pcm(pcm_path)[start:end]
+    pipeline = _load_diarization_pipeline(hf_token, runtime, cache_dir, num_threads)
+    with _diarization_lock:
+        diarization = pipeline({"waveform": torch.from_numpy(samples).unsqueeze(0), "sample_rate": SAMPLE_RATE})
+    local_turns = _diarization_to_turns(diarization)
+
+    # Speakers are embedded from the whole window, overlap included
+    embeddings = _embed_clusters(local_turns, samples, _load_speaker_embedding(hf_token))
+
+    offset = start / SAMPLE_RATE
+    turns = [
+        (max(turn_start + offset, keep_start), min(turn_end + offset, keep_end), label)
+        for turn_start, turn_end, label in local_turns
+        if turn_start + offset < keep_end and turn_end + offset > keep_start
+    ]
+    return turns, {label: vector.tolist() for label, vector in embeddings.items()}
+
+
+def _link_window_speakers(window_embeddings, threshold=DIARIZATION_LINK_THRESHOLD):
+    """
+    Link the local speakers of all windows into global speakers.
+
+    Average-linkage agglomerative clustering on cosine similarity of the
+    speaker embeddings. Two speakers of the same window are never merged,
+    pyannote has already told them apart.
+
+    Args:
+        window_embeddings: Per window, a dict of local label -> embedding
+        threshold: Minimum average similarity of two clusters to merge them
+
+    Returns:
+        list: Per window, a dict of local label -> global label; global
+              labels are numbered in order of first appearance
+    """
+    keys = [(w, label) for w, embeddings in enumerate(window_embeddings) for label in sorted(embeddings)]
+    if not keys:
+        return [{} for _ in window_embeddings]
+
+    vectors = _normalize_rows(np.array([window_embeddings[w][label] for w, label in keys], dtype=np.float64))
+    similarity = vectors @ vectors.T
+    windows = np.array([w for w, _ in keys])
+    similarity[windows[:, None] == windows[None, :]] = -np.inf
+
+    sizes = np.ones(len(keys))
+    cluster = np.arange(len(keys))
+    active = np.ones(len(keys), dtype=bool)
+    while active.sum() > 1:
+        masked = np.where(active[:, None] & active[None, :], similarity, -np.inf)
+        i, j = np.unravel_index(np.argmax(masked), masked.shape)
+        if masked[i, j] < threshold:
+            break
+        # Average linkage; -inf (same window) survives the merge
+        merged = (sizes[i] * similarity[i] + sizes[j] * similarity[j]) / (sizes[i] + sizes[j])
+        similarity[i, :] = merged
+        similarity[:, i] = merged
+        similarity[i, i] = -np.inf
+        sizes[i] += sizes[j]
+        active[j] = False
+        cluster[cluster == j] = i
+
+    names = {}
+    mapping = [{} for _ in window_embeddings]
+    for (w, label), representative in zip(keys, cluster):
+        names.setdefault(representative, f"SPEAKER_{len(names):02d}")
+        mapping[w][label] = names[representative]
+    return mapping
+
+
+def _run_windowed_diarization(pcm_path, hf_token, window, num_threads=0, workers=1, cancel_event=None,
+                              runtime="torch", cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Diarize long audio in overlapping windows with bounded memory.
+
+    Window boundaries are placed in quiet spots (see _find_split_points())
+    and each window is diarized with DIARIZATION_WINDOW_OVERLAP seconds of
+    extra audio on both sides. Local speakers are embedded per window and
+    linked across windows by _link_window_speakers(). Memory depends on the
+    window length only, not on the recording length.
+
+    Args:
+        pcm_path: Decoded PCM from _decode_audio_cached()
+        hf_token: HuggingFace token for pyannote models (str)
+        window: Target window length in seconds
+        num_threads: Torch threads shared by all workers, 0 for library default (int)
+        workers: Windows diarized at the same time in worker processes (int)
+        cancel_event: threading.Event checked between windows (in-process only)
+        runtime: Diarization runtime, one of DIARIZATION_RUNTIMES
+        cache_dir: Directory for exported ONNX models
+
+    Returns:
+        list: Turns as (start, end, label) tuples with global labels
+    """
+    samples = _load_pcm(pcm_path)
+    n_windows = max(1, math.ceil(len(samples) / (window * SAMPLE_RATE)))
+    bounds = _find_split_points(samples, n_windows)
+    overlap = int(DIARIZATION_WINDOW_OVERLAP * SAMPLE_RATE)
+    jobs = [
+        (max(0, lo - overlap), min(len(samples), hi + overlap), lo / SAMPLE_RATE, hi / SAMPLE_RATE)
+        for lo, hi in zip(bounds, bounds[1:])
+    ]
+    print(f"  {len(jobs)} windows of ~{window}s (±{DIARIZATION_WINDOW_OVERLAP}s overlap), {workers} worker(s)")
+
+    def report(k, result):
+        turns, embeddings = result
+        print(f"  Window {k + 1}/{len(jobs)} ({_format_timestamp(jobs[k][2])}-{_format_timestamp(jobs[k][3])}): "
+              f"{len(embeddings)} speakers, {len(turns)} turns")
+        return result
+
+    if workers > 1:
+        threads_per_worker = max(1, (num_threads or os.cpu_count() or 1) // workers)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_diarize_window, pcm_path, hf_token, *job, threads_per_worker, runtime, cache_dir)
+                       for job in jobs]
+            results = [report(k, future.result()) for k, future in enumerate(futures)]
+    else:
+        results = []
+        for k, job in enumerate(jobs):
+            _check_cancelled(cancel_event)
+            results.append(report(k, _diarize_window(pcm_path, hf_token, *job, num_threads, runtime, cache_dir)))
+
+    mapping = _link_window_speakers([embeddings for _, embeddings in results])
+    turns = sorted(
+        (start, end, mapping[k][label])
+        for k, (window_turns, _) in enumerate(results)
+        for start, end, label in window_turns
+    )
+    print(f"  Linked {sum(len(m) for m in mapping)} window speakers into "
+          f"{len(set(label for _, _, label in turns))} speakers")
+    return turns
+
+
+def _run_diarization(audio_path, hf_token, num_threads=0, pcm_path=None, cancel_event=None,
+                     window=0, workers=1, runtime="torch", cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load pyannote pipeline and diarize audio into speaker turns.
+
+    Top-level function so it can run in a worker process.
+
+    Args:
+        audio_path: Path to input audio file
+        hf_token: HuggingFace token for pyannote models (str)
+        num_threads: Torch intra-op threads, 0 for library default (int)
+        pcm_path: Decoded PCM from _decode_audio_cached(), used instead of
+            decoding audio_path again
+        cancel_event: threading.Event checked at each pipeline step (in-process only)
+        window: Diarize pcm_path in windows of about this many seconds with
+            bounded memory, 0 for the whole recording at once (int)
+        workers: Windows diarized at the same time in worker processes (int)
+        runtime: Run the segmentation and embedding models with "torch",
+            or exported to ONNX with onnxruntime ("onnx", "onnx-int8")
+        cache_dir: Directory for exported ONNX models
+
+    Returns:
+        tuple: (turns, timings) - turns as (start, end, label) tuples
+
+    Raises:
+        RuntimeError: If model loading or diarization fails
+    """
+    timings = {}
+    if window and pcm_path:
+        print("▶ Identifying speakers in windows...")
+        started = time.time()
+        try:
+            turns = _run_windowed_diarization(pcm_path, hf_token, window, num_threads, workers, cancel_event,
+                                              runtime, cache_dir)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Speaker diarization failed: {e}") from e
+        timings["diarization_run"] = (started, time.time())
+        print(f"  Speaker turns: {len(turns)}")
+        return turns, timings
+
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    # Load diarization pipeline
+    print(f"▶ Loading speaker diarization model ({runtime})...")
+    started = time.time()
+    try:
+        pipeline = _load_diarization_pipeline(hf_token, runtime, cache_dir, num_threads)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load diarization model: {e}") from e
+    timings["diarization_load"] = (started, time.time())
+
+    # Perform diarization
+    print("▶ Identifying speakers...")
+    started = time.time()
+    try:
+        # pyannote calls the hook after every step, which is where a cancel can land
+        hook = (lambda *args, **kwargs: _check_cancelled(cancel_event)) if cancel_event else None
+        with _diarization_lock:
+            if pcm_path:
+                # Zero-copy view of the memory-mapped samples as (channel, time)
+                waveform = torch.from_numpy(_load_pcm(pcm_path)).unsqueeze(0)
+                diarization = pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE}, hook=hook)
+            else:
+                diarization = pipeline(str(audio_path), hook=hook)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Speaker diarization failed: {e}") from e
+    turns = _diarization_to_turns(diarization)
+    timings["diarization_run"] = (started, time.time())
+
+    print(f"  Speaker turns: {len(turns)}")
+    return turns, timings
+
+
+# =========================
+# SPEAKER REGISTRY
+# =========================
+
+# Reference voices: one unit-length centroid per registered name
+SpeakerRegistry = namedtuple("SpeakerRegistry", ["names", "vectors"])
+
+
+def _registry_clips(registry_dir):
+    """
+    List the reference clips of a speaker registry.
+
+    A clip is either `<dir>/<Name>.<ext>` or `<dir>/<Name>/<anything>.<ext>`.
+    Names become transcript labels, so characters other than letters,
+    digits and underscores are replaced with underscores.
+
+    Returns:
+        list: (name, path) tuples sorted by path
+    """
+    clips = []
+    for path in sorted(registry_dir.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in SPEAKER_CLIP_EXTENSIONS:
+            continue
+        name = path.stem if path.parent == registry_dir else path.relative_to(registry_dir).parts[0]
+        clips.append((re.sub(r"\W+", "_", name).strip("_"), path))
+    return clips
+
+
+def _normalize_rows(vectors):
+    """Scale each row to unit length so dot products are cosine similarities."""
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _embed_samples(inference, samples):
+    """Embed 16 kHz mono samples into one speaker vector."""
+    import torch
+    waveform = torch.from_numpy(np.ascontiguousarray(samples)).unsqueeze(0)
+    return np.asarray(inference({"waveform": waveform, "sample_rate": SAMPLE_RATE}),
+                      dtype=np.float32).reshape(-1)
+
+
+def load_speaker_registry(registry_dir, hf_token):
+    """
+    Load registered voices, embedding only clips not embedded before.
+
+    Clip embeddings are cached in `<registry_dir>/embeddings.npz` by clip
+    content hash, so adding a council member embeds one clip and a
+    re-recorded clip is embedded again.
+
+    Args:
+        registry_dir: Directory of reference clips (see _registry_clips())
+        hf_token: HuggingFace token for the embedding model (str)
+
+    Returns:
+        SpeakerRegistry: Names and their centroids (empty if no clips)
+
+    Raises:
+        FileNotFoundError: If registry_dir does not exist
+        RuntimeError: If decoding or embedding a clip fails
+    """
+    registry_dir = Path(registry_dir)
+    if not registry_dir.is_dir():
+        raise FileNotFoundError(f"Speaker registry not found: {registry_dir}")
+
+    index_path = registry_dir / SPEAKER_INDEX
+    cached = {}
+    if index_path.exists():
+        with np.load(index_path, allow_pickle=False) as index:
+            cached = dict(zip(index["digests"].tolist(), index["vectors"]))
+
+    clips = _registry_clips(registry_dir)
+    digests = [_file_hash(path) for _, path in clips]
+    new = [(path, digest) for (_, path), digest in zip(clips, digests) if digest not in cached]
+    if new:
+        print(f"▶ Embedding {len(new)} new reference clip(s) in {registry_dir}...")
+        inference = _load_speaker_embedding(hf_token)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for path, digest in new:
+                try:
+                    pcm_path = _decode_audio_cached(path, Path(tmp_dir), digest)
+                    cached[digest] = _embed_samples(inference, _load_pcm(pcm_path))
+                except Exception as e:
+                    raise RuntimeError(f"Failed to embed reference clip {path}: {e}") from e
+    if new or len(cached) != len(set(digests)):
+        # Keep only current clips, written atomically next to them
+        kept = sorted(set(digests))
+        vectors = np.stack([cached[digest] for digest in kept]) if kept else np.empty((0, 0), dtype=np.float32)
+        tmp_path = index_path.with_name(index_path.name + ".tmp.npz")
+        np.savez(tmp_path, digests=np.array(kept, dtype=str), vectors=vectors)
+        os.replace(tmp_path, index_path)
+
+    if not clips:
+        return SpeakerRegistry(names=np.array([], dtype=str), vectors=np.empty((0, 0), dtype=np.float32))
+
+    # Average each person's clips into one centroid
+    names, owner = np.unique([name for name, _ in clips], return_inverse=True)
+    vectors = _normalize_rows(np.stack([cached[digest] for digest in digests]))
+    centroids = np.zeros((len(names), vectors.shape[1]), dtype=np.float32)
+    np.add.at(centroids, owner, vectors)
+    return SpeakerRegistry(names=names, vectors=_normalize_rows(centroids))
+
+
+def _embed_clusters(turns, samples, inference, seconds=SPEAKER_SAMPLE_SECONDS):
+    """
+    Embed every diarized speaker from its longest turns.
+
+    Args:
+        turns: Diarization turns as (start, end, label) on the timeline of samples
+        samples: 16 kHz mono samples
+        inference: Embedding model from _load_speaker_embedding()
+        seconds: Audio per speaker to embed, longest turns first
+
+    Returns:
+        dict: Speaker label -> embedding vector
+    """
+    spans = defaultdict(list)
+    for start, end, label in turns:
+        spans[label].append((end - start, start, end))
+
+    embeddings = {}
+    for label, label_spans in spans.items():
+        picked, total = [], 0.0
+        for length, start, end in sorted(label_spans, reverse=True):
+            if length < SPEAKER_MIN_TURN and picked:
+                break
+            picked.append(samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+            total += length
+            if total >= seconds:
+                break
+        embeddings[label] = _embed_samples(inference, np.concatenate(picked))
+    return embeddings
+
+
+def _match_speakers(embeddings, registry, threshold=DEFAULT_SPEAKER_THRESHOLD):
+    """
+    Name diarized speakers after the closest registered voices.
+
+    One matrix product scores every speaker against every registered voice;
+    pairs are then taken best first, so each name is given to at most one
+    speaker of the meeting.
+
+    Args:
+        embeddings: Speaker label -> embedding vector
+        registry: SpeakerRegistry
+        threshold: Minimum cosine similarity to use a name
+
+    Returns:
+        dict: Speaker label -> (name, similarity) for matched speakers
+    """
+    labels = sorted(embeddings)
+    if not labels or not len(registry.names):
+        return {}
+    similarity = _normalize_rows(np.stack([embeddings[label] for label in labels])) @ registry.vectors.T
+
+    matches = {}
+    used = set()
+    for flat in np.argsort(similarity, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, similarity.shape)
+        if similarity[i, j] < threshold:
+            break
+        if labels[i] in matches or j in used:
+            continue
+        matches[labels[i]] = (str(registry.names[j]), float(similarity[i, j]))
+        used.add(j)
+    return matches
+
+
+def _run_speaker_naming(turns, pcm_path, hf_token, registry_dir, threshold=DEFAULT_SPEAKER_THRESHOLD,
+                        embeddings=None):
+    """
+    Rename diarized speakers after the registered voices they match.
+
+    Args:
+        turns: Diarization turns as (start, end, label) on the timeline of pcm_path
+        pcm_path: Decoded PCM the turns were diarized on
+        hf_token: HuggingFace token for the embedding model (str)
+        registry_dir: Speaker registry directory (see load_speaker_registry())
+        threshold: Minimum cosine similarity to use a name
+        embeddings: Speaker embeddings of these turns from an earlier run,
+            computed when None
+
+    Returns:
+        tuple: (turns, matches, embeddings, timings) - turns with matched
+               labels replaced by names, matches as label -> (name, similarity)
+
+    Raises:
+        RuntimeError: If embedding fails
+    """
+    timings = {}
+    started = time.time()
+    registry = load_speaker_registry(registry_dir, hf_token)
+    timings["speaker_registry"] = (started, time.time())
+
+    if embeddings is None:
+        print("▶ Embedding diarized speakers...")
+        started = time.time()
+        try:
+            embeddings = _embed_clusters(turns, _load_pcm(pcm_path), _load_speaker_embedding(hf_token))
+        except Exception as e:
+            raise RuntimeError(f"Speaker embedding failed: {e}") from e
+        timings["speaker_embedding"] = (started, time.time())
+
+    matches = _match_speakers(embeddings, registry, threshold)
+    for label in sorted(embeddings):
+        name, similarity = matches.get(label, (None, None))
+        print(f"  {label} → {name} ({similarity:.2f})" if name else f"  {label} → not registered")
+    print(f"  Named {len(matches)}/{len(embeddings)} speakers from {len(registry.names)} registered voices")
+
+    turns = [(start, end, matches[label][0] if label in matches else label) for start, end, label in turns]
+    return turns, matches, embeddings, timings
@@ -0,0 +1,373 @@
+"""
+Live transcription of a growing recording or a stream (--live).
+
+Decodes fixed windows as audio arrives and keeps speaker labels stable
+with rolling diarization passes.
+"""
+
+import subprocess
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+import numpy as np
+
+from cache import DEFAULT_CACHE_DIR
+from common import (DEFAULT_BEAM_SIZE, LANGUAGE, SAMPLE_RATE, _build_turn_index, _diarization_lock, _format_timestamp,
+                    _label_records, _load_whisper_model, _model_dir, _offset_record, _segment_to_record, _status_path,
+                    _transcript_entry, _write_status)
+from diarization import DIARIZATION_RUNTIMES, _diarization_to_turns, _load_diarization_pipeline
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Live transcription of a growing recording (--live)
+LIVE_WINDOW = 30                    # Seconds of audio per Whisper window
+LIVE_OVERLAP = 5                    # Seconds at a window's end decoded again with the next one
+LIVE_DIARIZATION_INTERVAL = 60      # Seconds of new audio per rolling diarization pass
+LIVE_DIARIZATION_CONTEXT = 240      # Seconds of earlier audio re-diarized to align speaker labels
+LIVE_IDLE_TIMEOUT = 120             # Stop when a followed file has not grown for this long
+LIVE_POLL_INTERVAL = 0.5            # Seconds between checks for new audio
+LIVE_READ_BYTES = 64 * 1024         # Pipe read size
+
+
+# =========================
+# LIVE
+# =========================
+
+class _LiveAudio:
+    """
+    Decoded samples of a growing recording, appended by a reader thread.
+
+    Samples before the position passed to trim() are dropped, so memory
+    stays bounded over a meeting of any length. Times are seconds since the
+    start of the stream.
+    """
+
+    def __init__(self):
+        self.buffer = np.empty(LIVE_WINDOW * SAMPLE_RATE, dtype=np.float32)
+        self.length = 0          # Valid samples in buffer
+        self.offset = 0          # Samples dropped from the front
+        self.finished = False
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def duration(self):
+        """Seconds received so far."""
+        with self.lock:
+            return (self.offset + self.length) / SAMPLE_RATE
+
+    def append(self, samples):
+        """Append decoded samples, growing the buffer geometrically."""
+        with self.lock:
+            needed = self.length + len(samples)
+            if needed > len(self.buffer):
+                grown = np.empty(max(needed, 2 * len(self.buffer)), dtype=np.float32)
+                grown[:self.length] = self.buffer[:self.length]
+                self.buffer = grown
+            self.buffer[self.length:needed] = samples
+            self.length = needed
+            self.updated = time.time()
+
+    def read(self, start, end):
+        """Copy samples between two stream times (seconds)."""
+        with self.lock:
+            lo = max(0, int(start * SAMPLE_RATE) - self.offset)
+            hi = min(self.length, int(end * SAMPLE_RATE) - self.offset)
+            return self.buffer[lo:hi].copy()
+
+    def trim(self, before):
+        """Drop samples before a stream time (seconds)."""
+        with self.lock:
+            drop = min(self.length, int(before * SAMPLE_RATE) - self.offset)
+            if drop <= 0:
+                return
+            self.buffer[:self.length - drop] = self.buffer[drop:self.length]
+            self.length -= drop
+            self.offset += drop
+
+    def finish(self):
+        """Mark the end of the stream."""
+        with self.lock:
+            self.finished = True
+
+
+def _live_ffmpeg_command(source, replay=False):
+    """
+    Build the ffmpeg command decoding a live source to raw PCM on stdout.
+
+    Args:
+        source: Growing audio file (Path) or "-" for a pipe on stdin
+        replay: Read a finished file at real-time speed instead of following
+            it as it grows (bool)
+
+    Returns:
+        list: Command line
+    """
+    if str(source) == "-":
+        cmd = ["ffmpeg", "-v", "error", "-i", "pipe:0"]
+    else:
+        cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+        # -re paces reading at the native rate; -follow keeps reading as the file grows
+        cmd += ["-re"] if replay else ["-follow", "1"]
+        cmd += ["-i", str(source)]
+    return cmd + ["-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1"]
+
+
+def _read_live_audio(stream, audio):
+    """Feed raw float32 PCM from a pipe into a _LiveAudio until EOF (reader thread)."""
+    remainder = b""
+    while True:
+        data = stream.read1(LIVE_READ_BYTES)
+        if not data:
+            break
+        data = remainder + data
+        usable = len(data) - len(data) % 4
+        audio.append(np.frombuffer(data[:usable], dtype=np.float32))
+        remainder = data[usable:]
+    audio.finish()
+
+
+def _decode_live_window(model, audio, start, end, overlap, final, beam_size=DEFAULT_BEAM_SIZE):
+    """
+    Decode one window of a live stream and keep its finished segments.
+
+    Segments ending in the last `overlap` seconds of the window may still
+    change with more audio, so they are decoded again with the next window,
+    which starts where the last kept segment ended.
+
+    Args:
+        model: Loaded WhisperModel
+        audio: _LiveAudio
+        start: Window start (stream seconds)
+        end: Window end (stream seconds)
+        overlap: Seconds at the end of the window whose segments are not kept
+        final: Last window of the stream, keep everything (bool)
+        beam_size: Beam search width (int)
+
+    Returns:
+        tuple: (records, next_start) - kept records with stream timestamps
+               and the start of the next window
+    """
+    segments, _ = model.transcribe(audio.read(start, end), language=LANGUAGE, beam_size=beam_size)
+    records = [_offset_record(_segment_to_record(segment), start) for segment in segments]
+    records = [record for record in records if record["text"]]
+    if final:
+        return records, end
+
+    horizon = end - overlap
+    kept = [record for record in records if record["end"] <= horizon]
+    if kept:
+        return kept, kept[-1]["end"]
+    if records and records[0]["start"] > start:
+        # Speech runs into the overlap: decode it again from its start
+        return [], records[0]["start"]
+    if records:
+        # One segment fills the whole window, it will not get any better
+        return records[:1], records[0]["end"]
+    return [], horizon
+
+
+def _diarize_live_window(pipeline, audio, start, end):
+    """
+    Diarize [start, end) of a live stream.
+
+    Returns:
+        list: Turns as (start, end, local_label) with stream timestamps
+    """
+    import torch
+    waveform = torch.from_numpy(audio.read(start, end)).unsqueeze(0)
+    with _diarization_lock:
+        diarization = pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+    return sorted((turn_start + start, turn_end + start, label)
+                  for turn_start, turn_end, label in _diarization_to_turns(diarization))
+
+
+def _merge_live_turns(turns, new_turns, boundary, speakers):
+    """
+    Add a rolling diarization pass to the global speaker turns.
+
+    A pass re-diarizes some context before `boundary`, where global turns
+    already exist. Its local labels are matched to global labels greedily
+    by overlap in that context; labels without a match become new speakers.
+    Only the new turns after `boundary` are added.
+
+    Args:
+        turns: Global turns as (start, end, label), all ending by `boundary`
+        new_turns: Turns of the pass with local labels
+        boundary: Stream time diarized by earlier passes
+        speakers: List of global labels handed out so far, extended in place
+
+    Returns:
+        list: Global turns including the new ones, sorted by start
+    """
+    overlap = defaultdict(float)
+    for start, end, local in new_turns:
+        if start >= boundary:
+            break
+        for turn_start, turn_end, label in turns:
+            covered = min(end, turn_end, boundary) - max(start, turn_start)
+            if covered > 0:
+                overlap[(local, label)] += covered
+
+    mapping = {}
+    for (local, label), _ in sorted(overlap.items(), key=lambda item: -item[1]):
+        if local not in mapping and label not in mapping.values():
+            mapping[local] = label
+    for _, _, local in new_turns:
+        if local not in mapping:
+            mapping[local] = f"SPEAKER_{len(speakers):02d}"
+            speakers.append(mapping[local])
+
+    added = [(max(start, boundary), end, mapping[local]) for start, end, local in new_turns if end > boundary]
+    return turns + added
+
+
+def transcribe_live(source, output_path, whisper_model, hf_token, device="cpu", compute_type="int8",
+                    replay=False, cpu_threads=0, beam_size=DEFAULT_BEAM_SIZE, attribution="start",
+                    window=LIVE_WINDOW, overlap=LIVE_OVERLAP,
+                    diarization_interval=LIVE_DIARIZATION_INTERVAL,
+                    diarization_context=LIVE_DIARIZATION_CONTEXT, idle_timeout=LIVE_IDLE_TIMEOUT,
+                    diarization_runtime="torch", diarization_threads=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Transcribe a recording while it is being made.
+
+    ffmpeg follows a growing file (or reads a pipe on stdin) and decodes it
+    to PCM. Whisper decodes `window`-second windows as soon as they are
+    complete, keeping segments that end before the last `overlap` seconds.
+    Every `diarization_interval` seconds of new audio, pyannote diarizes it
+    together with `diarization_context` seconds already diarized, and the
+    labels are aligned with the earlier passes. Segments whose speakers are
+    known are appended to the transcript in the usual format, so the
+    latency is bounded by window plus diarization interval plus processing
+    time.
+
+    Args:
+        source: Growing audio file (Path) or "-" for an ffmpeg pipe on stdin
+        output_path: Transcript file, appended to while the stream runs
+        whisper_model: Whisper model size (str)
+        hf_token: HuggingFace token for pyannote models (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        replay: Replay a finished file at real-time speed, for testing (bool)
+        cpu_threads: Whisper CPU threads, 0 for library default (int)
+        beam_size: Beam search width (int)
+        attribution: Speaker attribution mode from ATTRIBUTION_MODES
+        window: Seconds of audio per Whisper window
+        overlap: Seconds at the end of each window decoded again with the next
+        diarization_interval: Seconds of new audio per diarization pass
+        diarization_context: Seconds of already diarized audio re-run per
+            pass to align speaker labels
+        idle_timeout: Stop following a file that has not grown for this many
+            seconds
+        diarization_runtime: One of DIARIZATION_RUNTIMES
+        diarization_threads: onnxruntime intra-op threads for the ONNX
+            runtimes, 0 for its default
+        cache_dir: Directory for exported ONNX models
+
+    Raises:
+        ValueError: If HF_TOKEN is missing, the runtime is unknown or the
+            window is not longer than the overlap
+        RuntimeError: If ffmpeg or model loading fails
+    """
+    output_path = Path(output_path)
+    if not hf_token and not _model_dir():
+        raise ValueError("HF_TOKEN environment variable is required for speaker diarization")
+    if diarization_runtime not in DIARIZATION_RUNTIMES:
+        raise ValueError(f"Unknown diarization runtime: {diarization_runtime}")
+    if window <= overlap:
+        raise ValueError("Live window must be longer than its overlap")
+    if str(source) != "-" and not Path(source).exists():
+        raise FileNotFoundError(f"Audio file not found: {source}")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    status_path = _status_path(output_path)
+
+    print(f"▶ Loading Whisper model ({whisper_model}) and speaker diarization model...")
+    try:
+        model = _load_whisper_model(whisper_model, device, compute_type, cpu_threads)
+        pipeline = _load_diarization_pipeline(hf_token, diarization_runtime, cache_dir, diarization_threads)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load models: {e}") from e
+
+    audio = _LiveAudio()
+    try:
+        process = subprocess.Popen(_live_ffmpeg_command(source, replay), stdout=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise RuntimeError("ffmpeg not found, live mode needs it") from e
+    threading.Thread(target=_read_live_audio, args=(process.stdout, audio), daemon=True).start()
+    print(f"▶ Live transcription of {source} → {output_path} ({window}s windows, "
+          f"diarization every {diarization_interval}s)")
+
+    decoded_until = 0.0      # Stream time up to which segments are kept
+    diarized_until = 0.0     # Stream time up to which speaker turns are known
+    written = 0
+    turns = []
+    speakers = []
+    pending = deque()
+    t0 = time.time()
+    try:
+        with open(output_path, "w", encoding="utf-8") as transcript:
+            while True:
+                received = audio.duration
+                finished = audio.finished
+                busy = False
+
+                if received - decoded_until >= window or (finished and received > decoded_until):
+                    end = min(decoded_until + window, received)
+                    records, decoded_until = _decode_live_window(
+                        model, audio, decoded_until, end, overlap, finished and end >= received, beam_size
+                    )
+                    pending.extend(records)
+                    busy = True
+
+                caught_up = finished and decoded_until >= received
+                if received - diarized_until >= diarization_interval or (caught_up and received > diarized_until):
+                    start = max(0.0, diarized_until - diarization_context)
+                    new_turns = _diarize_live_window(pipeline, audio, start, received)
+                    turns = _merge_live_turns(turns, new_turns, diarized_until, speakers)
+                    diarized_until = received
+                    busy = True
+
+                # Append segments whose speakers are known
+                ready = []
+                while pending and (pending[0]["end"] <= diarized_until or caught_up and diarized_until >= received):
+                    ready.append(pending.popleft())
+                if ready:
+                    for record, speaker, _ in _label_records(ready, _build_turn_index(turns), attribution, {}):
+                        transcript.write(_transcript_entry(record, speaker))
+                    transcript.flush()
+                    written += len(ready)
+                    lag = received - ready[-1]["end"]
+                    print(f"  {_format_timestamp(ready[-1]['end'])}  +{len(ready)} segments "
+                          f"(lag {lag:.0f}s, {len(speakers)} speakers)")
+
+                # Keep only what later windows and passes still need
+                keep_from = min(decoded_until, diarized_until - diarization_context,
+                                pending[0]["start"] if pending else decoded_until)
+                audio.trim(keep_from)
+                turns = [turn for turn in turns if turn[1] >= keep_from]
+
+                _write_status(status_path, "running", "live", received=received, decoded=decoded_until,
+                              diarized=diarized_until, segments=written, speakers=len(speakers))
+
+                if caught_up and diarized_until >= received and not pending:
+                    break
+                if not busy:
+                    if not finished and str(source) != "-" and not replay \
+                            and time.time() - audio.updated > idle_timeout:
+                        print(f"▶ {source} has not grown for {idle_timeout}s, finishing")
+                        process.terminate()
+                    time.sleep(LIVE_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        print("▶ Live transcription interrupted")
+    finally:
+        process.terminate()
+        process.wait()
+
+    _write_status(status_path, "done", segments=written, speakers=len(speakers))
+    print(f"✅ Live transcription finished: {written} segments, {_format_timestamp(decoded_until)} "
+          f"of audio in {_format_timestamp(time.time() - t0)}")
@@ -0,0 +1,226 @@
+"""
+Guard against Whisper hallucination loops.
+
+Watches the segments of a running decode for a phrase repeated segment
+after segment, drops the repeats and decodes the looped-over audio again
+without the previous text as prompt.
+"""
+
+import re
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from common import (DEFAULT_BEAM_SIZE, SAMPLE_RATE, _decode, _format_timestamp, _offset_record, _redecode_window,
+                    _segment_to_record)
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Hallucination loop guard (see _guard_loops())
+LOOP_SEGMENTS = 4                      # Recent segments compared; output lags the decoder by this many
+LOOP_NGRAM = 3                         # Words per n-gram
+LOOP_MIN_NGRAMS = 8                    # Fewer n-grams never count as a loop (short answers like "Ano.")
+LOOP_REPEAT_SHARE = 0.6                # Share of repeated n-grams among the recent segments
+LOOP_COMPRESSION = 2.4                 # ... or every recent segment above this compression ratio
+LOOP_TEMPERATURES = (0.4, 0.6, 0.8, 1.0)  # Re-decode of a looping window, without the previous text
+
+
+# =========================
+# LOOP GUARD
+# =========================
+
+def _ngram_hashes(words, n=LOOP_NGRAM):
+    """
+    Rolling polynomial hashes of every run of `n` consecutive words.
+
+    Each hash is derived from the previous one by removing the word that
+    leaves the n-gram and adding the one that enters it.
+
+    Returns:
+        list: One int per n-gram, in order
+    """
+    base, modulus = 1_000_003, (1 << 61) - 1
+    top = pow(base, n - 1, modulus)
+    word_hashes = [hash(word) % modulus for word in words]
+    hashes = []
+    value = 0
+    for i, word_hash in enumerate(word_hashes):
+        if i >= n:
+            value = (value - word_hashes[i - n] * top) % modulus
+        value = (value * base + word_hash) % modulus
+        if i >= n - 1:
+            hashes.append(value)
+    return hashes
+
+
+def _loop_words(text):
+    """Lowercase words of a segment text as compared by the loop guard."""
+    return re.findall(r"\w+", text.lower())
+
+
+def _find_loop(records):
+    """
+    Find where recent segments turn into a hallucination loop.
+
+    Whisper loops repeat a phrase segment after segment (or within one
+    segment), so most word n-grams of the segments occur more than once.
+    Loops the n-grams miss show up as every segment compressing unusually
+    well.
+
+    Args:
+        records: Recent segment records in time order
+
+    Returns:
+        int: Index of the record the loop starts with, None if there is no loop
+    """
+    if len(records) >= LOOP_SEGMENTS and all(r["compression_ratio"] > LOOP_COMPRESSION for r in records):
+        return 0
+    words, owners = [], []
+    for i, record in enumerate(records):
+        tokens = _loop_words(record["text"])
+        words += tokens
+        owners += [i] * len(tokens)
+    hashes = _ngram_hashes(words)
+    if len(hashes) < LOOP_MIN_NGRAMS:
+        return None
+    counts = Counter(hashes)
+    if (len(hashes) - len(counts)) / len(hashes) < LOOP_REPEAT_SHARE:
+        return None
+    return owners[next(i for i, value in enumerate(hashes) if counts[value] > 1)]
+
+
+def _still_loops(retry, looping):
+    """
+    Tell whether a re-decode of a looping window repeats the loop.
+
+    Unlike _find_loop() this works for any number of segments: a single
+    segment that compresses unusually well, repeats one of the looping
+    segments word for word or consists of the loop's n-grams is enough.
+
+    Args:
+        retry: Records of the re-decoded window
+        looping: The dropped looping records
+
+    Returns:
+        bool: True if the re-decode must be dropped too
+    """
+    if _find_loop(retry) is not None:
+        return True
+    loop_texts = {tuple(_loop_words(record["text"])) for record in looping}
+    loop_hashes = set(_ngram_hashes([word for record in looping for word in _loop_words(record["text"])]))
+    for record in retry:
+        words = _loop_words(record["text"])
+        hashes = _ngram_hashes(words)
+        if (record["compression_ratio"] > LOOP_COMPRESSION or tuple(words) in loop_texts
+                or (hashes and loop_hashes.issuperset(hashes))):
+            return True
+    return False
+
+
+def _guard_loops(segments, model, samples, batch_size, stats, options, window=LOOP_SEGMENTS):
+    """
+    Lazily convert segments to records, cutting hallucination loops short.
+
+    The last `window` records are held back. When they turn into a loop
+    (see _find_loop()), decoding stops and the looping records are dropped,
+    keeping the first occurrence of the phrase. The looped-over audio is
+    decoded again at LOOP_TEMPERATURES without the previous text as prompt,
+    which is what keeps a loop going; that decode is kept unless it still
+    loops (see _still_loops()), in which case the window is skipped without
+    text. Decoding then restarts where the loop ended, so no audio is left
+    undecoded.
+
+    The decode time saved is an estimate: the wall time Whisper spent on
+    the dropped looping segments, which an unguarded decode keeps spending
+    on every further copy of the phrase, plus the skipped audio at the
+    running real-time factor.
+
+    Args:
+        segments: faster-whisper segment generator over samples
+        model: Loaded WhisperModel that produced it
+        samples: 1-D float32 PCM at SAMPLE_RATE the segments are decoded from
+        batch_size: Batch size of the decode, 0 = sequential
+        stats: Dict filled with loops, dropped_segments, redecoded_seconds,
+            skipped_seconds (looping audio left without text) and
+            saved_seconds (estimated decode time saved)
+        options: Decoding options passed to _decode() (dict)
+        window: Number of recent segments compared
+
+    Yields:
+        dict: Records with timestamps relative to the start of samples
+    """
+    stats.update(loops=0, dropped_segments=0, redecoded_seconds=0.0, skipped_seconds=0.0, saved_seconds=0.0)
+    started = time.time()
+    duration = len(samples) / SAMPLE_RATE
+    offset = 0.0
+    while True:
+        recent = deque()
+        arrived = deque()
+        loop = None
+        for segment in segments:
+            record = _offset_record(_segment_to_record(segment), offset)
+            if not record["text"]:
+                continue
+            recent.append(record)
+            arrived.append(time.time())
+            if len(recent) > window:
+                arrived.popleft()
+                yield recent.popleft()
+            loop = _find_loop(recent)
+            if loop is not None:
+                break
+        segments.close()
+        if loop is None:
+            yield from recent
+            return
+
+        recent = list(recent)
+        kept, looping = recent[:loop + 1], recent[loop + 1:]
+        yield from kept
+        lo = kept[-1]["end"]
+        hi = max(lo, recent[-1]["end"])
+        stats["loops"] += 1
+        stats["dropped_segments"] += len(looping)
+        retry = []
+        if hi > lo:
+            retry = _redecode_window(model, samples, lo, hi, options.get("beam_size", DEFAULT_BEAM_SIZE),
+                                     options.get("word_timestamps", False),
+                                     temperature=list(LOOP_TEMPERATURES), condition_on_previous_text=False)
+            stats["redecoded_seconds"] += hi - lo
+        clean = not _still_loops(retry, looping)
+        now = time.time()
+        saved = arrived[-1] - arrived[loop]
+        if not clean:
+            stats["skipped_seconds"] += hi - lo
+            saved += (hi - lo) * (now - started) / max(hi, 1.0)
+        stats["saved_seconds"] += saved
+        print(f"  ⚠️  Repetition loop at {_format_timestamp(lo)}-{_format_timestamp(hi)} "
+              f"(\"{recent[loop]['text'][:40]}\"), {len(looping)} segments dropped, "
+              + (f"{len(retry)} re-decoded segments kept" if clean else "re-decode still loops, skipped")
+              + f", ~{saved:.0f}s of decoding saved")
+        if clean:
+            yield from retry
+
+        if hi >= duration:
+            return
+        segments, _ = _decode(model, np.asarray(samples[int(hi * SAMPLE_RATE):]), batch_size, **options)
+        if hi <= offset:
+            # No progress since the last restart, finish without the guard
+            for segment in segments:
+                record = _offset_record(_segment_to_record(segment), hi)
+                if record["text"]:
+                    yield record
+            return
+        offset = hi
+
+
+def _print_loop_stats(stats):
+    """Print what _guard_loops() did over a whole decode."""
+    if stats and stats["loops"]:
+        print(f"  Repetition loops: {stats['loops']} ({stats['dropped_segments']} segments dropped, "
+              f"{stats['redecoded_seconds']:.0f}s re-decoded, {stats['skipped_seconds']:.0f}s skipped, "
+              f"~{stats['saved_seconds']:.0f}s of decoding saved)")
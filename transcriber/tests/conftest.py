@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The transcriber modules are scripts run from their directory, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,93 @@
+"""Tests for the result cache."""
+
+import os
+
+import pytest
+
+from cache import AUDIO_CACHE_DIR, _audio_in_use, _cache_evict, _cache_get, _cache_key, _cache_put
+
+
+def _entry(path, size, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def in_use():
+    yield _audio_in_use
+    _audio_in_use.clear()
+
+
+def test_put_and_get(tmp_path):
+    key = _cache_key({"audio": "abc", "model": "tiny"})
+    assert _cache_get(tmp_path, "asr", key) is None
+    _cache_put(tmp_path, "asr", key, {"segments": 2}, iter([{"text": "a"}, {"text": "b"}]), 1 << 20)
+    assert _cache_get(tmp_path, "asr", key) == ({"segments": 2}, [{"text": "a"}, {"text": "b"}])
+
+
+def test_key_ignores_option_order():
+    assert _cache_key({"a": 1, "b": 2}) == _cache_key({"b": 2, "a": 1})
+    assert _cache_key({"a": 1}) != _cache_key({"a": 2})
+
+
+def test_get_marks_entry_as_used(tmp_path):
+    key = _cache_key({})
+    _cache_put(tmp_path, "asr", key, {}, [], 1 << 20)
+    path = tmp_path / "asr" / f"{key}.jsonl.gz"
+    os.utime(path, (1, 1))
+    _cache_get(tmp_path, "asr", key)
+    assert path.stat().st_mtime > 1
+
+
+def test_evict_least_recently_used_first(tmp_path):
+    oldest = _entry(tmp_path / "asr" / "a.jsonl.gz", 100, 1)
+    audio = _entry(tmp_path / AUDIO_CACHE_DIR / "a.pcm16k.f32", 100, 2)
+    newest = _entry(tmp_path / "diarization" / "b.jsonl.gz", 100, 3)
+
+    _cache_evict(tmp_path, 250)
+    assert not oldest.exists()
+    assert audio.exists() and newest.exists()
+
+    _cache_evict(tmp_path, 100)
+    assert not audio.exists()
+    assert newest.exists()
+
+
+def test_evict_keeps_audio_in_use_out_of_the_budget(tmp_path, in_use):
+    audio = _entry(tmp_path / AUDIO_CACHE_DIR / "a.pcm16k.f32", 300, 1)
+    entry = _entry(tmp_path / "asr" / "a.jsonl.gz", 100, 2)
+    in_use.add(audio)
+
+    _cache_evict(tmp_path, 150)
+    assert audio.exists() and entry.exists()
+    _cache_evict(tmp_path, 50)
+    assert audio.exists()
+    assert not entry.exists()
+
+
+def test_put_survives_audio_in_use_over_the_budget(tmp_path, in_use, capsys):
+    in_use.add(_entry(tmp_path / AUDIO_CACHE_DIR / "a.pcm16k.f32", 3000, 1))
+    key = _cache_key({"audio": "a"})
+    _cache_put(tmp_path, "diarization", key, {}, [{"speaker": "SPEAKER_00"}], 2000)
+    assert _cache_get(tmp_path, "diarization", key) == ({}, [{"speaker": "SPEAKER_00"}])
+    assert "alone exceeds the cache size" in capsys.readouterr().out
+
+
+def test_put_never_evicts_its_own_entry(tmp_path):
+    key = _cache_key({"audio": "b"})
+    _cache_put(tmp_path, "asr", key, {}, [{"text": "x" * 100}], 10)
+    assert _cache_get(tmp_path, "asr", key) is not None
+
+
+def test_evict_ignores_unfinished_entries(tmp_path):
+    tmp_entry = _entry(tmp_path / "asr" / "a.jsonl.gz.tmp", 100, 1)
+    _cache_evict(tmp_path, 0)
+    assert tmp_entry.exists()
+
+
+def test_evict_skips_audio_being_written(tmp_path):
+    partial = _entry(tmp_path / AUDIO_CACHE_DIR / "a.pcm16k.f32.tmp", 100, 1)
+    _cache_evict(tmp_path, 0)
+    assert partial.exists()
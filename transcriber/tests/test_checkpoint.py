@@ -0,0 +1,72 @@
+"""Tests for resuming an interrupted run from its checkpoints."""
+
+import numpy as np
+import pytest
+
+from common import _write_json_atomic
+from transcribe import SpeechMap, _resume_from_checkpoint, _write_journal
+
+HEADER = {"audio_hash": "abc", "asr": {"model": "medium", "beam_size": 5}}
+DIARIZATION_HEADER = {"audio_hash": "abc", "diarization": {"min_speakers": None}}
+RECORDS = [{"start": 8.0, "end": 12.0, "text": "Dobrý den."}, {"start": 31.0, "end": 33.5, "text": "Začínáme."}]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        "checkpoint_path": tmp_path / "x.txt.checkpoint.json",
+        "diarization_checkpoint_path": tmp_path / "x.txt.diarization.json",
+        "journal_path": tmp_path / "x.txt.journal.jsonl",
+    }
+
+
+def _resume(paths, speech_map=None):
+    return _resume_from_checkpoint(HEADER, paths["checkpoint_path"], DIARIZATION_HEADER,
+                                   paths["diarization_checkpoint_path"], paths["journal_path"], speech_map)
+
+
+def test_nothing_to_resume(paths):
+    assert _resume(paths) == (None, None, 0.0)
+
+
+def test_continues_after_last_journal_segment(paths):
+    _write_json_atomic(paths["checkpoint_path"], HEADER)
+    _write_journal(RECORDS, paths["journal_path"])
+    assert _resume(paths) == (None, None, 33.5)
+
+
+def test_continues_on_compacted_timeline_with_vad(paths):
+    _write_json_atomic(paths["checkpoint_path"], HEADER)
+    _write_journal(RECORDS, paths["journal_path"])
+    # Speech at 5-15s and 30-40s, 0-10s and 10-20s when compacted
+    speech_map = SpeechMap(compact_starts=np.array([0.0, 10.0]), original_starts=np.array([5.0, 30.0]))
+    assert _resume(paths, speech_map) == (None, None, 13.5)
+
+
+def test_reuses_finished_stages(paths):
+    info = {"language": "cs", "language_probability": 0.99, "duration": 40.0}
+    _write_json_atomic(paths["checkpoint_path"], dict(HEADER, info=info))
+    _write_journal(RECORDS, paths["journal_path"])
+    _write_json_atomic(paths["diarization_checkpoint_path"],
+                       dict(DIARIZATION_HEADER, turns=[[0.0, 12.0, "SPEAKER_00"], [30.0, 40.0, "SPEAKER_01"]]))
+
+    assert _resume(paths) == (info, [(0.0, 12.0, "SPEAKER_00"), (30.0, 40.0, "SPEAKER_01")], 0.0)
+
+
+def test_mismatched_header_starts_over(paths, capsys):
+    _write_json_atomic(paths["checkpoint_path"], dict(HEADER, asr={"model": "large-v3", "beam_size": 5},
+                                                      info={"language": "cs"}))
+    _write_journal(RECORDS, paths["journal_path"])
+    _write_json_atomic(paths["diarization_checkpoint_path"],
+                       dict(DIARIZATION_HEADER, audio_hash="def", turns=[[0.0, 12.0, "SPEAKER_00"]]))
+
+    assert _resume(paths) == (None, None, 0.0)
+    assert "does not match audio or parameters, starting over" in capsys.readouterr().out
+
+
+def test_half_written_journal_line_is_dropped(paths):
+    _write_json_atomic(paths["checkpoint_path"], HEADER)
+    _write_journal(RECORDS, paths["journal_path"])
+    with open(paths["journal_path"], "a", encoding="utf-8") as f:
+        f.write('{"start": 40.0, "end": 4')
+    assert _resume(paths) == (None, None, 33.5)
@@ -0,0 +1,112 @@
+"""Tests for splitting audio into chunks and stitching their transcripts."""
+
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+import transcribe
+from common import SAMPLE_RATE, SPLIT_FRAME, _find_split_points
+from transcribe import CHUNK_PADDING, _stitch_chunks, _transcribe_chunk
+
+Segment = namedtuple("Segment", ["start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio",
+                                 "words"])
+Info = namedtuple("Info", ["language", "language_probability"])
+
+SENTENCE = 3.0
+
+
+def _record(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+class FakeModel:
+    """
+    Whisper stand-in hearing a sentence every SENTENCE seconds.
+
+    Samples hold their own index, so a decode knows where its audio starts;
+    sentences cut by the edge of the audio are clipped to it.
+    """
+
+    def transcribe(self, audio, language, **options):
+        offset = float(audio[0]) / SAMPLE_RATE
+        end = offset + len(audio) / SAMPLE_RATE
+        segments = []
+        for t in np.arange(offset - offset % SENTENCE, end, SENTENCE):
+            lo, hi = max(t, offset), min(t + SENTENCE, end)
+            segments.append(Segment(lo - offset, hi - offset, f"Věta {t:g}.", -0.3, 0.01, 1.5, None))
+        return (segment for segment in segments), Info("cs", 0.99)
+
+
+def _noise(seconds, seed=0):
+    return np.random.default_rng(seed).uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def test_stitch_drops_overlapping_duplicates_only():
+    chunks = [
+        [_record(0.0, 3.0, "Dobrý den."), _record(3.0, 6.0, "Začínáme.")],
+        # Decoded again from the padding of the next chunk
+        [_record(5.0, 6.0, "Začínáme."), _record(6.0, 9.0, "Bod jedna.")],
+        # Same text said again later is kept, as is different text overlapping
+        [_record(9.0, 12.0, "Bod jedna."), _record(11.0, 13.0, "Ano.")],
+    ]
+    assert [(r["start"], r["text"]) for r in _stitch_chunks(chunks)] == [
+        (0.0, "Dobrý den."), (3.0, "Začínáme."), (6.0, "Bod jedna."), (9.0, "Bod jedna."), (11.0, "Ano.")]
+
+
+def test_stitch_skips_empty_chunks():
+    chunks = [[_record(0.0, 3.0, "Ano.")], [], [_record(2.0, 4.0, "Ano."), _record(4.0, 5.0, "Ne.")]]
+    assert [r["text"] for r in _stitch_chunks(chunks)] == ["Ano.", "Ne."]
+
+
+@pytest.mark.parametrize("loop_guard", [False, True])
+def test_chunk_boundary_segment_is_owned_by_its_midpoint(monkeypatch, loop_guard):
+    total = 30.0
+    samples = np.arange(int(total * SAMPLE_RATE), dtype=np.float32)
+    monkeypatch.setattr(transcribe, "_chunk_model", FakeModel())
+    monkeypatch.setattr(transcribe, "_load_pcm", lambda path: samples)
+
+    split = 16.0
+    chunks = []
+    for keep_start, keep_end in [(0.0, split), (split, total)]:
+        start = int(max(0.0, keep_start - CHUNK_PADDING) * SAMPLE_RATE)
+        end = int(min(total, keep_end + CHUNK_PADDING) * SAMPLE_RATE)
+        records, language, _, loop_stats = _transcribe_chunk("x.pcm", start, end, keep_start, keep_end,
+                                                             loop_guard=loop_guard)
+        assert language == "cs"
+        assert (loop_stats is not None) == loop_guard
+        chunks.append(records)
+
+    # The sentence at 15-18s is decoded by both chunks, only the second keeps it
+    assert chunks[0][-1]["text"] == "Věta 12."
+    assert chunks[1][0]["text"] == "Věta 15."
+    stitched = list(_stitch_chunks(chunks))
+    assert [r["text"] for r in stitched] == [f"Věta {t}." for t in range(0, 30, 3)]
+    assert [r["start"] for r in stitched] == [float(t) for t in range(0, 30, 3)]
+
+
+def test_split_points_land_in_silence():
+    samples = _noise(100.0)
+    silences = [(38.0, 39.0), (71.5, 72.5)]
+    for lo, hi in silences:
+        samples[int(lo * SAMPLE_RATE):int(hi * SAMPLE_RATE)] = 0.0
+
+    bounds = _find_split_points(samples, 3, search_window=20)
+    assert bounds[0] == 0 and bounds[-1] == len(samples)
+    assert len(bounds) == 4
+    for bound, (lo, hi) in zip(bounds[1:-1], silences):
+        assert lo <= bound / SAMPLE_RATE <= hi
+
+
+def test_split_points_stay_within_search_window():
+    samples = _noise(100.0)
+    # Silence too far from the middle to be found
+    samples[int(5.0 * SAMPLE_RATE):int(6.0 * SAMPLE_RATE)] = 0.0
+    bounds = _find_split_points(samples, 2, search_window=10)
+    assert 40.0 <= bounds[1] / SAMPLE_RATE <= 60.0
+
+
+def test_split_points_of_short_audio():
+    samples = _noise(SPLIT_FRAME)
+    assert _find_split_points(samples, 4) == [0, len(samples)]
+    assert _find_split_points(_noise(10.0), 1) == [0, 10 * SAMPLE_RATE]
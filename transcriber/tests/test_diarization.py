@@ -0,0 +1,46 @@
+"""Tests for linking speakers across diarization windows."""
+
+import numpy as np
+
+from diarization import _link_window_speakers
+
+ALICE = np.array([1.0, 0.0, 0.0])
+BOB = np.array([0.0, 1.0, 0.0])
+CAROL = np.array([0.0, 0.0, 1.0])
+
+
+def test_same_voice_in_different_windows_is_linked():
+    mapping = _link_window_speakers([
+        {"SPEAKER_00": ALICE, "SPEAKER_01": BOB},
+        {"SPEAKER_00": BOB + 0.1, "SPEAKER_01": ALICE + 0.1},
+    ])
+    assert mapping == [
+        {"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"},
+        {"SPEAKER_00": "SPEAKER_01", "SPEAKER_01": "SPEAKER_00"},
+    ]
+
+
+def test_speakers_of_one_window_are_never_merged():
+    mapping = _link_window_speakers([{"SPEAKER_00": ALICE, "SPEAKER_01": ALICE}])
+    assert mapping == [{"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"}]
+
+
+def test_dissimilar_speakers_stay_apart():
+    mapping = _link_window_speakers([{"SPEAKER_00": ALICE}, {"SPEAKER_00": CAROL}], threshold=0.6)
+    assert mapping == [{"SPEAKER_00": "SPEAKER_00"}, {"SPEAKER_00": "SPEAKER_01"}]
+
+
+def test_average_linkage_across_three_windows():
+    # The third window's voice is close to the first two only on average
+    mapping = _link_window_speakers([
+        {"SPEAKER_00": ALICE},
+        {"SPEAKER_00": ALICE + 0.2 * BOB},
+        {"SPEAKER_00": ALICE + 0.5 * BOB, "SPEAKER_01": CAROL},
+    ])
+    assert [m["SPEAKER_00"] for m in mapping] == ["SPEAKER_00"] * 3
+    assert mapping[2]["SPEAKER_01"] == "SPEAKER_01"
+
+
+def test_windows_without_speakers():
+    assert _link_window_speakers([{}, {}]) == [{}, {}]
+    assert _link_window_speakers([{}, {"SPEAKER_00": ALICE}]) == [{}, {"SPEAKER_00": "SPEAKER_00"}]
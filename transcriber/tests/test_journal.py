@@ -0,0 +1,43 @@
+"""Tests for the segment journal of streaming runs."""
+
+import json
+
+from transcribe import _read_journal, _recover_journal, _write_journal
+
+RECORDS = [{"start": 0.0, "end": 2.5, "text": "Dobrý den."}, {"start": 2.5, "end": 4.0, "text": "Začínáme."}]
+
+
+def test_read_journal_skips_blank_lines(tmp_path):
+    path = tmp_path / "x.journal.jsonl"
+    _write_journal(RECORDS, path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert list(_read_journal(path)) == RECORDS
+
+
+def test_write_journal_appends(tmp_path):
+    path = tmp_path / "x.journal.jsonl"
+    assert _write_journal(RECORDS[:1], path) == 1
+    assert _write_journal(RECORDS[1:], path, append=True) == 1
+    assert list(_read_journal(path)) == RECORDS
+
+
+def test_recover_journal_drops_half_written_line(tmp_path):
+    path = tmp_path / "x.journal.jsonl"
+    _write_journal(RECORDS, path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"start": 4.0, "end": 6.0, "text": "Bod"})[:20])
+
+    assert _recover_journal(path) == (2, 4.0)
+    assert list(_read_journal(path)) == RECORDS
+    # Appending continues after the last complete record
+    _write_journal([{"start": 4.0, "end": 6.0, "text": "Bod"}], path, append=True)
+    assert len(list(_read_journal(path))) == 3
+
+
+def test_recover_missing_or_empty_journal(tmp_path):
+    path = tmp_path / "x.journal.jsonl"
+    assert _recover_journal(path) == (0, 0.0)
+    path.write_text("{\"start\": 0", encoding="utf-8")
+    assert _recover_journal(path) == (0, 0.0)
+    assert path.read_text(encoding="utf-8") == ""
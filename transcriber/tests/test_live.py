@@ -0,0 +1,37 @@
+"""Tests for merging rolling diarization passes of live mode."""
+
+from live import _merge_live_turns
+
+TURNS = [(0.0, 10.0, "SPEAKER_00"), (10.0, 20.0, "SPEAKER_01")]
+
+
+def test_local_labels_follow_the_context_overlap():
+    speakers = ["SPEAKER_00", "SPEAKER_01"]
+    new_turns = [(2.0, 9.0, "A"), (9.0, 24.0, "B"), (24.0, 30.0, "A")]
+    turns = _merge_live_turns(list(TURNS), new_turns, 20.0, speakers)
+    assert turns == TURNS + [(20.0, 24.0, "SPEAKER_01"), (24.0, 30.0, "SPEAKER_00")]
+    assert speakers == ["SPEAKER_00", "SPEAKER_01"]
+
+
+def test_unmatched_label_becomes_new_speaker():
+    speakers = ["SPEAKER_00", "SPEAKER_01"]
+    new_turns = [(12.0, 20.0, "A"), (21.0, 25.0, "C")]
+    turns = _merge_live_turns(list(TURNS), new_turns, 20.0, speakers)
+    assert turns[len(TURNS):] == [(21.0, 25.0, "SPEAKER_02")]
+    assert speakers == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+
+
+def test_global_label_is_matched_only_once():
+    speakers = ["SPEAKER_00", "SPEAKER_01"]
+    # Both local labels overlap SPEAKER_01 most; the larger overlap gets it
+    new_turns = [(10.0, 13.0, "A"), (13.0, 20.0, "B"), (20.0, 22.0, "A"), (22.0, 26.0, "B")]
+    turns = _merge_live_turns(list(TURNS), new_turns, 20.0, speakers)
+    assert turns[len(TURNS):] == [(20.0, 22.0, "SPEAKER_02"), (22.0, 26.0, "SPEAKER_01")]
+    assert speakers == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+
+
+def test_first_pass_without_context():
+    speakers = []
+    turns = _merge_live_turns([], [(0.0, 5.0, "A"), (5.0, 9.0, "B")], 0.0, speakers)
+    assert turns == [(0.0, 5.0, "SPEAKER_00"), (5.0, 9.0, "SPEAKER_01")]
+    assert speakers == ["SPEAKER_00", "SPEAKER_01"]
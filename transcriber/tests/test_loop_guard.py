@@ -0,0 +1,165 @@
+"""Tests for the hallucination loop guard."""
+
+from collections import namedtuple
+
+import numpy as np
+
+from common import SAMPLE_RATE
+from loop_guard import (LOOP_COMPRESSION, LOOP_SEGMENTS, LOOP_TEMPERATURES, _find_loop, _guard_loops,
+                        _ngram_hashes, _still_loops)
+
+Segment = namedtuple("Segment", ["start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio",
+                                 "words"])
+
+LOOP_TEXT = "Děkuji, děkuji vám všem."
+
+
+def _record(text, start=0.0, compression_ratio=1.5):
+    return {"start": start, "end": start + 2.0, "text": text, "avg_logprob": -0.3, "no_speech_prob": 0.01,
+            "compression_ratio": compression_ratio}
+
+
+def _sentence(t):
+    return f"Bod {int(t)} jednání rady města."
+
+
+class FakeModel:
+    """
+    Whisper stand-in producing a 2s segment per 2s of audio.
+
+    Samples hold their own index, so a decode knows where its audio starts.
+    A decode conditioned on the previous text that starts before
+    `loop_start` repeats LOOP_TEXT from there on; with `retry_loops` the
+    unconditioned re-decode does too.
+    """
+
+    def __init__(self, loop_start=None, retry_loops=False):
+        self.loop_start = loop_start
+        self.retry_loops = retry_loops
+        self.calls = []
+
+    def transcribe(self, audio, language, condition_on_previous_text=True, **options):
+        offset = float(audio[0]) / SAMPLE_RATE
+        self.calls.append((offset, condition_on_previous_text, options))
+        looping = self.loop_start is not None and (
+            self.retry_loops if not condition_on_previous_text else offset < self.loop_start)
+        return self._segments(offset, len(audio) / SAMPLE_RATE, looping), None
+
+    def _segments(self, offset, duration, looping):
+        for start in np.arange(0.0, duration, 2.0):
+            t = offset + start
+            text = LOOP_TEXT if looping and t >= self.loop_start else _sentence(t)
+            yield Segment(start, min(start + 2.0, duration), text, -0.3, 0.01, 1.5, None)
+
+
+def _samples(seconds):
+    return np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def _guard(model, seconds):
+    samples = _samples(seconds)
+    stats = {}
+    segments, _ = model.transcribe(samples, "cs")
+    records = list(_guard_loops(segments, model, samples, 0, stats, {"beam_size": 5}))
+    return records, stats
+
+
+def test_ngram_hashes_roll_over_the_words():
+    words = "a b c d a b c".split()
+    hashes = _ngram_hashes(words, n=3)
+    assert len(hashes) == 5
+    assert hashes == [_ngram_hashes(words[i:i + 3], n=3)[0] for i in range(5)]
+    assert hashes[0] == hashes[4]
+    assert len(set(hashes[:4])) == 4
+
+
+def test_ngram_hashes_of_short_input():
+    assert _ngram_hashes(["a", "b"], n=3) == []
+    assert _ngram_hashes([], n=3) == []
+
+
+def test_no_loop_in_varied_speech():
+    assert _find_loop([_record(_sentence(t)) for t in range(LOOP_SEGMENTS)]) is None
+
+
+def test_loop_starts_at_first_repeated_ngram():
+    records = [_record(_sentence(0))] + [_record("Děkuji vám všem za pozornost a přeji hezký den.")] * 4
+    assert _find_loop(records) == 1
+    # Most n-grams must repeat, a phrase said twice is no loop
+    assert _find_loop(records[:3] + [_record(_sentence(t)) for t in range(2, 8, 2)]) is None
+
+
+def test_loop_within_one_segment():
+    assert _find_loop([_record(_sentence(0)), _record(" ".join([LOOP_TEXT] * 6))]) == 1
+
+
+def test_short_repeated_answers_are_no_loop():
+    assert _find_loop([_record("Ano.")] * LOOP_SEGMENTS) is None
+
+
+def test_loop_by_compression_ratio():
+    records = [_record(_sentence(t), compression_ratio=LOOP_COMPRESSION + 0.1) for t in range(LOOP_SEGMENTS)]
+    assert _find_loop(records) == 0
+    assert _find_loop(records[:-1]) is None
+
+
+def test_still_loops_for_any_number_of_segments():
+    looping = [_record(LOOP_TEXT)] * 3
+    assert _still_loops([_record(LOOP_TEXT)], looping)
+    assert _still_loops([_record("vám všem děkuji děkuji vám")], looping)
+    assert _still_loops([_record(_sentence(0), compression_ratio=LOOP_COMPRESSION + 0.1)], looping)
+    assert not _still_loops([_record(_sentence(0))], looping)
+    assert not _still_loops([], looping)
+
+
+def test_guard_passes_clean_decode_through():
+    records, stats = _guard(FakeModel(), 30)
+    assert [r["text"] for r in records] == [_sentence(t) for t in range(0, 30, 2)]
+    assert stats == {"loops": 0, "dropped_segments": 0, "redecoded_seconds": 0.0, "skipped_seconds": 0.0,
+                     "saved_seconds": 0.0}
+
+
+def test_guard_redecodes_loop_and_resumes_after_it():
+    model = FakeModel(loop_start=10.0)
+    records, stats = _guard(model, 40)
+
+    texts = [r["text"] for r in records]
+    assert texts.count(LOOP_TEXT) == 1
+    # Every 2s of audio is transcribed exactly once
+    assert [r["start"] for r in records] == list(np.arange(0.0, 40.0, 2.0))
+    assert texts == [_sentence(t) for t in range(0, 10, 2)] + [LOOP_TEXT] + [_sentence(t) for t in range(12, 40, 2)]
+
+    (_, _, _), (retry_offset, retry_conditioned, retry_options), (resume_offset, resume_conditioned, _) = model.calls
+    assert (retry_offset, retry_conditioned) == (12.0, False)
+    assert retry_options["temperature"] == list(LOOP_TEMPERATURES)
+    assert resume_conditioned
+    assert stats["loops"] == 1
+    assert stats["redecoded_seconds"] == resume_offset - retry_offset
+    assert stats["dropped_segments"] == stats["redecoded_seconds"] / 2
+    assert stats["skipped_seconds"] == 0.0
+    assert stats["saved_seconds"] >= 0.0
+
+
+def test_guard_skips_window_whose_redecode_still_loops():
+    model = FakeModel(loop_start=10.0, retry_loops=True)
+    records, stats = _guard(model, 40)
+
+    texts = [r["text"] for r in records]
+    assert texts.count(LOOP_TEXT) == 1
+    resume_offset = model.calls[-1][0]
+    assert stats["skipped_seconds"] == resume_offset - 12.0
+    assert stats["saved_seconds"] >= 0.0
+    # Audio after the skipped window is still transcribed
+    assert [r["start"] for r in records if r["start"] >= resume_offset] == list(np.arange(resume_offset, 40.0, 2.0))
+
+
+def test_guard_estimates_decode_time_saved(monkeypatch):
+    # One clock tick per reading: each segment takes 1s to decode
+    clock = iter(range(10 ** 6))
+    monkeypatch.setattr("loop_guard.time.time", lambda: float(next(clock)))
+    _, stats = _guard(FakeModel(loop_start=10.0), 40)
+    assert stats["saved_seconds"] == stats["dropped_segments"]
+
+    clock = iter(range(10 ** 6))
+    _, skipped = _guard(FakeModel(loop_start=10.0, retry_loops=True), 40)
+    assert skipped["saved_seconds"] > skipped["dropped_segments"]
@@ -0,0 +1,116 @@
+"""Tests for re-decoding low-confidence segments with a bigger model."""
+
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+import transcribe
+from common import SAMPLE_RATE
+from transcribe import REDECODE_PADDING, _redecode_low_confidence, _run_redecode
+
+Segment = namedtuple("Segment", ["start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio",
+                                 "words"])
+
+THRESHOLDS = {"avg_logprob": -1.0, "no_speech_prob": 0.6, "compression_ratio": 2.4}
+DURATION = 20.0
+
+
+def _record(start, end, low=False):
+    return {"start": start, "end": end, "text": f"Slovo {start:g}", "avg_logprob": -2.0 if low else -0.3,
+            "no_speech_prob": 0.01, "compression_ratio": 1.5}
+
+
+class FakeModel:
+    """
+    Bigger Whisper stand-in splitting every window into two segments.
+
+    Samples hold their own index, so a decode knows which window it got.
+    """
+
+    def __init__(self):
+        self.windows = []
+
+    def transcribe(self, audio, language, beam_size, word_timestamps=False, **options):
+        lo = float(audio[0]) / SAMPLE_RATE
+        span = len(audio) / SAMPLE_RATE
+        self.windows.append((lo, lo + span))
+        half = span / 2
+        return iter([Segment(0.0, half, f"Nově {lo:g}a", -0.2, 0.01, 1.4, None),
+                     Segment(half, span, f"Nově {lo:g}b", -0.2, 0.01, 1.4, None)]), None
+
+
+def _samples(seconds=DURATION):
+    return np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def _redecode(records, model=None):
+    model = model or FakeModel()
+    stats = {}
+    out = list(_redecode_low_confidence(iter(records), model, _samples(), THRESHOLDS, stats))
+    return out, stats, model
+
+
+def test_kept_segments_pass_through_untouched():
+    records = [_record(t, t + 2.0) for t in range(0, 20, 2)]
+    out, stats, model = _redecode(records)
+    assert out == records
+    assert model.windows == []
+    assert stats == {"segments": 10, "windows": 0, "redecoded_segments": 0, "redecoded_seconds": 0.0,
+                     "new_segments": 0}
+
+
+def test_run_is_spliced_between_its_neighbours():
+    records = [_record(0.0, 2.0), _record(2.0, 4.0, low=True), _record(4.0, 6.0, low=True), _record(6.0, 8.0)]
+    out, stats, model = _redecode(records)
+
+    # Padding never reaches into the kept segments on either side
+    assert model.windows == [(2.0, 6.0)]
+    assert [r["text"] for r in out] == ["Slovo 0", "Nově 2a", "Nově 2b", "Slovo 6"]
+    assert [(r["start"], r["end"]) for r in out[1:3]] == [(2.0, 4.0), (4.0, 6.0)]
+    assert out[0] is records[0] and out[-1] is records[-1]
+    assert stats == {"segments": 4, "windows": 1, "redecoded_segments": 2, "redecoded_seconds": 4.0,
+                     "new_segments": 2}
+
+
+def test_window_is_padded_into_gaps():
+    records = [_record(0.0, 2.0), _record(4.0, 6.0, low=True), _record(9.0, 11.0)]
+    _, stats, model = _redecode(records)
+    assert model.windows == [(4.0 - REDECODE_PADDING, 6.0 + REDECODE_PADDING)]
+    assert stats["redecoded_seconds"] == pytest.approx(2.0 + 2 * REDECODE_PADDING)
+
+
+def test_separate_runs_get_separate_windows():
+    records = [_record(0.0, 2.0, low=True), _record(2.0, 4.0), _record(4.0, 6.0, low=True), _record(6.0, 8.0)]
+    out, stats, model = _redecode(records)
+    assert model.windows == [(0.0, 2.0), (4.0, 6.0)]
+    assert [r["text"] for r in out] == ["Nově 0a", "Nově 0b", "Slovo 2", "Nově 4a", "Nově 4b", "Slovo 6"]
+    assert stats["windows"] == 2
+
+
+def test_trailing_run_is_flushed_up_to_the_end_of_audio():
+    records = [_record(0.0, 2.0), _record(18.0, DURATION - 0.2, low=True)]
+    out, stats, model = _redecode(records)
+    assert model.windows == [(18.0 - REDECODE_PADDING, DURATION)]
+    assert [r["text"] for r in out][1:] == ["Nově 17.5a", "Nově 17.5b"]
+    assert stats["redecoded_segments"] == 1
+
+
+def test_empty_window_keeps_the_run():
+    records = [_record(0.0, 2.0), _record(2.0, 2.0, low=True), _record(2.0, 4.0)]
+    out, stats, model = _redecode(records)
+    assert out == records
+    assert model.windows == []
+    assert stats["windows"] == 0
+
+
+def test_run_redecode_reports_share_of_audio(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(transcribe, "_load_whisper_model", lambda *args: model)
+    monkeypatch.setattr(transcribe, "_load_pcm", lambda path: _samples())
+    records = [_record(0.0, 2.0), _record(2.0, 4.0, low=True), _record(4.0, 6.0)]
+
+    out, stats, timings = _run_redecode(iter(records), "x.pcm", "large-v3", "cpu", "int8", THRESHOLDS)
+    assert [r["text"] for r in out] == ["Slovo 0", "Nově 2a", "Nově 2b", "Slovo 4"]
+    assert stats["redecoded_share"] == pytest.approx(2.0 / DURATION)
+    assert set(timings) == {"redecode_load", "redecode"}
@@ -0,0 +1,64 @@
+"""Tests for matching transcript segments to diarization turns."""
+
+from common import _assign_speakers_overlap, _build_turn_index, _find_speakers, _iter_speakers_overlap
+
+
+def _index(*turns):
+    return _build_turn_index(turns)
+
+
+def test_largest_overlap_wins():
+    index = _index((0.0, 4.0, "A"), (4.0, 10.0, "B"))
+    labels, confidences = _assign_speakers_overlap([(2.0, 8.0)], index)
+    assert labels == ["B"]
+    assert confidences == [4.0 / 6.0]
+
+
+def test_overlap_is_summed_per_speaker():
+    index = _index((0.0, 2.0, "A"), (2.0, 5.0, "B"), (5.0, 7.0, "A"))
+    assert _assign_speakers_overlap([(0.0, 7.0)], index) == (["A"], [4.0 / 7.0])
+
+
+def test_equal_overlap_goes_to_turn_that_starts_first():
+    # B ends first, so it sits at the top of the active turn heap
+    index = _index((0.0, 10.0, "A"), (1.0, 5.0, "B"))
+    assert _assign_speakers_overlap([(3.0, 5.0)], index)[0] == ["A"]
+    # Same when the earlier turn also ends first
+    index = _index((0.0, 5.0, "A"), (5.0, 10.0, "B"))
+    assert _assign_speakers_overlap([(3.0, 7.0)], index)[0] == ["A"]
+
+
+def test_no_overlap_takes_nearest_turn_with_zero_confidence():
+    index = _index((0.0, 2.0, "A"), (10.0, 12.0, "B"))
+    assert _assign_speakers_overlap([(3.0, 4.0), (7.0, 9.0)], index) == (["A", "B"], [0.0, 0.0])
+
+
+def test_no_overlap_equal_gaps_take_earlier_turn():
+    index = _index((0.0, 2.0, "A"), (6.0, 8.0, "B"))
+    assert _assign_speakers_overlap([(3.0, 5.0)], index)[0] == ["A"]
+
+
+def test_no_turns_is_unknown():
+    assert _assign_speakers_overlap([(0.0, 1.0)], _index()) == (["UNKNOWN"], [0.0])
+
+
+def test_shares_of_every_overlapping_speaker():
+    index = _index((0.0, 3.0, "A"), (3.0, 4.0, "B"))
+    (speaker, share, shares), = _iter_speakers_overlap([(0.0, 4.0)], index, with_shares=True)
+    assert (speaker, share) == ("A", 0.75)
+    assert shares == {"A": 0.75, "B": 0.25}
+
+
+def test_zero_length_segment_inside_turn():
+    index = _index((0.0, 3.0, "A"))
+    assert _assign_speakers_overlap([(1.0, 1.0)], index) == (["A"], [1.0])
+
+
+def test_find_speakers_matches_first_turn_in_start_order():
+    index = _index((5.0, 9.0, "B"), (0.0, 6.0, "A"))
+    assert _find_speakers([1.0, 5.5, 8.0, 9.5], index) == ["A", "A", "B", "UNKNOWN"]
+
+
+def test_zero_length_segment_tie_goes_to_turn_that_starts_first():
+    index = _index((0.0, 9.0, "A"), (2.0, 4.0, "B"))
+    assert _assign_speakers_overlap([(3.0, 3.0)], index) == (["A"], [1.0])
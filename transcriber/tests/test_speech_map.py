@@ -0,0 +1,48 @@
+"""Tests for mapping times between the VAD-compacted and the original timeline."""
+
+import numpy as np
+import pytest
+
+from transcribe import SpeechMap, _map_records, _to_compact_time, _to_original_time
+
+# Speech at 5-15s and 30-40s of the recording, 0-10s and 10-20s when compacted
+SPEECH_MAP = SpeechMap(compact_starts=np.array([0.0, 10.0]), original_starts=np.array([5.0, 30.0]))
+EMPTY_MAP = SpeechMap(compact_starts=np.array([]), original_starts=np.array([]))
+
+
+def test_to_original_time():
+    assert _to_original_time([0.0, 3.0, 10.0, 12.5], SPEECH_MAP).tolist() == [5.0, 8.0, 30.0, 32.5]
+
+
+def test_end_on_region_boundary_stays_in_earlier_region():
+    assert _to_original_time([10.0], SPEECH_MAP, is_end=True).tolist() == [15.0]
+    assert _to_original_time([10.0], SPEECH_MAP).tolist() == [30.0]
+
+
+def test_to_compact_time():
+    assert _to_compact_time(8.0, SPEECH_MAP) == 3.0
+    assert _to_compact_time(32.5, SPEECH_MAP) == 12.5
+
+
+def test_to_compact_time_outside_speech():
+    assert _to_compact_time(2.0, SPEECH_MAP) == 0.0
+    # Removed silence snaps to the start of the next region
+    assert _to_compact_time(20.0, SPEECH_MAP) == 10.0
+    assert _to_compact_time(45.0, SPEECH_MAP) == 25.0
+
+
+@pytest.mark.parametrize("time_s", [0.0, 4.0, 9.5, 10.0, 17.0])
+def test_round_trip(time_s):
+    assert _to_compact_time(float(_to_original_time([time_s], SPEECH_MAP)[0]), SPEECH_MAP) == time_s
+
+
+def test_empty_map_is_identity():
+    assert _to_original_time([1.0, 2.0], EMPTY_MAP).tolist() == [1.0, 2.0]
+    assert _to_compact_time(7.0, EMPTY_MAP) == 7.0
+
+
+def test_map_records_moves_words_too():
+    record = {"start": 9.0, "end": 10.0, "text": "x", "words": [[9.0, 10.0, "x", 0.9]]}
+    mapped, = _map_records([record], SPEECH_MAP)
+    assert (mapped["start"], mapped["end"]) == (14.0, 15.0)
+    assert mapped["words"] == [[14.0, 15.0, "x", 0.9]]
@@ -0,0 +1,68 @@
+"""Tests for the word timing index written with --word-timestamps."""
+
+from collections import defaultdict
+
+from transcribe import _collect_words, _write_word_index, load_word_index, word_at, words_between
+
+# Two segments, words out of order in the second one to check sorting
+LABELED = [
+    ({"start": 0.0, "end": 2.0, "text": "Dobrý den", "words": [[0.0, 0.5, "Dobrý", 0.75], [0.5, 1.0, "den", 0.5]]},
+     "Jan_Novák", 0.9),
+    ({"start": 2.0, "end": 4.0, "text": "bez slov"}, "SPEAKER_01", 0.8),
+    ({"start": 4.0, "end": 6.0, "text": "žluťoučký kůň",
+      "words": [[5.0, 6.0, "kůň", 1.0], [4.0, 4.75, "žluťoučký", 0.25]]}, "SPEAKER_01", 0.7),
+]
+
+
+def _index(tmp_path, labeled=LABELED):
+    columns = defaultdict(list)
+    assert list(_collect_words(iter(labeled), columns)) == labeled
+    path = tmp_path / "x.txt.words.npz"
+    _write_word_index(columns, path)
+    assert not list(tmp_path.glob("*.tmp*"))
+    return load_word_index(path)
+
+
+def test_round_trip_keeps_utf8_words_and_speakers(tmp_path):
+    index = _index(tmp_path)
+    assert words_between(index, 0.0, 10.0) == [
+        (0.0, 0.5, "Dobrý", 0.75, "Jan_Novák"),
+        (0.5, 1.0, "den", 0.5, "Jan_Novák"),
+        (4.0, 4.75, "žluťoučký", 0.25, "SPEAKER_01"),
+        (5.0, 6.0, "kůň", 1.0, "SPEAKER_01"),
+    ]
+    assert list(index.segment) == [0, 0, 2, 2]
+
+
+def test_word_at(tmp_path):
+    index = _index(tmp_path)
+    assert word_at(index, 0.25)[2] == "Dobrý"
+    # A word start belongs to that word, not the one ending there
+    assert word_at(index, 0.5)[2] == "den"
+    assert word_at(index, 4.75)[2] == "žluťoučký"
+    assert word_at(index, 5.5)[2] == "kůň"
+
+
+def test_word_at_returns_none_in_pause(tmp_path):
+    index = _index(tmp_path)
+    assert word_at(index, -1.0) is None
+    assert word_at(index, 3.0) is None
+    assert word_at(index, 4.9) is None
+    assert word_at(index, 7.0) is None
+
+
+def test_words_between_is_half_open_on_start(tmp_path):
+    index = _index(tmp_path)
+    assert [w[2] for w in words_between(index, 0.5, 5.0)] == ["den", "žluťoučký"]
+    assert [w[2] for w in words_between(index, 0.25, 0.5)] == []
+    assert words_between(index, 6.0, 10.0) == []
+
+
+def test_index_without_words(tmp_path):
+    index = _index(tmp_path, LABELED[1:2])
+    assert word_at(index, 3.0) is None
+    assert words_between(index, 0.0, 10.0) == []
+
+    index = _index(tmp_path, [])
+    assert word_at(index, 0.0) is None
+    assert words_between(index, 0.0, 10.0) == []
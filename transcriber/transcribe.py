@@ -10,13 +10,44 @@ The output format is compatible with the analyzer pipeline:
 """
 
 import argparse
+import contextlib
+import difflib
+import glob
+import hashlib
+import json
+import multiprocessing
 import os
+import platform
+import resource
 import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from datetime import timedelta
+from importlib import metadata
 
-from faster_whisper import WhisperModel
-from pyannote.audio import Pipeline
+# Start of the process as far as time to first segment is concerned
+_STARTED_AT = time.time()
+
+import numpy as np
+
+from cache import (AUDIO_CACHE_DIR, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_GB, _audio_in_use, _cache_get, _cache_key,
+                   _cache_put)
+from common import (ATTRIBUTION_MODES, DEFAULT_BEAM_SIZE, JobCancelled, LANGUAGE, PCM_SUFFIX, SAMPLE_RATE,
+                    _build_turn_index, _cancellable, _check_cancelled, _decode, _decode_audio_cached, _file_hash,
+                    _find_split_points, _format_timestamp, _label_records, _load_pcm, _load_whisper_model, _model_dir,
+                    _offset_record, _read_json, _redecode_window, _segment_to_record, _status_path, _transcript_entry,
+                    _write_json_atomic, _write_status)
+from daemon import DEFAULT_DAEMON_SOCKET, _daemon_request, _serve, _wait_for_job
+from diarization import (DEFAULT_SPEAKER_THRESHOLD, DIARIZATION_MODEL, DIARIZATION_RUNTIMES, PYANNOTE_CHECKPOINT,
+                         SPEAKER_EMBEDDING_MODEL, SPEAKER_SAMPLE_SECONDS, _run_diarization, _run_speaker_naming)
+from live import LIVE_WINDOW, transcribe_live
+from loop_guard import _guard_loops, _print_loop_stats
+
+# torch, pyannote.audio, faster_whisper and onnxruntime are imported by the
+# stage that needs them, so argument errors, daemon clients and --no-diarize
+# runs never pay for loading torch
 
 
 # =========================
@@ -28,144 +59,2115 @@ DEFAULT_WHISPER_MODEL = "medium"  # Options: tiny, base, small, medium, large-v2
 DEFAULT_DEVICE = "cpu"            # Options: cpu, cuda
 DEFAULT_COMPUTE_TYPE = "int8"     # Options: int8, float16, float32
 
+# Parallel chunked decoding
+CHUNKS_PER_WORKER = 2        # More chunks than workers balances uneven chunk speed
+MIN_CHUNK_LENGTH = 300       # Seconds; shorter recordings get fewer chunks
+CHUNK_PADDING = 2.0          # Seconds of context decoded on each side of a chunk
+
+# Voice activity detection (faster-whisper Silero VAD)
+DEFAULT_VAD_THRESHOLD = 0.5         # Speech probability threshold
+DEFAULT_VAD_MIN_SPEECH_MS = 250     # Shorter speech bursts are dropped
+DEFAULT_VAD_MIN_SILENCE_MS = 2000   # Shorter pauses are kept as part of speech
+DEFAULT_VAD_SPEECH_PAD_MS = 400     # Padding kept around each speech region
+
+# Batched inference (faster-whisper BatchedInferencePipeline)
+DEFAULT_BATCH_SIZE = 16
+
+# Multi-file batches: per-file status kept in <outdir>/manifest.json
+BATCH_MANIFEST = "manifest.json"
+
+# Share of CPU threads given to Whisper in concurrent mode (rest goes to pyannote)
+DEFAULT_ASR_CPU_SHARE = 0.75
+
+# Confidence-gated re-decoding with a bigger model (--redecode-model)
+DEFAULT_REDECODE_LOGPROB = -0.7        # Re-decode segments with lower avg_logprob
+DEFAULT_REDECODE_NO_SPEECH = 0.6       # ... or higher no_speech_prob
+DEFAULT_REDECODE_COMPRESSION = 2.2     # ... or higher compression ratio (repetition)
+REDECODE_PADDING = 0.5                 # Seconds of context added around each window
+
+# Progress of long transcriptions, printed and written to <output>.status.json
+PROGRESS_INTERVAL = 30       # Seconds between progress reports
+PROGRESS_WINDOW = 300        # Seconds of recent progress the rolling RTF and ETA use
+
+# Host autotuning (--autotune), profiles stored in <cache dir>/profiles/
+AUTOTUNE_SAMPLE_SECONDS = 60
+AUTOTUNE_COMPUTE_TYPES = {             # Fastest first, the last one is the accuracy reference
+    "cpu": ["int8", "float32"],
+    "cuda": ["int8", "float16", "float32"],
+}
+AUTOTUNE_BEAM_SIZES = [1, DEFAULT_BEAM_SIZE]
+AUTOTUNE_WORKERS = [2, 4]              # Concurrent decodes tried for --parallel-files
+AUTOTUNE_MIN_SIMILARITY = 0.9          # Word agreement with the reference decode to be eligible
+
+
+# =========================
+# HELPERS
+# =========================
+
+# Speech regions kept by VAD: where each region starts on the compacted
+# (speech-only) timeline and on the original recording, in seconds
+SpeechMap = namedtuple("SpeechMap", ["compact_starts", "original_starts"])
+
+
+def _journal_path(output_path):
+    """Return path of the segment journal kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".journal.jsonl")
+
+
+def _write_journal(records, journal_path, append=False):
+    """
+    Write records to the journal one line at a time.
+
+    Each line is flushed immediately, so partial results can be followed
+    while the job runs and survive a crash.
+
+    Args:
+        records: Iterable of segment records
+        journal_path: Path to journal file (JSONL)
+        append: Continue an existing journal instead of starting a new one
+
+    Returns:
+        int: Number of records written
+    """
+    count = 0
+    with open(journal_path, "a" if append else "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            count += 1
+    return count
+
+
+def _read_journal(journal_path):
+    """
+    Lazily read records from a segment journal.
+
+    Args:
+        journal_path: Path to journal file (JSONL)
+
+    Yields:
+        dict: Segment records in file order
+    """
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _recover_journal(journal_path):
+    """
+    Keep the intact part of a journal left behind by an interrupted run.
+
+    A crash can leave a half-written last line; the journal is rewritten
+    with complete records only so that appending can continue safely.
+
+    Args:
+        journal_path: Path to journal file (JSONL)
+
+    Returns:
+        tuple: (record_count, end time of the last record in seconds)
+    """
+    if not journal_path.exists():
+        return 0, 0.0
+
+    records = []
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+
+    _write_journal(records, journal_path)
+    return len(records), (records[-1]["end"] if records else 0.0)
+
+
+def _shift_records(records, offset):
+    """Lazily add `offset` seconds to record timestamps."""
+    for record in records:
+        yield _offset_record(record, offset)
+
+
+def _checkpoint_path(output_path):
+    """Return path of the transcription checkpoint kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".checkpoint.json")
+
+
+def _diarization_checkpoint_path(output_path):
+    """Return path of the diarization checkpoint kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".diarization.json")
+
+
+def _segments_path(output_path):
+    """Return path of the structured JSONL sidecar kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".segments.jsonl")
+
+
+def _jsonl_segment(record, speaker, confidence):
+    """
+    Build one structured sidecar line.
+
+    Times are rounded to milliseconds and scores to four decimals, which is
+    below the precision of either model and keeps lines short.
+
+    Returns:
+        str: Compact JSON object without trailing newline
+    """
+    line = {
+        "start": round(record["start"], 3),
+        "end": round(record["end"], 3),
+        "speaker": speaker,
+        "speaker_confidence": None if confidence is None else round(confidence, 4),
+        "text": record["text"],
+        "avg_logprob": round(record["avg_logprob"], 4),
+        "no_speech_prob": round(record["no_speech_prob"], 4),
+    }
+    if record.get("words"):
+        line["words"] = [[round(start, 3), round(end, 3), word, round(probability, 4)]
+                         for start, end, word, probability in record["words"]]
+    return json.dumps(line, ensure_ascii=False, separators=(",", ":"))
+
+
+def _write_transcript(labeled_records, output_path, segments_path=None):
+    """
+    Write labeled records in analyzer format.
+
+    Writes to a temporary file first and renames it, so a reader never
+    sees a half-written transcript.
+
+    Args:
+        labeled_records: Iterable of (record, speaker_label, confidence)
+        output_path: Path to output transcript file
+        segments_path: Also write one JSON line per segment here, see
+            _jsonl_segment() (Path)
+    """
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    segments_tmp_path = segments_path and segments_path.with_name(segments_path.name + ".tmp")
+    with contextlib.ExitStack() as stack:
+        f = stack.enter_context(open(tmp_path, "w", encoding="utf-8"))
+        segments = stack.enter_context(open(segments_tmp_path, "w", encoding="utf-8")) if segments_path else None
+        for record, speaker, confidence in labeled_records:
+            f.write(_transcript_entry(record, speaker))
+            if segments:
+                segments.write(_jsonl_segment(record, speaker, confidence) + "\n")
+    if segments_path:
+        os.replace(segments_tmp_path, segments_path)
+    os.replace(tmp_path, output_path)
+
+
+def _print_timing_report(timings, t0):
+    """
+    Print per-stage wall-clock spans and how much of them ran in parallel.
+
+    Args:
+        timings: Dict of stage name -> (start, end) in time.time() seconds
+        t0: Reference start time of the run
+    """
+    print("▶ Stage timings:")
+    spans = sorted(timings.items(), key=lambda item: item[1][0])
+    for name, (start, end) in spans:
+        print(f"  {name:<20} {start - t0:9.1f}s → {end - t0:9.1f}s  ({end - start:9.1f}s)")
+
+    # Union of stage spans vs. their sum gives the time saved by overlap
+    busy = sum(end - start for _, (start, end) in spans)
+    covered = 0.0
+    current_start = current_end = None
+    for _, (start, end) in spans:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+
+    print(f"  Stage time: {busy:.1f}s, wall time: {covered:.1f}s, overlapped: {busy - covered:.1f}s")
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size of this process (or its largest child) in MB."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def _cpu_seconds():
+    """User + system CPU time of this process and its finished children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _metrics_path(output_path):
+    """Return path of the run metrics kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".metrics.json")
+
+
+def _track_progress(records, duration, status_path=None, start_offset=0.0,
+                    interval=PROGRESS_INTERVAL, window=PROGRESS_WINDOW, timings=None):
+    """
+    Lazily pass records through while reporting decoding progress.
+
+    Progress is the end of the latest segment against the audio duration.
+    Every `interval` seconds a line with the real-time factor over the last
+    `window` seconds and the resulting ETA is printed and the same data is
+    written to status_path for external tools to poll.
+
+    Args:
+        records: Iterable of segment records in time order
+        duration: Length of the decoded audio in seconds
+        status_path: JSON status file to keep updated, None to only print
+        start_offset: Position decoding (re)started at, in seconds
+        interval: Seconds between reports
+        window: Seconds of recent progress used for the rolling RTF
+        timings: Stage timings dict, gets a zero-length "first_segment"
+            span when the first record arrives
+
+    Yields:
+        dict: The records unchanged
+    """
+    started = time.time()
+    history = deque([(started, start_offset)])
+    last_report = started
+    count = 0
+    for record in records:
+        count += 1
+        now = time.time()
+        if count == 1 and timings is not None:
+            timings["first_segment"] = (now, now)
+        if now - last_report >= interval:
+            last_report = now
+            position = record["end"]
+            history.append((now, position))
+            while len(history) > 2 and now - history[0][0] > window:
+                history.popleft()
+
+            then, then_position = history[0]
+            rtf = (now - started) / (position - start_offset) if position > start_offset else 0.0
+            rolling_rtf = (now - then) / (position - then_position) if position > then_position else rtf
+            eta = max(0.0, duration - position) * rolling_rtf
+            print(f"  {100 * position / duration:5.1f}%  {_format_timestamp(position)} / "
+                  f"{_format_timestamp(duration)}  RTF {rolling_rtf:.3f}  ETA {_format_timestamp(eta)}")
+            if status_path:
+                _write_status(status_path, "running", "transcription", position=position, duration=duration,
+                              progress=position / duration, segments=count, real_time_factor=rtf,
+                              rolling_real_time_factor=rolling_rtf, eta_seconds=eta)
+        yield record
+
+
+def _run_metrics(timings, t0, cpu_start, info, stats, turn_count):
+    """
+    Collect machine-readable metrics of a finished run.
+
+    Args:
+        timings: Dict of stage name -> (start, end) in time.time() seconds
+        t0: Start time of the run
+        cpu_start: _cpu_seconds() at the start of the run
+        info: Transcription info dict from _run_transcription()
+        stats: Labeling stats from _label_records()
+        turn_count: Number of diarization turns
+
+    Returns:
+        dict: Stage durations, throughput, counts and resource usage
+    """
+    wall = time.time() - t0
+    stages = {name: end - start for name, (start, end) in timings.items()}
+    cpu = _cpu_seconds() - cpu_start
+    duration = info["duration"]
+    return {
+        "wall_seconds": wall,
+        "stages": stages,
+        "model_load_seconds": stages.get("whisper_load", 0.0) + stages.get("diarization_load", 0.0),
+        "decode_seconds": stages.get("whisper_decode"),
+        "diarization_seconds": stages.get("diarization_run"),
+        "join_write_seconds": stages.get("join_write"),
+        "audio_duration": duration,
+        "decode_mode": info["decode_mode"],
+        "real_time_factor": info["real_time_factor"],
+        "compared_decode_modes": info.get("compared_decode_modes"),
+        "total_real_time_factor": wall / duration if duration else 0.0,
+        "segments": stats["segments"],
+        "turns": turn_count,
+        "unknown_segments": stats["unknown"],
+        "unknown_ratio": stats["unknown"] / stats["segments"] if stats["segments"] else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_children_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "cpu_seconds": cpu,
+        "cpu_utilization": cpu / (wall * (os.cpu_count() or 1)) if wall else 0.0,
+    }
+
+
+def _split_cpu_threads(asr_threads, diarization_threads):
+    """
+    Fill in unset thread counts for concurrent mode.
+
+    Args:
+        asr_threads: Whisper CPU threads (0 = derive from CPU count)
+        diarization_threads: Torch threads for pyannote (0 = derive)
+
+    Returns:
+        tuple: (asr_threads, diarization_threads)
+    """
+    total = os.cpu_count() or 2
+    if not asr_threads and not diarization_threads:
+        asr_threads = max(1, round(total * DEFAULT_ASR_CPU_SHARE))
+        diarization_threads = max(1, total - asr_threads)
+    elif not asr_threads:
+        asr_threads = max(1, total - diarization_threads)
+    elif not diarization_threads:
+        diarization_threads = max(1, total - asr_threads)
+    return asr_threads, diarization_threads
+
+
+# =========================
+# AUDIO
+# =========================
+
+def _vad_regions_path(compact_path):
+    """Return path of the speech region list kept next to VAD-compacted audio."""
+    return compact_path.with_name(compact_path.name[:-len(PCM_SUFFIX)] + ".json")
+
+
+def _apply_vad(pcm_path, vad_options, stats=None):
+    """
+    Remove non-speech from decoded audio using faster-whisper's Silero VAD.
+
+    Speech regions are concatenated into a compacted PCM file next to the
+    original one. Both the compacted audio and the region list are cached
+    by VAD parameters, so reruns skip the VAD pass.
+
+    Args:
+        pcm_path: Path to decoded PCM file
+        vad_options: Dict of faster_whisper.vad.VadOptions fields
+        stats: Dict filled with audio_seconds, speech_seconds,
+            skipped_seconds and regions, or None
+
+    Returns:
+        tuple: (compact_pcm_path, SpeechMap)
+    """
+    key = hashlib.sha256(json.dumps(vad_options, sort_keys=True).encode()).hexdigest()[:12]
+    stem = pcm_path.name[:-len(PCM_SUFFIX)] if pcm_path.name.endswith(PCM_SUFFIX) else pcm_path.stem
+    compact_path = pcm_path.with_name(f"{stem}.vad-{key}{PCM_SUFFIX}")
+    regions_path = _vad_regions_path(compact_path)
+
+    samples = _load_pcm(pcm_path)
+    if compact_path.exists() and regions_path.exists():
+        print(f"▶ Reusing voice activity regions: {regions_path}")
+        regions = json.loads(regions_path.read_text(encoding="utf-8"))
+        os.utime(compact_path)
+        os.utime(regions_path)
+    else:
+        print("▶ Detecting speech (VAD)...")
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        regions = get_speech_timestamps(np.asarray(samples), VadOptions(**vad_options))
+        regions = [[int(r["start"]), int(r["end"])] for r in regions]
+
+        tmp_path = compact_path.with_name(compact_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            for start, end in regions:
+                f.write(np.asarray(samples[start:end]).tobytes())
+        os.replace(tmp_path, compact_path)
+        regions_path.write_text(json.dumps(regions), encoding="utf-8")
+
+    lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+    compact_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(regions) else lengths
+    speech_map = SpeechMap(
+        compact_starts=compact_starts / SAMPLE_RATE,
+        original_starts=np.array([start for start, _ in regions], dtype=np.float64) / SAMPLE_RATE,
+    )
+
+    total = len(samples) / SAMPLE_RATE
+    speech = lengths.sum() / SAMPLE_RATE
+    print(f"  Speech: {speech:.0f}s of {total:.0f}s, skipped {total - speech:.0f}s "
+          f"({(total - speech) / total * 100 if total else 0:.1f}%) in {len(regions)} regions")
+    if stats is not None:
+        stats.update(audio_seconds=float(total), speech_seconds=float(speech), skipped_seconds=float(total - speech),
+                     regions=len(regions))
+    return compact_path, speech_map
+
+
+def _to_original_time(times, speech_map, is_end=False):
+    """
+    Map timestamps on the compacted (speech-only) timeline to the original.
+
+    Args:
+        times: Sequence of compacted timestamps in seconds
+        speech_map: SpeechMap from _apply_vad()
+        is_end: Timestamps are interval ends; an end exactly on a region
+            boundary stays in the earlier region
+
+    Returns:
+        np.ndarray: Original timestamps in seconds
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(speech_map.compact_starts) == 0:
+        return times
+    side = "left" if is_end else "right"
+    region = np.clip(np.searchsorted(speech_map.compact_starts, times, side=side) - 1, 0, None)
+    return speech_map.original_starts[region] + (times - speech_map.compact_starts[region])
+
+
+def _to_compact_time(time_s, speech_map):
+    """
+    Map a timestamp on the original timeline onto the compacted timeline.
+
+    Times inside removed silence snap to the start of the next region.
+
+    Args:
+        time_s: Original timestamp in seconds
+        speech_map: SpeechMap from _apply_vad()
+
+    Returns:
+        float: Compacted timestamp in seconds
+    """
+    if len(speech_map.original_starts) == 0:
+        return time_s
+    region = int(np.searchsorted(speech_map.original_starts, time_s, side="right")) - 1
+    if region < 0:
+        return 0.0
+    compact = speech_map.compact_starts[region] + (time_s - speech_map.original_starts[region])
+    if region + 1 < len(speech_map.compact_starts):
+        compact = min(compact, speech_map.compact_starts[region + 1])
+    return float(compact)
+
+
+def _map_records(records, speech_map):
+    """
+    Lazily map record timestamps back to the original timeline.
+
+    Args:
+        records: Iterable of segment records on the compacted timeline
+        speech_map: SpeechMap from _apply_vad()
+
+    Yields:
+        dict: Records with original timestamps
+    """
+    for record in records:
+        record["start"] = float(_to_original_time([record["start"]], speech_map)[0])
+        record["end"] = float(_to_original_time([record["end"]], speech_map, is_end=True)[0])
+        words = record.get("words")
+        if words:
+            starts = _to_original_time([word[0] for word in words], speech_map)
+            ends = _to_original_time([word[1] for word in words], speech_map, is_end=True)
+            for word, start, end in zip(words, starts.tolist(), ends.tolist()):
+                word[0], word[1] = start, end
+        yield record
+
+
+def _map_turns(turns, speech_map):
+    """
+    Map diarization turns back to the original timeline.
+
+    Args:
+        turns: List of (start, end, label) on the compacted timeline
+        speech_map: SpeechMap from _apply_vad()
+
+    Returns:
+        list: Turns as (start, end, label) with original timestamps
+    """
+    if not turns:
+        return turns
+    starts = _to_original_time([t[0] for t in turns], speech_map)
+    ends = _to_original_time([t[1] for t in turns], speech_map, is_end=True)
+    return [(float(start), float(end), t[2]) for start, end, t in zip(starts, ends, turns)]
+
+
+# =========================
+# WORD TIMINGS
+# =========================
+
+# Word timings loaded from <output>.words.npz: parallel arrays sorted by
+# word start, words as UTF-8 bytes in `text` sliced by `offsets`, and the
+# speaker of each word's segment via segment_speaker -> speakers
+WordIndex = namedtuple("WordIndex", ["start", "end", "probability", "segment", "offsets", "text",
+                                     "segment_speaker", "speakers"])
+
+
+def _words_path(output_path):
+    """Return path of the word timing arrays kept next to the transcript."""
+    return output_path.with_name(output_path.name + ".words.npz")
+
+
+def _collect_words(labeled_records, columns):
+    """
+    Lazily pass labeled records through, appending their words to columns.
+
+    Args:
+        labeled_records: Iterable of (record, speaker_label, confidence)
+        columns: defaultdict(list) filled with start, end, probability,
+            segment and word per word and segment_speaker per segment
+
+    Yields:
+        tuple: The labeled records unchanged
+    """
+    for segment, (record, speaker, confidence) in enumerate(labeled_records):
+        for start, end, word, probability in record.get("words", ()):
+            columns["start"].append(start)
+            columns["end"].append(end)
+            columns["probability"].append(probability)
+            columns["segment"].append(segment)
+            columns["word"].append(word)
+        columns["segment_speaker"].append(speaker)
+        yield record, speaker, confidence
+
+
+def _write_word_index(columns, path):
+    """
+    Save collected word timings as NumPy arrays with a string table.
+
+    Args:
+        columns: Columns from _collect_words()
+        path: Target .npz path, replaced atomically
+    """
+    order = np.argsort(np.asarray(columns["start"], dtype=np.float64), kind="stable")
+    encoded = [columns["word"][i].encode("utf-8") for i in order]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(word) for word in encoded], out=offsets[1:])
+    speakers, segment_speaker = np.unique(np.asarray(columns["segment_speaker"], dtype=str),
+                                          return_inverse=True)
+
+    # savez appends .npz to names without it
+    tmp_path = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(
+        tmp_path,
+        start=np.asarray(columns["start"], dtype=np.float32)[order],
+        end=np.asarray(columns["end"], dtype=np.float32)[order],
+        probability=np.asarray(columns["probability"], dtype=np.float32)[order],
+        segment=np.asarray(columns["segment"], dtype=np.int32)[order],
+        offsets=offsets,
+        text=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        segment_speaker=segment_speaker.astype(np.int32),
+        speakers=speakers,
+    )
+    os.replace(tmp_path, path)
+
+
+def load_word_index(path):
+    """
+    Load word timings written with --word-timestamps.
+
+    Args:
+        path: Path to <output>.words.npz
+
+    Returns:
+        WordIndex: Arrays for word_at() and words_between()
+    """
+    with np.load(path) as data:
+        return WordIndex(**{field: data[field] for field in WordIndex._fields})
+
+
+def _word(index, i):
+    """Return word i of a WordIndex as (start, end, word, probability, speaker)."""
+    text = index.text[index.offsets[i]:index.offsets[i + 1]].tobytes().decode("utf-8")
+    speaker = index.speakers[index.segment_speaker[index.segment[i]]]
+    return float(index.start[i]), float(index.end[i]), text, float(index.probability[i]), str(speaker)
+
+
+def word_at(index, time_s):
+    """
+    Find the word spoken at a point in time by binary search.
+
+    Args:
+        index: WordIndex from load_word_index()
+        time_s: Time on the recording timeline in seconds
+
+    Returns:
+        tuple: (start, end, word, probability, speaker) or None in a pause
+    """
+    i = int(np.searchsorted(index.start, time_s, side="right")) - 1
+    if i < 0 or index.end[i] < time_s:
+        return None
+    return _word(index, i)
+
+
+def words_between(index, start_s, end_s):
+    """
+    List the words starting within [start_s, end_s) by binary search.
+
+    Returns:
+        list: (start, end, word, probability, speaker) tuples in time order
+    """
+    lo, hi = np.searchsorted(index.start, [start_s, end_s], side="left")
+    return [_word(index, i) for i in range(lo, hi)]
+
+
+# =========================
+# MODELS
+# =========================
+
+def bundle_models(model_dir, whisper_models, hf_token):
+    """
+    Download every model a run needs into an offline bundle.
+
+    Layout (hub ids as directories, so pyannote still tells pyannote and
+    SpeechBrain embeddings apart by path):
+
+        <model_dir>/whisper/<size>/                      CTranslate2 Whisper model
+        <model_dir>/pyannote/speaker-diarization/config.yaml
+        <model_dir>/<segmentation repo>/pytorch_model.bin
+        <model_dir>/<embedding repo>/...                 pipeline embedding
+        <model_dir>/pyannote/embedding/pytorch_model.bin --speakers, --diarization-window
+
+    Args:
+        model_dir: Bundle directory, created or updated (Path)
+        whisper_models: Whisper model sizes to include (list)
+        hf_token: HuggingFace token for the gated pyannote models (str)
+    """
+    import yaml
+    from faster_whisper.utils import download_model
+    from huggingface_hub import hf_hub_download, snapshot_download
+
+    model_dir = Path(model_dir)
+    for whisper_model in whisper_models:
+        print(f"▶ Whisper {whisper_model} → {model_dir / 'whisper' / whisper_model}")
+        download_model(whisper_model, output_dir=str(model_dir / "whisper" / whisper_model))
+
+    def fetch(model_id):
+        repo_id, _, revision = model_id.partition("@")
+        target = model_dir / repo_id
+        print(f"▶ {model_id} → {target}")
+        if repo_id.startswith("pyannote/"):
+            return Path(hf_hub_download(repo_id, PYANNOTE_CHECKPOINT, revision=revision or None, token=hf_token,
+                                        local_dir=target))
+        return Path(snapshot_download(repo_id, revision=revision or None, token=hf_token, local_dir=target))
+
+    config_path = model_dir / DIARIZATION_MODEL / "config.yaml"
+    print(f"▶ {DIARIZATION_MODEL} → {config_path}")
+    config = yaml.safe_load(Path(hf_hub_download(DIARIZATION_MODEL, "config.yaml", token=hf_token))
+                            .read_text(encoding="utf-8"))
+    params = config["pipeline"]["params"]
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    for key in ("segmentation", "embedding"):
+        if isinstance(params.get(key), str):
+            params[key] = os.path.relpath(fetch(params[key]), config_path.parent)
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    fetch(SPEAKER_EMBEDDING_MODEL)
+    print(f"✅ Model bundle ready: {model_dir} (use with --model-dir, no HF_TOKEN needed)")
+
+
+# =========================
+# PIPELINE STAGES
+# =========================
+
+def _run_transcription(audio_path, whisper_model, device, compute_type, cpu_threads=0, whisper_workers=1,
+                       journal_path=None,
+                       pcm_path=None, chunk_workers=0, batch_size=0, compare_seconds=0, speech_map=None,
+                       start_offset=0.0, cancel_event=None, beam_size=DEFAULT_BEAM_SIZE, status_path=None,
+                       word_timestamps=False, loop_guard=True):
+    """
+    Load Whisper and transcribe audio to segment records.
+
+    Top-level function so it can run in a worker process.
+
+    Args:
+        audio_path: Path to input audio file
+        whisper_model: Whisper model size (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        cpu_threads: Whisper CPU threads, 0 for library default (int)
+        whisper_workers: Concurrent transcriptions the model serves (int)
+        journal_path: Stream segments to this journal instead of returning them
+        pcm_path: Decoded PCM from _decode_audio_cached(), used instead of
+            decoding audio_path again
+        chunk_workers: Decode silence-aligned chunks of pcm_path in this many
+            processes (int), see _run_transcription_parallel()
+        batch_size: Decode VAD-delimited windows in batches of this size with
+            faster-whisper's BatchedInferencePipeline; 0 = sequential (int)
+        compare_seconds: Before the full run, decode this many seconds of
+            pcm_path with both the sequential and batched path, print their
+            real-time factors and return them in info (int)
+        speech_map: SpeechMap when pcm_path holds VAD-compacted audio;
+            record timestamps are mapped back to the original timeline
+        start_offset: Resume decoding at this position of pcm_path in
+            seconds and append to the existing journal (float)
+        cancel_event: threading.Event checked between segments (in-process only)
+        beam_size: Beam search width (int)
+        status_path: Progress status file updated while decoding, see
+            _track_progress()
+        word_timestamps: Add word timings to the records (bool)
+        loop_guard: Cut hallucination loops short, see _guard_loops() (bool)
+
+    Returns:
+        tuple: (records, info, timings) - records is None when streamed to
+               the journal, info is a dict with language, duration, decode
+               mode, real-time factor, compared decode modes and the loop
+               guard stats
+
+    Raises:
+        RuntimeError: If model loading or transcription fails
+    """
+    if chunk_workers:
+        return _run_transcription_parallel(pcm_path, whisper_model, device, compute_type,
+                                           chunk_workers, cpu_threads, journal_path, speech_map,
+                                           start_offset, cancel_event, beam_size, status_path, word_timestamps,
+                                           loop_guard)
+
+    timings = {}
+
+    # Load Whisper model
+    print(f"▶ Loading Whisper model ({whisper_model})...")
+    started = time.time()
+    try:
+        model = _load_whisper_model(whisper_model, device, compute_type, cpu_threads, whisper_workers)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load Whisper model: {e}") from e
+    timings["whisper_load"] = (started, time.time())
+
+    decode_modes = None
+    if compare_seconds:
+        if pcm_path:
+            decode_modes = _compare_decode_modes(model, _load_pcm(pcm_path), compare_seconds,
+                                                 batch_size or DEFAULT_BATCH_SIZE)
+        else:
+            print("  ⚠️  Skipping decode mode comparison, it needs the decoded audio cache")
+
+    # Transcribe audio
+    mode = f"batched({batch_size})" if batch_size else "sequential"
+    print(f"▶ Transcribing audio ({mode})...")
+    started = time.time()
+    records = None
+    loop_stats = None
+    try:
+        if pcm_path:
+            audio = _load_pcm(pcm_path)
+        elif loop_guard:
+            # Restarting after a loop needs the samples, not just the path
+            from faster_whisper import decode_audio
+            audio = decode_audio(str(audio_path), sampling_rate=SAMPLE_RATE)
+        else:
+            audio = str(audio_path)
+        if start_offset:
+            print(f"  Resuming at {_format_timestamp(start_offset)}")
+            audio = audio[int(start_offset * SAMPLE_RATE):]
+        options = dict(beam_size=beam_size, word_timestamps=word_timestamps)
+        segments, info = _decode(model, audio, batch_size, **options)
+        if loop_guard:
+            loop_stats = {}
+            decoded = _guard_loops(segments, model, audio, batch_size, loop_stats, options)
+        else:
+            decoded = (_segment_to_record(segment) for segment in segments)
+            decoded = (record for record in decoded if record["text"])
+        decoded = _cancellable(decoded, cancel_event)
+        if start_offset:
+            decoded = _shift_records(decoded, start_offset)
+        decoded = _track_progress(decoded, info.duration + start_offset, status_path, start_offset,
+                                  timings=timings)
+        if speech_map is not None:
+            decoded = _map_records(decoded, speech_map)
+        if journal_path:
+            # Consume generator lazily, each segment goes straight to disk
+            print(f"  Streaming segments to {journal_path}")
+            segment_count = _write_journal(decoded, journal_path, append=bool(start_offset))
+        else:
+            # Convert generator to list to allow multiple iterations
+            records = list(decoded)
+            segment_count = len(records)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Transcription failed: {e}") from e
+    timings["whisper_decode"] = (started, time.time())
+
+    rtf = _real_time_factor(timings["whisper_decode"], info.duration)
+    print(f"  Detected language: {info.language} (probability: {info.language_probability:.2f})")
+    print(f"  Segments: {segment_count}")
+    print(f"  Real-time factor ({mode}): {rtf:.3f}")
+    _print_loop_stats(loop_stats)
+
+    info = {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration + start_offset,
+        "decode_mode": mode,
+        "real_time_factor": rtf,
+        "compared_decode_modes": decode_modes,
+        "loops": loop_stats,
+    }
+    return records, info, timings
+
+
+def _real_time_factor(span, audio_duration):
+    """Processing time divided by audio duration (lower is faster)."""
+    start, end = span
+    return (end - start) / audio_duration if audio_duration else 0.0
+
+
+def _compare_decode_modes(model, samples, seconds, batch_size):
+    """
+    Decode the same audio sample sequentially and batched, print both RTFs.
+
+    Args:
+        model: Loaded WhisperModel
+        samples: 1-D float32 PCM at SAMPLE_RATE
+        seconds: Length of the sample taken from the start of the audio
+        batch_size: Batch size for the batched path
+
+    Returns:
+        dict: Decode mode -> real-time factor
+    """
+    sample = np.asarray(samples[:int(seconds * SAMPLE_RATE)])
+    duration = len(sample) / SAMPLE_RATE
+    print(f"▶ Comparing decode modes on {duration:.0f}s of audio...")
+
+    results = {}
+    for mode, size in [("sequential", 0), (f"batched({batch_size})", batch_size)]:
+        started = time.time()
+        segments, _ = _decode(model, sample, size)
+        for _ in segments:
+            pass
+        results[mode] = _real_time_factor((started, time.time()), duration)
+
+    print(f"  {'Mode':<16} {'RTF':>8}")
+    for mode, rtf in results.items():
+        print(f"  {mode:<16} {rtf:8.3f}")
+    return results
+
+
+_chunk_model = None
+
+
+def _init_chunk_worker(whisper_model, device, compute_type, cpu_threads):
+    """Load one Whisper model per chunk worker process."""
+    global _chunk_model
+    _chunk_model = _load_whisper_model(whisper_model, device, compute_type, cpu_threads)
+
+
+def _transcribe_chunk(pcm_path, start, end, keep_start, keep_end, beam_size=DEFAULT_BEAM_SIZE,
+                      word_timestamps=False, loop_guard=True):
+    """
+    Transcribe one chunk of the decoded audio in a worker process.
+
+    The chunk is decoded with CHUNK_PADDING seconds of context on both
+    sides; only segments whose midpoint falls into [keep_start, keep_end)
+    are kept, so neighbouring chunks never emit the same segment twice.
+
+    Args:
+        pcm_path: Path to decoded PCM file
+        start: First sample of the chunk including padding
+        end: End sample of the chunk including padding
+        keep_start: Chunk start in seconds (absolute)
+        keep_end: Chunk end in seconds (absolute)
+        beam_size: Beam search width (int)
+        word_timestamps: Add word timings to the records (bool)
+        loop_guard: Cut hallucination loops short, see _guard_loops() (bool)
+
+    Returns:
+        tuple: (records, language, language_probability, loop_stats) with
+               absolute timestamps; loop_stats is None without loop_guard
+    """
+    samples = np.asarray(_load_pcm(pcm_path)[start:end])
+    offset = start / SAMPLE_RATE
+    options = dict(beam_size=beam_size, word_timestamps=word_timestamps)
+    segments, info = _decode(_chunk_model, samples, **options)
+    loop_stats = None
+    if loop_guard:
+        loop_stats = {}
+        decoded = _guard_loops(segments, _chunk_model, samples, 0, loop_stats, options)
+    else:
+        decoded = (_segment_to_record(segment) for segment in segments)
+
+    records = []
+    for record in decoded:
+        record = _offset_record(record, offset)
+        midpoint = (record["start"] + record["end"]) / 2
+        if record["text"] and keep_start <= midpoint < keep_end:
+            records.append(record)
+    return records, info.language, info.language_probability, loop_stats
+
+
+def _stitch_chunks(chunk_records):
+    """
+    Join per-chunk records in time order and drop boundary duplicates.
+
+    A segment repeating the previous segment's text while overlapping it in
+    time is a duplicate decoded from the padding of both chunks.
+
+    Args:
+        chunk_records: Iterable of record lists, one per chunk in order
+
+    Yields:
+        dict: Records with absolute timestamps
+    """
+    previous = None
+    for records in chunk_records:
+        for record in records:
+            if (previous is not None and record["text"] == previous["text"]
+                    and record["start"] < previous["end"]):
+                continue
+            previous = record
+            yield record
+
+
+def _run_transcription_parallel(pcm_path, whisper_model, device, compute_type, workers,
+                                cpu_threads=0, journal_path=None, speech_map=None, start_offset=0.0,
+                                cancel_event=None, beam_size=DEFAULT_BEAM_SIZE, status_path=None,
+                                word_timestamps=False, loop_guard=True):
+    """
+    Transcribe silence-aligned chunks of the audio in a process pool.
+
+    Args:
+        pcm_path: Decoded PCM from _decode_audio_cached()
+        whisper_model: Whisper model size (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        workers: Number of worker processes (int)
+        cpu_threads: Whisper CPU threads shared by all workers, 0 = all CPUs
+        journal_path: Stream records to this journal instead of returning them
+        speech_map: SpeechMap when pcm_path holds VAD-compacted audio
+        start_offset: Only decode pcm_path from this position (seconds) and
+            append to the existing journal
+        cancel_event: threading.Event checked between chunks
+        beam_size: Beam search width (int)
+        status_path: Progress status file updated while decoding
+        word_timestamps: Add word timings to the records (bool)
+        loop_guard: Cut hallucination loops short in every chunk (bool)
+
+    Returns:
+        tuple: (records, info, timings) like _run_transcription()
+
+    Raises:
+        RuntimeError: If transcription of any chunk fails
+    """
+    timings = {}
+    samples = _load_pcm(pcm_path)
+    duration = len(samples) / SAMPLE_RATE
+    first_sample = int(start_offset * SAMPLE_RATE)
+    threads_per_worker = max(1, (cpu_threads or os.cpu_count() or 1) // workers)
+
+    remaining = duration - start_offset
+    n_chunks = max(1, min(workers * CHUNKS_PER_WORKER, int(remaining // MIN_CHUNK_LENGTH)))
+    bounds = [first_sample + b for b in _find_split_points(samples[first_sample:], n_chunks)]
+    padding = int(CHUNK_PADDING * SAMPLE_RATE)
+    if start_offset:
+        print(f"  Resuming at {_format_timestamp(start_offset)}")
+    print(f"▶ Transcribing {len(bounds) - 1} chunks in {workers} workers "
+          f"({threads_per_worker} threads each)...")
+
+    started = time.time()
+    context = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_chunk_worker,
+                               initargs=(whisper_model, device, compute_type, threads_per_worker))
+    try:
+        futures = [
+            pool.submit(_transcribe_chunk, pcm_path,
+                        max(first_sample, lo - padding), min(len(samples), hi + padding),
+                        lo / SAMPLE_RATE, hi / SAMPLE_RATE, beam_size, word_timestamps, loop_guard)
+            for lo, hi in zip(bounds, bounds[1:])
+        ]
+        # Results are collected in chunk order, so records stay sorted
+        stitched = _stitch_chunks(future.result()[0] for future in futures)
+        stitched = _cancellable(stitched, cancel_event)
+        stitched = _track_progress(stitched, duration, status_path, start_offset, timings=timings)
+        if speech_map is not None:
+            stitched = _map_records(stitched, speech_map)
+        if journal_path:
+            print(f"  Streaming segments to {journal_path}")
+            segment_count = _write_journal(stitched, journal_path, append=bool(start_offset))
+            records = None
+        else:
+            records = list(stitched)
+            segment_count = len(records)
+        _, language, probability, _ = futures[0].result()
+        loop_stats = None
+        if loop_guard:
+            loop_stats = Counter()
+            for future in futures:
+                loop_stats.update(future.result()[3])
+            loop_stats = dict(loop_stats)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Transcription failed: {e}") from e
+    finally:
+        # Do not start queued chunks after a failure or cancellation
+        pool.shutdown(cancel_futures=True)
+    timings["whisper_decode"] = (started, time.time())
+
+    mode = f"parallel({workers})"
+    rtf = _real_time_factor(timings["whisper_decode"], remaining)
+    print(f"  Detected language: {language} (probability: {probability:.2f})")
+    print(f"  Segments: {segment_count}")
+    print(f"  Real-time factor ({mode}): {rtf:.3f}")
+    _print_loop_stats(loop_stats)
+
+    info = {
+        "language": language,
+        "language_probability": probability,
+        "duration": duration,
+        "decode_mode": mode,
+        "real_time_factor": rtf,
+        "loops": loop_stats,
+    }
+    return records, info, timings
+
+
+def _run_draft(asr_kwargs, diarization_kwargs, draft_model, turns=None, concurrent=False, cancel_event=None):
+    """
+    Fast first pass: transcribe with a small model and diarize if needed.
+
+    Args:
+        asr_kwargs: _run_transcription() arguments of the full run
+        diarization_kwargs: _run_diarization() arguments
+        draft_model: Whisper model size for the draft (str)
+        turns: Diarization turns if already known, else they are computed
+        concurrent: Diarize in a worker process while the draft decodes (bool)
+        cancel_event: threading.Event checked between segments
+
+    Returns:
+        tuple: (records, turns, timings) - timing names carry a "draft_"
+               prefix except for diarization
+    """
+    # Whole recording, in memory, one process: the draft must be quick to start
+    draft_kwargs = dict(asr_kwargs, whisper_model=draft_model, journal_path=None, chunk_workers=0,
+                        compare_seconds=0, start_offset=0.0)
+    print(f"▶ Draft pass with Whisper {draft_model}...")
+    timings = {}
+    if concurrent and turns is None:
+        draft_kwargs["cpu_threads"], num_threads = _split_cpu_threads(asr_kwargs["cpu_threads"],
+                                                                      diarization_kwargs["num_threads"])
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            diarization_future = pool.submit(_run_diarization, **dict(diarization_kwargs, num_threads=num_threads))
+            records, _, asr_timings = _run_transcription(**draft_kwargs, cancel_event=cancel_event)
+            turns, diarization_timings = diarization_future.result()
+        timings.update(diarization_timings)
+    else:
+        records, _, asr_timings = _run_transcription(**draft_kwargs, cancel_event=cancel_event)
+        if turns is None:
+            turns, diarization_timings = _run_diarization(**diarization_kwargs, cancel_event=cancel_event)
+            timings.update(diarization_timings)
+    timings.update((f"draft_{name}", span) for name, span in asr_timings.items())
+    return records, turns, timings
+
+
+def _is_low_confidence(record, thresholds):
+    """True if a segment crosses any of the re-decode thresholds."""
+    return (record["avg_logprob"] < thresholds["avg_logprob"]
+            or record["no_speech_prob"] > thresholds["no_speech_prob"]
+            or record["compression_ratio"] > thresholds["compression_ratio"])
+
+
+def _redecode_low_confidence(records, model, samples, thresholds, stats, beam_size=DEFAULT_BEAM_SIZE,
+                             word_timestamps=False):
+    """
+    Replace runs of low-confidence segments with a bigger model's decode.
+
+    Consecutive flagged segments form one window, padded by REDECODE_PADDING
+    seconds but never reaching into the neighbouring kept segments. Records
+    are consumed and produced lazily in time order, so the journal path
+    stays bounded in memory.
+
+    Args:
+        records: Iterable of segment records in time order (original timeline)
+        model: Loaded WhisperModel used for re-decoding
+        samples: 1-D float32 PCM of the whole recording at SAMPLE_RATE
+        thresholds: Dict with avg_logprob (minimum), no_speech_prob and
+            compression_ratio (maxima)
+        stats: Dict filled with segments, windows, redecoded_segments,
+            redecoded_seconds and new_segments
+        beam_size: Beam search width (int)
+        word_timestamps: Add word timings to re-decoded records (bool)
+
+    Yields:
+        dict: Kept and re-decoded records
+    """
+    stats.update(segments=0, windows=0, redecoded_segments=0, redecoded_seconds=0.0, new_segments=0)
+    duration = len(samples) / SAMPLE_RATE
+
+    def flush(run, prev_end, next_start):
+        lo = max(prev_end, run[0]["start"] - REDECODE_PADDING)
+        hi = min(next_start, run[-1]["end"] + REDECODE_PADDING)
+        if hi <= lo:
+            return run
+        replaced = _redecode_window(model, samples, lo, hi, beam_size, word_timestamps)
+        stats["windows"] += 1
+        stats["redecoded_segments"] += len(run)
+        stats["redecoded_seconds"] += hi - lo
+        stats["new_segments"] += len(replaced)
+        return replaced
+
+    run = []
+    prev_end = 0.0
+    for record in records:
+        stats["segments"] += 1
+        if _is_low_confidence(record, thresholds):
+            run.append(record)
+            continue
+        if run:
+            yield from flush(run, prev_end, record["start"])
+            run = []
+        prev_end = record["end"]
+        yield record
+    if run:
+        yield from flush(run, prev_end, duration)
+
+
+def _run_redecode(records, pcm_path, redecode_model, device, compute_type, thresholds, cpu_threads=0,
+                  beam_size=DEFAULT_BEAM_SIZE, journal_path=None, cancel_event=None, word_timestamps=False):
+    """
+    Load the bigger Whisper model and re-decode low-confidence segments.
+
+    Args:
+        records: Iterable of segment records in time order (original timeline)
+        pcm_path: Decoded PCM of the whole recording (before VAD)
+        redecode_model: Whisper model size for re-decoding (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type (str)
+        thresholds: See _redecode_low_confidence()
+        cpu_threads: Whisper CPU threads, 0 for library default (int)
+        beam_size: Beam search width (int)
+        journal_path: Stream the result to this journal instead of returning it
+        cancel_event: threading.Event checked between segments
+        word_timestamps: Add word timings to re-decoded records (bool)
+
+    Returns:
+        tuple: (records, stats, timings) - records is None when streamed to
+               the journal
+
+    Raises:
+        RuntimeError: If model loading or re-decoding fails
+    """
+    timings = {}
+    print(f"▶ Loading Whisper model for re-decoding ({redecode_model})...")
+    started = time.time()
+    try:
+        model = _load_whisper_model(redecode_model, device, compute_type, cpu_threads)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load Whisper model: {e}") from e
+    timings["redecode_load"] = (started, time.time())
+
+    print(f"▶ Re-decoding low-confidence segments (avg_logprob < {thresholds['avg_logprob']}, "
+          f"no_speech_prob > {thresholds['no_speech_prob']}, "
+          f"compression_ratio > {thresholds['compression_ratio']})...")
+    started = time.time()
+    samples = _load_pcm(pcm_path)
+    stats = {}
+    try:
+        refined = _redecode_low_confidence(_cancellable(records, cancel_event), model, samples, thresholds,
+                                           stats, beam_size, word_timestamps)
+        if journal_path:
+            _write_journal(refined, journal_path)
+            records = None
+        else:
+            records = list(refined)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Re-decoding failed: {e}") from e
+    timings["redecode"] = (started, time.time())
+
+    duration = len(samples) / SAMPLE_RATE
+    stats["redecoded_share"] = stats["redecoded_seconds"] / duration if duration else 0.0
+    print(f"  Re-decoded {stats['redecoded_segments']}/{stats['segments']} segments in {stats['windows']} "
+          f"windows → {stats['new_segments']} segments")
+    print(f"  Re-decoded audio: {stats['redecoded_seconds']:.0f}s of {duration:.0f}s "
+          f"({100 * stats['redecoded_share']:.1f}%)")
+    return records, stats, timings
+
+
+def _resume_from_checkpoint(checkpoint, checkpoint_path, diarization_checkpoint,
+                            diarization_checkpoint_path, journal_path, speech_map):
+    """
+    Load what an interrupted run already finished.
+
+    Checkpoints are only used when their audio hash and parameters match
+    the current run; otherwise the stage starts from scratch.
+
+    Args:
+        checkpoint: Expected transcription checkpoint header (dict)
+        checkpoint_path: Path to transcription checkpoint
+        diarization_checkpoint: Expected diarization checkpoint header (dict)
+        diarization_checkpoint_path: Path to diarization checkpoint
+        journal_path: Path to segment journal
+        speech_map: SpeechMap when decoding VAD-compacted audio, else None
+
+    Returns:
+        tuple: (info, turns, start_offset) - info is set when transcription
+               already finished, turns when diarization did, start_offset is
+               the decoder position (seconds) to continue from
+    """
+    info = None
+    turns = None
+    start_offset = 0.0
+
+    saved = _read_json(checkpoint_path)
+    if saved and all(saved.get(key) == value for key, value in checkpoint.items()):
+        count, last_end = _recover_journal(journal_path)
+        info = saved.get("info")
+        if info:
+            print(f"▶ Resuming: transcription already complete ({count} segments)")
+        elif count:
+            start_offset = _to_compact_time(last_end, speech_map) if speech_map is not None else last_end
+            print(f"▶ Resuming: {count} segments kept, continuing at {_format_timestamp(last_end)}")
+    elif saved:
+        print("  ⚠️  Transcription checkpoint does not match audio or parameters, starting over")
+
+    saved = _read_json(diarization_checkpoint_path)
+    if saved and all(saved.get(key) == value for key, value in diarization_checkpoint.items()):
+        turns = [tuple(turn) for turn in saved["turns"]]
+        print(f"▶ Resuming: diarization already complete ({len(turns)} turns)")
+
+    return info, turns, start_offset
+
+
+# =========================
+# MAIN PIPELINE
+# =========================
+
+def transcribe_audio(audio_path, output_path, whisper_model, hf_token, device="cpu", compute_type="int8",
+                     attribution="start", streaming=False, concurrent=False,
+                     asr_threads=0, diarization_threads=0, audio_cache=True, chunk_workers=0,
+                     batch_size=0, compare_seconds=0, vad_options=None, resume=False,
+                     cache_dir=DEFAULT_CACHE_DIR, cache_size_gb=DEFAULT_CACHE_SIZE_GB, cancel_event=None,
+                     whisper_workers=1, beam_size=DEFAULT_BEAM_SIZE, draft_model=None, redecode_model=None,
+                     redecode_thresholds=None, segments_jsonl=False, word_timestamps=False,
+                     speaker_registry=None, speaker_threshold=DEFAULT_SPEAKER_THRESHOLD,
+                     diarization_window=0, diarization_workers=1, diarization_runtime="torch",
+                     diarize=True, started_at=None, loop_guard=True):
+    """
+    Transcribe audio file with speaker diarization.
+
+    Process:
+    1. Load Whisper model for transcription
+    2. Transcribe audio to segments
+    3. Load pyannote pipeline for speaker diarization
+    4. Match each transcript segment to a speaker
+    5. Write formatted output
+
+    Steps 1-2 and 3 are independent; with `concurrent` they run in two
+    worker processes and are joined in step 4.
+
+    Args:
+        audio_path: Path to input audio file (Path or str)
+        output_path: Path to output transcript file (Path or str)
+        whisper_model: Whisper model size (str)
+        hf_token: HuggingFace token for pyannote models (str)
+        device: Device to use - "cpu" or "cuda" (str)
+        compute_type: Compute type - "int8", "float16", "float32" (str)
+        attribution: Speaker attribution - "start" labels a segment by the
+            turn containing its start, "overlap" by the speaker with the
+            largest overlap over the whole segment (str)
+        streaming: Append segments to an on-disk journal as they are decoded
+            instead of keeping them in memory (bool)
+        concurrent: Run transcription and diarization in parallel worker
+            processes (bool)
+        asr_threads: Whisper CPU threads, 0 = default / derived split (int)
+        diarization_threads: Torch threads for pyannote, 0 = default /
+            derived split (int)
+        audio_cache: Decode audio once into a memory-mapped PCM file next to
+            the output and share it between both stages (bool)
+        chunk_workers: Split audio at silences and decode chunks in this many
+            worker processes, sharing `asr_threads` between them; 0 decodes
+            sequentially (int). Requires `audio_cache`.
+        batch_size: Use batched inference with this batch size; 0 uses the
+            sequential decoder (int)
+        compare_seconds: Print sequential vs. batched real-time factor on
+            this many seconds of audio before the full run (int)
+        vad_options: Remove non-speech before decoding and diarization using
+            these faster_whisper VadOptions fields; None disables VAD (dict).
+            Requires `audio_cache`. Output timestamps stay on the original
+            timeline.
+        resume: Continue an interrupted run from its checkpoint: keep the
+            journaled segments, decode from the last completed offset and
+            reuse a finished diarization. Implies `streaming` (bool)
+        cache_dir: Content-addressed result cache; transcription and
+            diarization results are looked up and stored separately. None
+            disables the cache (Path)
+        cache_size_gb: Cache size limit, least recently used entries are
+            evicted above it (float)
+        cancel_event: threading.Event that aborts the run with JobCancelled
+            when set; checked between segments and diarization steps, or only
+            between stages in concurrent mode
+        whisper_workers: Concurrent transcribe() calls the shared Whisper
+            model serves, for running several files at once (int)
+        beam_size: Beam search width; 1 is greedy decoding (int)
+        draft_model: Publish a draft transcript made with this small Whisper
+            model at output_path first, then decode with `whisper_model` and
+            atomically replace it; None for a single pass (str)
+        redecode_model: Decode segments that cross `redecode_thresholds`
+            again with this bigger Whisper model and splice the result in;
+            None disables re-decoding (str). Requires `audio_cache`.
+        redecode_thresholds: Dict with avg_logprob (minimum),
+            no_speech_prob and compression_ratio (maxima); None uses the
+            DEFAULT_REDECODE_* values
+        segments_jsonl: Also write `<output>.segments.jsonl` with one JSON
+            line per segment: float start/end, speaker, speaker confidence,
+            text, avg_logprob, no_speech_prob and word timings if any (bool)
+        word_timestamps: Decode word timings and write them to
+            `<output>.words.npz`, see load_word_index() (bool)
+        speaker_registry: Directory of reference voices; diarized speakers
+            matching one are labeled with its name (see load_speaker_registry())
+        speaker_threshold: Minimum cosine similarity to use a registered name
+        diarization_window: Diarize in overlapping windows of about this many
+            seconds, linking speakers across windows; memory stays flat with
+            recording length (0 = whole recording at once)
+        diarization_workers: Windows diarized at the same time in worker processes
+        diarization_runtime: One of DIARIZATION_RUNTIMES; the ONNX runtimes
+            export the segmentation model once to `<cache_dir>/onnx/` and run
+            it with onnxruntime using `diarization_threads` intra-op threads
+            (the SpeechBrain embedding stays on torch)
+        diarize: Identify speakers; without it every segment is labeled
+            UNKNOWN and torch is never imported (bool)
+        started_at: time.time() the time to first segment is measured from,
+            e.g. process start (default: when this function is called)
+        loop_guard: Detect Whisper repeating itself and drop, re-decode or
+            skip the looping part, see _guard_loops() (bool)
+
+    Raises:
+        FileNotFoundError: If audio file doesn't exist
+        RuntimeError: If models fail to load
+        ValueError: If HF_TOKEN is missing
+        JobCancelled: If cancel_event was set
+
+    Output format:
+        [HH:MM:SS] SPEAKER_NAME:
+        Transcribed text...
+
+        [HH:MM:SS] SPEAKER_NAME:
+        More text...
+
+    Stage durations, real-time factor, counts, peak RSS and CPU
+    utilisation of the run are written to `<output>.metrics.json`.
+    """
+    audio_path = Path(audio_path)
+    output_path = Path(output_path)
+    t0 = time.time()
+    cpu_start = _cpu_seconds()
+
+    # Validate inputs
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    if diarize and not hf_token and not _model_dir():
+        raise ValueError("HF_TOKEN environment variable is required for speaker diarization")
+
+    if speaker_registry and not diarize:
+        raise ValueError("Naming speakers requires diarization")
+
+    if attribution not in ATTRIBUTION_MODES:
+        raise ValueError(f"Unknown attribution mode: {attribution}")
+
+    if chunk_workers and not audio_cache:
+        raise ValueError("Parallel chunked decoding requires the decoded audio cache")
+
+    if vad_options is not None and not audio_cache:
+        raise ValueError("VAD pre-filter requires the decoded audio cache")
+
+    if chunk_workers and batch_size:
+        raise ValueError("Parallel chunked decoding and batched inference cannot be combined")
+
+    if resume and not audio_cache:
+        raise ValueError("Resuming requires the decoded audio cache")
+
+    if redecode_model and not audio_cache:
+        raise ValueError("Re-decoding requires the decoded audio cache")
+
+    if speaker_registry and not audio_cache:
+        raise ValueError("Naming speakers requires the decoded audio cache")
+
+    if diarization_window and not audio_cache:
+        raise ValueError("Windowed diarization requires the decoded audio cache")
+
+    if diarization_runtime not in DIARIZATION_RUNTIMES:
+        raise ValueError(f"Unknown diarization runtime: {diarization_runtime}")
+    if redecode_model and redecode_thresholds is None:
+        redecode_thresholds = {
+            "avg_logprob": DEFAULT_REDECODE_LOGPROB,
+            "no_speech_prob": DEFAULT_REDECODE_NO_SPEECH,
+            "compression_ratio": DEFAULT_REDECODE_COMPRESSION,
+        }
+    streaming = streaming or resume
+
+    # Create output directory if needed
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    journal_path = _journal_path(output_path) if streaming else None
+    status_path = _status_path(output_path)
+
+    # Decode audio once for both stages, into the cache where it is evicted with the results
+    cache_dir = Path(cache_dir) if cache_dir else None
+    audio_dir = cache_dir / AUDIO_CACHE_DIR if cache_dir else output_path.parent
+    pcm_path = None
+    timings = {}
+    audio_hash = _file_hash(audio_path)
+    audio_files = []
+    if audio_cache:
+        started = time.time()
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        pcm_path = _decode_audio_cached(audio_path, audio_dir, audio_hash)
+        timings["audio_decode"] = (started, time.time())
+        # Other runs sharing the cache in this process must not evict it from here on
+        audio_files.append(pcm_path)
+        _audio_in_use.add(pcm_path)
+
+    try:
+        # Drop non-speech before both stages
+        source_pcm_path = pcm_path
+        speech_map = None
+        vad_stats = None
+        if vad_options is not None:
+            started = time.time()
+            vad_stats = {}
+            pcm_path, speech_map = _apply_vad(pcm_path, vad_options, vad_stats)
+            timings["vad"] = (started, time.time())
+            audio_files += [pcm_path, _vad_regions_path(pcm_path)]
+            _audio_in_use.update(audio_files)
+
+        # Checkpoints identify the audio and every option that changes results
+        checkpoint = {
+            "audio_sha256": audio_hash,
+            "asr": {
+                "whisper_model": whisper_model,
+                "compute_type": compute_type,
+                "language": LANGUAGE,
+                "batch_size": batch_size,
+                "beam_size": beam_size,
+                # Chunk boundaries change the decoder's context and so the text
+                "chunk_workers": chunk_workers,
+                "word_timestamps": word_timestamps,
+                "vad_options": vad_options,
+                "loop_guard": loop_guard,
+            },
+        }
+        diarization_checkpoint = {
+            "audio_sha256": audio_hash,
+            "diarization": {
+                "model": DIARIZATION_MODEL,
+                "window": diarization_window,
+                "runtime": diarization_runtime,
+                "vad_options": vad_options,
+            },
+        }
+        checkpoint_path = _checkpoint_path(output_path)
+        diarization_checkpoint_path = _diarization_checkpoint_path(output_path)
+
+        info = None
+        turns = None
+        start_offset = 0.0
+        if resume:
+            info, turns, start_offset = _resume_from_checkpoint(
+                checkpoint, checkpoint_path, diarization_checkpoint, diarization_checkpoint_path,
+                journal_path, speech_map
+            )
+        if not diarize:
+            print("▶ Speaker diarization disabled, all segments are labeled UNKNOWN")
+            turns = []
+
+        # Each stage hits the result cache on its own
+        asr_key = _cache_key(checkpoint)
+        diarization_key = _cache_key(diarization_checkpoint)
+        if cache_dir and info is None:
+            cached = _cache_get(cache_dir, "asr", asr_key)
+            if cached:
+                info, records = cached
+                print(f"▶ Transcription cache hit ({len(records)} segments)")
+                if streaming:
+                    _write_journal(records, journal_path)
+                    _write_json_atomic(checkpoint_path, dict(checkpoint, info=info))
+        if cache_dir and turns is None:
+            cached = _cache_get(cache_dir, "diarization", diarization_key)
+            if cached:
+                turns = [tuple(turn) for turn in cached[1]]
+                print(f"▶ Diarization cache hit ({len(turns)} turns)")
+
+        if streaming and info is None:
+            _write_json_atomic(checkpoint_path, checkpoint)
+
+        asr_kwargs = dict(
+            audio_path=audio_path,
+            whisper_model=whisper_model,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=asr_threads,
+            whisper_workers=whisper_workers,
+            journal_path=journal_path,
+            pcm_path=pcm_path,
+            chunk_workers=chunk_workers,
+            batch_size=batch_size,
+            beam_size=beam_size,
+            compare_seconds=compare_seconds,
+            speech_map=speech_map,
+            start_offset=start_offset,
+            status_path=status_path,
+            word_timestamps=word_timestamps,
+            loop_guard=loop_guard,
+        )
+        diarization_kwargs = dict(
+            audio_path=audio_path,
+            hf_token=hf_token,
+            num_threads=diarization_threads,
+            pcm_path=pcm_path,
+            window=diarization_window,
+            workers=diarization_workers,
+            runtime=diarization_runtime,
+            cache_dir=str(cache_dir or DEFAULT_CACHE_DIR),
+        )
+
+        run_asr = info is None
+        run_diarization = turns is None
+        if run_asr:
+            records = None
+        max_bytes = int(cache_size_gb * 1024 ** 3)
+        _check_cancelled(cancel_event)
+
+        def save_turns():
+            # Diarization is stored as soon as it exists, a crash in a long decode must not redo it
+            if streaming:
+                _write_json_atomic(diarization_checkpoint_path, dict(diarization_checkpoint, turns=turns))
+            if cache_dir:
+                _cache_put(cache_dir, "diarization", diarization_key, diarization_checkpoint["diarization"],
+                           turns, max_bytes)
+
+        if draft_model and run_asr:
+            # Speakers are needed for a usable draft, so diarization happens here
+            _write_status(status_path, "running", "draft")
+            draft_records, turns, draft_timings = _run_draft(asr_kwargs, diarization_kwargs, draft_model, turns,
+                                                             concurrent, cancel_event)
+            timings.update(draft_timings)
+            if run_diarization:
+                save_turns()
+            draft_turns = _map_turns(turns, speech_map) if speech_map is not None else turns
+            _write_transcript(_label_records(draft_records, _build_turn_index(draft_turns), attribution, {},
+                                             confidence=segments_jsonl),
+                              output_path, _segments_path(output_path) if segments_jsonl else None)
+            _write_status(status_path, "running", "draft published", draft_model=draft_model)
+            print(f"✅ Draft transcript published to {output_path}, refining with {whisper_model}...")
+
+        _write_status(status_path, "running", "transcription" if run_asr else "diarization")
+        concurrent_threads = None
+        if concurrent and run_asr and turns is None:
+            # CPUs are split only while both stages run; a stage running alone gets them all
+            concurrent_threads = _split_cpu_threads(asr_threads, diarization_threads)
+            print(f"▶ Running transcription ({concurrent_threads[0]} threads) and diarization "
+                  f"({concurrent_threads[1]} threads) concurrently...")
+            # Spawn avoids forking a process that may already hold torch/OpenMP state
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+                asr_future = pool.submit(_run_transcription, **dict(asr_kwargs, cpu_threads=concurrent_threads[0]))
+                diarization_future = pool.submit(_run_diarization,
+                                                 **dict(diarization_kwargs, num_threads=concurrent_threads[1]))
+                # Diarization usually finishes first and is saved while Whisper still decodes
+                turns, diarization_timings = diarization_future.result()
+                save_turns()
+                records, info, asr_timings = asr_future.result()
+            timings.update(asr_timings)
+            timings.update(diarization_timings)
+        else:
+            if run_asr:
+                records, info, asr_timings = _run_transcription(**asr_kwargs, cancel_event=cancel_event)
+                timings.update(asr_timings)
+            if turns is None:
+                _write_status(status_path, "running", "diarization")
+                turns, diarization_timings = _run_diarization(**diarization_kwargs, cancel_event=cancel_event)
+                timings.update(diarization_timings)
+                save_turns()
+        _check_cancelled(cancel_event)
+
+        # Mark a finished transcription so a resumed run skips it
+        if streaming and run_asr:
+            _write_json_atomic(checkpoint_path, dict(checkpoint, info=info))
+        if cache_dir and run_asr:
+            _cache_put(cache_dir, "asr", asr_key, info,
+                       _read_journal(journal_path) if streaming else records, max_bytes)
+
+        # Put names on the speakers the registry knows, embedding each meeting's speakers once
+        speaker_matches = None
+        if speaker_registry:
+            _write_status(status_path, "running", "speaker naming")
+            speakers_key = _cache_key(dict(diarization_checkpoint, embedding=SPEAKER_EMBEDDING_MODEL,
+                                           sample_seconds=SPEAKER_SAMPLE_SECONDS))
+            embeddings = None
+            cached = _cache_get(cache_dir, "speakers", speakers_key) if cache_dir else None
+            if cached:
+                embeddings = {label: np.asarray(vector, dtype=np.float32) for label, vector in cached[1]}
+                print(f"▶ Speaker embedding cache hit ({len(embeddings)} speakers)")
+            turns, speaker_matches, new_embeddings, naming_timings = _run_speaker_naming(
+                turns, pcm_path, hf_token, speaker_registry, speaker_threshold, embeddings
+            )
+            timings.update(naming_timings)
+            if cache_dir and embeddings is None:
+                _cache_put(cache_dir, "speakers", speakers_key, {"embedding": SPEAKER_EMBEDDING_MODEL},
+                           ([label, vector.tolist()] for label, vector in new_embeddings.items()), max_bytes)
+
+        if speech_map is not None:
+            turns = _map_turns(turns, speech_map)
+
+        # Splice in a bigger model's decode where the fast one was unsure
+        redecode_stats = None
+        if redecode_model:
+            _write_status(status_path, "running", "re-decoding")
+            redecode_journal_path = journal_path and journal_path.with_name(output_path.name + ".redecoded.jsonl")
+            records, redecode_stats, redecode_timings = _run_redecode(
+                _read_journal(journal_path) if streaming else records, source_pcm_path, redecode_model, device,
+                compute_type, redecode_thresholds, asr_threads, beam_size, redecode_journal_path, cancel_event,
+                word_timestamps
+            )
+            timings.update(redecode_timings)
+            journal_path = redecode_journal_path
+
+        # Match segments to speakers and write output
+        _write_status(status_path, "running", "writing")
+        print(f"▶ Writing transcript to {output_path}...")
+        started = time.time()
+        turn_index = _build_turn_index(turns)
+        if streaming:
+            records = _read_journal(journal_path)
+
+        stats = {}
+        segments_path = _segments_path(output_path) if segments_jsonl else None
+        labeled = _label_records(records, turn_index, attribution, stats, confidence=segments_jsonl)
+        words_path = _words_path(output_path) if word_timestamps else None
+        if words_path:
+            word_columns = defaultdict(list)
+            labeled = _collect_words(labeled, word_columns)
+        _write_transcript(labeled, output_path, segments_path)
+        if words_path:
+            _write_word_index(word_columns, words_path)
+        timings["join_write"] = (started, time.time())
+
+        print(f"  Unknown speaker: {stats['unknown']}/{stats['segments']} segments")
+        if segments_path:
+            print(f"  Segments: {segments_path}")
+        if words_path:
+            print(f"  Words: {len(word_columns['word'])} → {words_path}")
+        if attribution == "overlap":
+            print(f"  Overlap attribution changed {stats['changed']}/{stats['segments']} segment labels")
+
+        _print_timing_report(timings, t0)
+
+        # First segment of the draft or of the full decode, whichever came first
+        first_segments = [timings[name][0] for name in ("draft_first_segment", "first_segment") if name in timings]
+        time_to_first_segment = min(first_segments) - (started_at or t0) if first_segments else None
+        if time_to_first_segment is not None:
+            print(f"  Time to first segment: {time_to_first_segment:.1f}s")
+
+        metrics = _run_metrics(timings, t0, cpu_start, info, stats, len(turns))
+        metrics.update(
+            audio=str(audio_path),
+            audio_sha256=audio_hash,
+            transcript=str(output_path),
+            finished=time.time(),
+            parameters=dict(checkpoint["asr"], device=device, attribution=attribution,
+                            asr_threads=asr_threads, diarization_threads=diarization_threads,
+                            concurrent_threads=concurrent_threads,
+                            diarization_runtime=diarization_runtime,
+                            draft_model=draft_model, redecode_model=redecode_model,
+                            redecode_thresholds=redecode_thresholds if redecode_model else None,
+                            speaker_registry=speaker_registry,
+                            speaker_threshold=speaker_threshold if speaker_registry else None,
+                            diarize=diarize, model_dir=str(_model_dir()) if _model_dir() else None),
+            reused={"transcription": not run_asr, "diarization": diarize and not run_diarization},
+            time_to_first_segment=time_to_first_segment,
+            vad=vad_stats,
+            loops=info.get("loops"),
+            redecode=redecode_stats,
+            speakers=({label: {"name": name, "similarity": similarity}
+                       for label, (name, similarity) in speaker_matches.items()}
+                      if speaker_matches is not None else None),
+            host=_host_fingerprint(whisper_model, device)[1],
+        )
+        metrics_path = _metrics_path(output_path)
+        _write_json_atomic(metrics_path, metrics)
+        _write_status(status_path, "done", progress=1.0, metrics=str(metrics_path))
+        print(f"  Metrics: {metrics_path}")
+
+        if not cache_dir:
+            # Nothing would ever evict decoded audio kept next to the output
+            for path in audio_files:
+                path.unlink(missing_ok=True)
+    finally:
+        _audio_in_use.difference_update(audio_files)
+    print("✅ Transcription complete!")
+
+
+# =========================
+# BATCH
+# =========================
+
+def _expand_audio_paths(patterns):
+    """
+    Expand file arguments and glob patterns into a sorted list of files.
+
+    Patterns are expanded here too, so quoted globs work without a shell.
+
+    Args:
+        patterns: Iterable of paths or glob patterns (str or Path)
+
+    Returns:
+        list: Unique Paths in argument order
+
+    Raises:
+        FileNotFoundError: If a pattern matches nothing
+    """
+    paths = []
+    for pattern in map(str, patterns):
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No audio files match: {pattern}")
+        paths.extend(Path(match) for match in matches)
+    return list(dict.fromkeys(path.resolve() for path in paths))
+
+
+def transcribe_batch(audio_paths, output_dir, hf_token, parallel_files=1, **options):
+    """
+    Transcribe many recordings in one process, loading models only once.
+
+    Writes `<output_dir>/<audio stem>.txt` per recording and keeps a status
+    manifest (`manifest.json`) updated after every state change. Rerunning
+    the same batch skips finished files and resumes interrupted ones.
+
+    Args:
+        audio_paths: List of audio file Paths
+        output_dir: Directory for transcripts and the manifest
+        hf_token: HuggingFace token for pyannote models (str)
+        parallel_files: Number of files processed at the same time (int)
+        **options: Further transcribe_audio() options
+
+    Returns:
+        dict: Manifest entries keyed by audio path
+
+    Raises:
+        ValueError: If two recordings would write the same transcript
+        RuntimeError: If any file failed
+    """
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / BATCH_MANIFEST
+    manifest = _read_json(manifest_path) or {}
+    manifest_lock = threading.Lock()
+
+    outputs = {}
+    for audio_path in audio_paths:
+        output_path = output_dir / f"{audio_path.stem}.txt"
+        if output_path in outputs.values():
+            raise ValueError(f"Two recordings would write {output_path}, rename one of them")
+        outputs[audio_path] = output_path
+
+    def update(audio_path, **fields):
+        with manifest_lock:
+            manifest.setdefault(str(audio_path), {}).update(fields)
+            _write_json_atomic(manifest_path, manifest)
+
+    def process(audio_path):
+        output_path = outputs[audio_path]
+        audio_hash = _file_hash(audio_path)
+        previous = manifest.get(str(audio_path), {})
+        same_audio = previous.get("audio_sha256") == audio_hash
+
+        if same_audio and previous.get("state") == "done" and output_path.exists():
+            print(f"⏭️  {audio_path.name}: already done")
+            return
+
+        update(audio_path, output=str(output_path), audio_sha256=audio_hash, state="running",
+               error=None, started=time.time(), finished=None)
+        # Anything started before continues from its checkpoint (which needs the decoded audio)
+        resume = options.get("resume") or (same_audio and previous.get("state") in ("running", "failed")
+                                           and options.get("audio_cache", True))
+        try:
+            transcribe_audio(audio_path, output_path, hf_token=hf_token,
+                             **dict(options, resume=resume, whisper_workers=parallel_files))
+        except Exception as e:
+            print(f"❌ {audio_path.name}: {e}", file=sys.stderr)
+            update(audio_path, state="failed", error=str(e), finished=time.time())
+        else:
+            update(audio_path, state="done", finished=time.time())
+
+    print(f"▶ Batch of {len(audio_paths)} recordings → {output_dir} ({parallel_files} at a time)")
+    if parallel_files > 1:
+        with ThreadPoolExecutor(max_workers=parallel_files) as pool:
+            list(pool.map(process, audio_paths))
+    else:
+        for audio_path in audio_paths:
+            process(audio_path)
+
+    states = Counter(manifest[str(audio_path)]["state"] for audio_path in audio_paths)
+    print(f"✅ Batch finished: {states['done']} done, {states['failed']} failed (manifest: {manifest_path})")
+    if states["failed"]:
+        raise RuntimeError(f"{states['failed']} recordings failed, rerun the same command to retry them")
+    return manifest
+
+
+# =========================
+# AUTOTUNE
+# =========================
+
+def _host_fingerprint(whisper_model, device):
+    """
+    Identify the host, model and library versions a tuned profile is valid for.
+
+    Args:
+        whisper_model: Whisper model size (str)
+        device: Device to use - "cpu" or "cuda" (str)
+
+    Returns:
+        tuple: (fingerprint, host) - short hex digest and the dict it hashes
+    """
+    cpu_model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu_model = next(line.split(":", 1)[1].strip() for line in f if line.startswith("model name"))
+    except (OSError, StopIteration):
+        pass
+
+    versions = {}
+    for package in ["faster-whisper", "ctranslate2", "torch", "pyannote.audio"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    host = {
+        "machine": platform.machine(),
+        "cpu_model": cpu_model,
+        "cpu_count": os.cpu_count(),
+        "memory_gb": round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3),
+        "device": device,
+        "whisper_model": whisper_model,
+        "versions": versions,
+    }
+    return _cache_key(host)[:16], host
+
+
+def _profile_path(cache_dir, fingerprint):
+    """Return path of the tuned profile for a host fingerprint."""
+    return Path(cache_dir) / "profiles" / f"{fingerprint}.json"
+
+
+def _load_tuned_profile(cache_dir, whisper_model, device):
+    """
+    Load the profile --autotune saved for this host, model and device.
+
+    Returns:
+        dict: Tuned profile or None if this host was not tuned
+    """
+    fingerprint, _ = _host_fingerprint(whisper_model, device)
+    return _read_json(_profile_path(cache_dir, fingerprint))
+
+
+def _autotune_thread_counts():
+    """Thread counts worth trying: a quarter, half and all of the CPUs."""
+    total = os.cpu_count() or 1
+    return sorted({max(1, total // 4), max(1, total // 2), total})
+
+
+def _word_similarity(text, reference):
+    """Share of words two transcripts agree on (0-1)."""
+    return difflib.SequenceMatcher(None, text.split(), reference.split(), autojunk=False).ratio()
+
+
+def _autotune_whisper_trial(sample_path, whisper_model, device, compute_type, cpu_threads, beam_size,
+                            workers=1):
+    """
+    Decode the sample with one configuration (runs in a fresh process).
+
+    With workers > 1 the model serves that many concurrent decodes of the
+    sample, like --parallel-files, and the RTF is per decoded second.
+
+    Returns:
+        dict: rtf, peak_rss_mb, load_seconds and text of the decode
+    """
+    started = time.time()
+    model = _load_whisper_model(whisper_model, device, compute_type, cpu_threads, workers)
+    load_seconds = time.time() - started
+    samples = np.asarray(_load_pcm(sample_path))
+    duration = len(samples) / SAMPLE_RATE
+
+    def decode(_):
+        segments, _ = _decode(model, samples, beam_size=beam_size)
+        return " ".join(segment.text.strip() for segment in segments)
 
-# =========================
-# HELPERS
-# =========================
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        texts = list(pool.map(decode, range(workers)))
+    rtf = _real_time_factor((started, time.time()), duration * workers)
+    return {"rtf": rtf, "peak_rss_mb": _peak_rss_mb(), "load_seconds": load_seconds, "text": texts[0]}
 
-def _format_timestamp(seconds):
-    """
-    Convert seconds to HH:MM:SS format.
 
-    Args:
-        seconds: Time in seconds (float or int)
+def _autotune_diarization_trial(sample_path, hf_token, num_threads, runtime="torch", cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Diarize the sample with one thread count (runs in a fresh process).
 
     Returns:
-        str: Formatted timestamp (e.g., "1:23:45")
+        dict: rtf, peak_rss_mb, load_seconds and turns
     """
-    return str(timedelta(seconds=int(seconds)))
+    turns, timings = _run_diarization(None, hf_token, num_threads, pcm_path=sample_path, runtime=runtime,
+                                      cache_dir=cache_dir)
+    duration = len(_load_pcm(sample_path)) / SAMPLE_RATE
+    start, end = timings["diarization_load"]
+    return {"rtf": _real_time_factor(timings["diarization_run"], duration), "peak_rss_mb": _peak_rss_mb(),
+            "load_seconds": end - start, "turns": len(turns)}
 
 
-def _find_speaker(start_time, diarization):
+def _run_trial(trial, **params):
     """
-    Find speaker label for a given timestamp.
+    Run one autotune trial in its own spawned process.
 
-    Args:
-        start_time: Timestamp in seconds (float)
-        diarization: pyannote diarization result
+    A fresh process keeps thread pool settings from leaking between trials
+    and makes the measured peak RSS that of the trial alone.
 
     Returns:
-        str: Speaker label (e.g., "SPEAKER_00") or "UNKNOWN"
+        dict: Trial result merged with params, or None if the trial failed
     """
-    for turn, _, speaker_label in diarization.itertracks(yield_label=True):
-        if turn.start <= start_time <= turn.end:
-            return speaker_label
-    return "UNKNOWN"
-
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(trial, **params).result()
+    except Exception as e:
+        print(f"  ⚠️  Trial failed: {e}")
+        return None
+    return dict(params, **result)
 
-# =========================
-# MAIN PIPELINE
-# =========================
 
-def transcribe_audio(audio_path, output_path, whisper_model, hf_token, device="cpu", compute_type="int8"):
+def autotune(audio_path, whisper_model, device, hf_token, cache_dir=DEFAULT_CACHE_DIR,
+             sample_seconds=AUTOTUNE_SAMPLE_SECONDS, diarization_runtime="torch"):
     """
-    Transcribe audio file with speaker diarization.
+    Benchmark decoding and diarization settings on this host and save the best.
 
-    Process:
-    1. Load Whisper model for transcription
-    2. Transcribe audio to segments
-    3. Load pyannote pipeline for speaker diarization
-    4. Match each transcript segment to a speaker
-    5. Write formatted output
+    A sample from the middle of the recording is decoded with every compute
+    type and beam size, then the winner with different Whisper thread
+    counts and concurrent workers; pyannote is run with different thread
+    counts of its runtime. Only configurations whose transcript agrees with the
+    most precise one (last compute type, widest beam) on at least
+    AUTOTUNE_MIN_SIMILARITY of the words are eligible. The fastest
+    eligible settings are saved per host fingerprint and picked up by
+    later runs on the same host, model and device.
 
     Args:
-        audio_path: Path to input audio file (Path or str)
-        output_path: Path to output transcript file (Path or str)
+        audio_path: Recording to take the sample from (Path)
         whisper_model: Whisper model size (str)
-        hf_token: HuggingFace token for pyannote models (str)
         device: Device to use - "cpu" or "cuda" (str)
-        compute_type: Compute type - "int8", "float16", "float32" (str)
-
-    Raises:
-        FileNotFoundError: If audio file doesn't exist
-        RuntimeError: If models fail to load
-        ValueError: If HF_TOKEN is missing
+        hf_token: HuggingFace token for pyannote models (str)
+        cache_dir: Cache root, the profile goes to <cache_dir>/profiles/
+        sample_seconds: Length of the benchmark sample (int)
+        diarization_runtime: Diarization runtime whose threads are tuned,
+            one of DIARIZATION_RUNTIMES
 
-    Output format:
-        [HH:MM:SS] SPEAKER_NAME:
-        Transcribed text...
+    Returns:
+        dict: Saved profile
 
-        [HH:MM:SS] SPEAKER_NAME:
-        More text...
+    Raises:
+        RuntimeError: If no configuration could be benchmarked
     """
-    audio_path = Path(audio_path)
-    output_path = Path(output_path)
-
-    # Validate inputs
-    if not audio_path.exists():
-        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    cache_dir = Path(cache_dir)
+    fingerprint, host = _host_fingerprint(whisper_model, device)
+    print(f"▶ Autotuning {whisper_model} on {device} for host {fingerprint} "
+          f"({host['cpu_model']}, {host['cpu_count']} CPUs)")
 
-    if not hf_token:
-        raise ValueError("HF_TOKEN environment variable is required for speaker diarization")
+    # Benchmark sample from the middle of the recording, where people talk
+    work_dir = cache_dir / "autotune"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    pcm_path = _decode_audio_cached(Path(audio_path), work_dir)
+    samples = _load_pcm(pcm_path)
+    length = min(len(samples), int(sample_seconds * SAMPLE_RATE))
+    offset = (len(samples) - length) // 2
+    sample_path = work_dir / f"sample-{fingerprint}{PCM_SUFFIX}"
+    np.asarray(samples[offset:offset + length]).tofile(sample_path)
+    # Only the sample is needed, the full recording is ~0.9 GB per 4 hours
+    del samples
+    pcm_path.unlink(missing_ok=True)
+    print(f"  Sample: {length / SAMPLE_RATE:.0f}s at {_format_timestamp(offset / SAMPLE_RATE)}")
 
-    # Create output directory if needed
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    threads = _autotune_thread_counts()
+    whisper_params = dict(sample_path=str(sample_path), whisper_model=whisper_model, device=device)
+    trials = []
 
-    # Load Whisper model
-    print(f"▶ Loading Whisper model ({whisper_model})...")
-    try:
-        model = WhisperModel(whisper_model, device=device, compute_type=compute_type)
-    except Exception as e:
-        raise RuntimeError(f"Failed to load Whisper model: {e}") from e
+    def run(trial, label, **params):
+        print(f"▶ Trial {len(trials) + 1}: {label}")
+        result = _run_trial(trial, **params)
+        if result is not None:
+            trials.append(result)
+        return result
 
-    # Transcribe audio
-    print("▶ Transcribing audio...")
-    try:
-        segments, info = model.transcribe(str(audio_path), language="cs")
-        # Convert generator to list to allow multiple iterations
-        segments = list(segments)
-    except Exception as e:
-        raise RuntimeError(f"Transcription failed: {e}") from e
+    # 1. Compute type x beam size on all CPUs
+    for compute_type in AUTOTUNE_COMPUTE_TYPES[device]:
+        for beam_size in AUTOTUNE_BEAM_SIZES:
+            run(_autotune_whisper_trial, f"whisper {compute_type}, beam {beam_size}, {threads[-1]} threads",
+                **whisper_params, compute_type=compute_type, cpu_threads=threads[-1], beam_size=beam_size)
+    whisper_trials = [t for t in trials if "compute_type" in t]
+    if not whisper_trials:
+        raise RuntimeError("No Whisper configuration could be benchmarked")
 
-    print(f"  Detected language: {info.language} (probability: {info.language_probability:.2f})")
+    # The last successful trial is the most precise configuration
+    reference = whisper_trials[-1]["text"]
+    for trial in whisper_trials:
+        trial["similarity"] = _word_similarity(trial["text"], reference)
+    eligible = [t for t in whisper_trials if t["similarity"] >= AUTOTUNE_MIN_SIMILARITY]
+    best = min(eligible, key=lambda t: t["rtf"])
 
-    # Load diarization pipeline
-    print("▶ Loading speaker diarization model...")
-    try:
-        pipeline = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization",
-            use_auth_token=hf_token
-        )
-    except Exception as e:
-        raise RuntimeError(f"Failed to load diarization model: {e}") from e
+    # 2. Whisper threads for the winning compute type and beam size
+    for cpu_threads in threads[:-1]:
+        result = run(_autotune_whisper_trial, f"whisper {best['compute_type']}, beam {best['beam_size']}, "
+                     f"{cpu_threads} threads", **whisper_params, compute_type=best["compute_type"],
+                     cpu_threads=cpu_threads, beam_size=best["beam_size"])
+        if result is not None:
+            result["similarity"] = _word_similarity(result["text"], reference)
+            if result["rtf"] < best["rtf"]:
+                best = result
 
-    # Perform diarization
-    print("▶ Identifying speakers...")
-    try:
-        diarization = pipeline(str(audio_path))
-    except Exception as e:
-        raise RuntimeError(f"Speaker diarization failed: {e}") from e
+    # 3. Concurrent decodes sharing all CPUs, for batch mode
+    best_workers = dict(best, workers=1)
+    total = threads[-1]
+    for workers in AUTOTUNE_WORKERS:
+        if total // workers < 1:
+            continue
+        result = run(_autotune_whisper_trial, f"whisper {workers} workers x {total // workers} threads",
+                     **whisper_params, compute_type=best["compute_type"], cpu_threads=total // workers,
+                     beam_size=best["beam_size"], workers=workers)
+        if result is not None:
+            result["similarity"] = _word_similarity(result["text"], reference)
+            if result["rtf"] < best_workers["rtf"]:
+                best_workers = result
 
-    # Write output
-    print(f"▶ Writing transcript to {output_path}...")
-    with open(output_path, "w", encoding="utf-8") as f:
-        for segment in segments:
-            start_time = segment.start
-            text = segment.text.strip()
+    # 4. Torch or onnxruntime intra-op threads for pyannote
+    for num_threads in threads:
+        run(_autotune_diarization_trial, f"diarization {diarization_runtime}, {num_threads} threads",
+            sample_path=str(sample_path), hf_token=hf_token, num_threads=num_threads,
+            runtime=diarization_runtime, cache_dir=str(cache_dir))
+    diarization_trials = [t for t in trials if "num_threads" in t]
+    best_diarization = min(diarization_trials, key=lambda t: t["rtf"]) if diarization_trials else None
 
-            # Skip empty segments
-            if not text:
-                continue
+    print(f"  {'Trial':<40} {'RTF':>8} {'RSS MB':>8} {'Similar':>8}")
+    for trial in trials:
+        if "num_threads" in trial:
+            label = f"diarization {trial['runtime']} {trial['num_threads']} threads"
+        else:
+            label = (f"{trial['compute_type']} beam {trial['beam_size']} "
+                     f"{trial.get('workers', 1)}x{trial['cpu_threads']} threads")
+        similarity = f"{trial['similarity']:8.2f}" if "similarity" in trial else f"{'':>8}"
+        print(f"  {label:<40} {trial['rtf']:8.3f} {trial['peak_rss_mb']:8.0f} {similarity}")
 
-            # Find speaker for this segment
-            speaker = _find_speaker(start_time, diarization)
+    profile = {
+        "fingerprint": fingerprint,
+        "host": host,
+        "created": time.time(),
+        "sample_seconds": length / SAMPLE_RATE,
+        "whisper": {key: best[key] for key in ["compute_type", "cpu_threads", "beam_size", "rtf", "peak_rss_mb"]},
+        "parallel_files": best_workers.get("workers", 1),
+        "diarization": (
+            {key: best_diarization[key] for key in ["runtime", "num_threads", "rtf", "peak_rss_mb"]}
+            if best_diarization else None
+        ),
+        "trials": [{key: value for key, value in t.items()
+                    if key not in ("text", "sample_path", "hf_token", "cache_dir")}
+                   for t in trials],
+    }
+    path = _profile_path(cache_dir, fingerprint)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_json_atomic(path, profile)
+    sample_path.unlink(missing_ok=True)
 
-            # Write formatted output
-            timestamp = _format_timestamp(start_time)
-            f.write(f"[{timestamp}] {speaker}:\n{text}\n\n")
+    print(f"✅ Tuned profile saved to {path}")
+    print(f"  Whisper: {best['compute_type']}, beam {best['beam_size']}, {best['cpu_threads']} threads "
+          f"(RTF {best['rtf']:.3f}); batch mode: {profile['parallel_files']} files at a time")
+    if best_diarization:
+        print(f"  Diarization: {best_diarization['runtime']}, {best_diarization['num_threads']} threads "
+              f"(RTF {best_diarization['rtf']:.3f})")
+    return profile
 
-    print("✅ Transcription complete!")
 
+# =========================
+# CLI
+# =========================
 
 def main():
     """
@@ -174,15 +2176,71 @@ def main():
     Transcribes audio files using Whisper and identifies speakers using pyannote.
 
     Command line arguments:
-        --audio, -i: Path to input audio file (required)
-        --output, -o: Path to output transcript file (required)
+        --audio, -i: Input audio file(s) or glob pattern(s) (required)
+        --output, -o: Output transcript file (single audio file)
+        --outdir: Output directory for several audio files (batch mode)
+        --parallel-files: Batch mode files processed at the same time
         --model: Whisper model size (default: medium)
         --device: Device to use - cpu or cuda (default: cpu)
-        --compute-type: Compute type (default: int8)
+        --compute-type: Compute type (default: int8 or tuned profile)
+        --beam-size: Beam search width (default: 5 or tuned profile)
+        --draft-model: Publish a draft made with this small model first, then refine
+        --redecode-model: Re-decode low-confidence segments with a bigger model
+        --redecode-logprob, --redecode-no-speech, --redecode-compression:
+            Re-decode thresholds
+        --no-loop-guard: Keep Whisper's repetition loops instead of cutting them short
+        --attribution: Speaker attribution mode (default: start)
+        --jsonl: Also write a structured per-segment JSONL sidecar
+        --word-timestamps: Save word timings to <output>.words.npz
+        --speakers: Name speakers after reference clips in this registry directory
+        --speaker-threshold: Minimum cosine similarity to use a name (default: 0.5)
+        --streaming: Write segments to an on-disk journal as they are decoded
+        --concurrent: Run transcription and diarization in parallel processes
+        --asr-threads: Whisper CPU threads
+        --diarization-threads: Torch threads for diarization
+        --diarization-window: Diarize in windows of this many seconds (bounded memory)
+        --diarization-workers: Windows diarized in parallel processes
+        --diarization-runtime: torch, onnx or onnx-int8 (default: torch)
+        --no-audio-cache: Let each stage decode the audio file itself
+        --chunk-workers: Decode silence-aligned chunks in N worker processes
+        --batched: Use batched inference
+        --batch-size: Batch size for batched inference (default: 16)
+        --compare-modes: Print sequential vs. batched RTF on a sample first
+        --vad: Remove non-speech before decoding and diarization
+        --vad-threshold, --vad-min-speech-ms, --vad-min-silence-ms,
+        --vad-speech-pad-ms: VAD tuning
+        --resume: Continue an interrupted run from its checkpoint
+        --cache-dir: Result cache directory
+        --cache-size: Result cache size limit in GB
+        --no-cache: Do not read or write the result cache
+        --serve: Run as a daemon keeping models loaded
+        --socket: Daemon Unix socket path
+        --no-daemon: Never submit to a running daemon
+        --job-status, --cancel-job, --list-jobs: Query or cancel daemon jobs
+        --live: Transcribe a growing file or an ffmpeg pipe on stdin (--audio -)
+        --live-replay: Replay a finished file at real-time speed in live mode
+        --live-window: Live mode Whisper window in seconds (default: 30)
+        --model-dir: Offline model bundle, no network access or HF_TOKEN needed
+        --bundle-models: Download the models into --model-dir and exit
+        --no-diarize: Transcribe only, without loading torch
+        --autotune: Benchmark settings on a sample of --audio and save a tuned profile
+        --autotune-seconds: Length of the autotune sample (default: 60)
+        --no-profile: Ignore the tuned profile of this host
+
+    When a daemon is listening on --socket, transcription jobs are submitted
+    to it and the client waits for the result; otherwise they run locally.
+
+    Compute type, beam size, thread counts and --parallel-files that are not
+    given on the command line come from the profile saved by --autotune for
+    this host, model and device, if there is one.
 
     Environment variables:
         HF_TOKEN: HuggingFace token (required for speaker diarization)
         WHISPER_MODEL: Override default Whisper model size
+        TRANSCRIBER_CACHE_DIR: Override default result cache directory
+        TRANSCRIBER_SOCKET: Override default daemon socket path
+        TRANSCRIBER_SPEAKERS: Default speaker registry directory
+        TRANSCRIBER_MODEL_DIR: Default offline model bundle
     """
     parser = argparse.ArgumentParser(
         description="Transcribe audio with speaker diarization",
@@ -198,24 +2256,68 @@ Examples:
   # Using GPU
   python transcribe.py -i audio.wav -o output.txt --device cuda --compute-type float16
 
+  # Backfill an archive, loading models once (resumable via outdir/manifest.json)
+  python transcribe.py -i "archive/*.opus" --outdir transcripts/
+
+  # Draft with tiny within minutes, replaced by the large-v3 transcript when done
+  python transcribe.py -i audio.opus -o output.txt --model large-v3 --draft-model tiny
+
+  # Fast model everywhere, large-v3 only where medium is unsure
+  python transcribe.py -i audio.opus -o output.txt --model medium --redecode-model large-v3
+
+  # Transcribe a meeting while it is being recorded
+  ffmpeg -i rtsp://camera/stream -f ogg - | python transcribe.py --live -i - -o live.txt
+
+  # Try live mode on a finished recording, replayed at real-time speed
+  python transcribe.py --live-replay -i audio.opus -o live.txt
+
+  # Label council members by name instead of SPEAKER_00 (voices/Jan_Novak.opus, ...)
+  python transcribe.py -i audio.opus -o output.txt --speakers voices/
+
+  # Download models once, then run without network access or HF_TOKEN
+  python transcribe.py --bundle-models --model-dir models/ --model large-v3
+  python transcribe.py -i audio.opus -o output.txt --model large-v3 --model-dir models/
+
+  # Tune compute type, beam size and threads for this host (once)
+  python transcribe.py --autotune -i sample.opus
+
+  # Keep models loaded in a daemon; later invocations submit jobs to it
+  python transcribe.py --serve &
+  python transcribe.py -i audio.opus -o output.txt
+
 Environment variables:
-  HF_TOKEN         HuggingFace API token (required)
-  WHISPER_MODEL    Default Whisper model size
+  HF_TOKEN               HuggingFace API token (required locally and for --serve)
+  WHISPER_MODEL          Default Whisper model size
+  TRANSCRIBER_CACHE_DIR  Default result cache directory
+  TRANSCRIBER_SOCKET     Default daemon socket path
+  TRANSCRIBER_SPEAKERS   Default speaker registry directory
+  TRANSCRIBER_MODEL_DIR  Default offline model bundle
         """
     )
 
     parser.add_argument(
         "--audio", "-i",
         type=Path,
-        required=True,
-        help="Input audio file path"
+        nargs="+",
+        help="Input audio file path(s) or glob pattern(s); several files need --outdir"
     )
 
     parser.add_argument(
         "--output", "-o",
         type=Path,
-        required=True,
-        help="Output transcript file path"
+        help="Output transcript file path (single audio file)"
+    )
+
+    parser.add_argument(
+        "--outdir",
+        type=Path,
+        help="Output directory for batch mode: one <audio stem>.txt per file plus manifest.json"
+    )
+
+    parser.add_argument(
+        "--parallel-files",
+        type=int,
+        help="Batch mode: number of files transcribed at the same time (default: 1 or tuned profile)"
     )
 
     parser.add_argument(
@@ -237,28 +2339,560 @@ Environment variables:
     parser.add_argument(
         "--compute-type",
         type=str,
-        default=DEFAULT_COMPUTE_TYPE,
         choices=["int8", "float16", "float32"],
-        help=f"Compute type (default: {DEFAULT_COMPUTE_TYPE})"
+        help=f"Compute type (default: {DEFAULT_COMPUTE_TYPE} or tuned profile)"
+    )
+
+    parser.add_argument(
+        "--beam-size",
+        type=int,
+        help=f"Beam search width, 1 = greedy (default: {DEFAULT_BEAM_SIZE} or tuned profile)"
+    )
+
+    parser.add_argument(
+        "--draft-model",
+        type=str,
+        choices=["tiny", "base", "small"],
+        help="Two-pass mode: publish a draft transcript made with this model first, "
+             "then decode with --model and atomically replace it"
+    )
+
+    parser.add_argument(
+        "--redecode-model",
+        type=str,
+        choices=["small", "medium", "large-v2", "large-v3"],
+        help="Re-decode low-confidence segments with this bigger model and splice them in"
+    )
+
+    parser.add_argument(
+        "--redecode-logprob",
+        type=float,
+        default=DEFAULT_REDECODE_LOGPROB,
+        help=f"Re-decode segments with avg_logprob below this (default: {DEFAULT_REDECODE_LOGPROB})"
+    )
+
+    parser.add_argument(
+        "--redecode-no-speech",
+        type=float,
+        default=DEFAULT_REDECODE_NO_SPEECH,
+        help=f"Re-decode segments with no_speech_prob above this (default: {DEFAULT_REDECODE_NO_SPEECH})"
+    )
+
+    parser.add_argument(
+        "--redecode-compression",
+        type=float,
+        default=DEFAULT_REDECODE_COMPRESSION,
+        help=f"Re-decode segments with compression ratio above this (default: {DEFAULT_REDECODE_COMPRESSION})"
+    )
+
+    parser.add_argument(
+        "--no-loop-guard",
+        action="store_true",
+        help="Keep hallucination loops (the same text repeated segment after segment) instead of "
+             "dropping them and re-decoding or skipping the looping audio"
+    )
+
+    parser.add_argument(
+        "--attribution",
+        type=str,
+        default="start",
+        choices=ATTRIBUTION_MODES,
+        help="Speaker attribution: 'start' uses the turn at segment start, "
+             "'overlap' the speaker with the largest overlap (default: start)"
+    )
+
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Also write <output>.segments.jsonl: one JSON line per segment with float "
+             "times, speaker and confidence, text and decoder scores"
+    )
+
+    parser.add_argument(
+        "--word-timestamps",
+        action="store_true",
+        help="Decode word timings and save them as arrays in <output>.words.npz"
+    )
+
+    parser.add_argument(
+        "--speakers",
+        type=Path,
+        default=os.environ.get("TRANSCRIBER_SPEAKERS"),
+        help="Speaker registry directory of reference clips (<Name>.opus or <Name>/*.opus); "
+             "diarized speakers matching a registered voice are labeled with the name"
+    )
+
+    parser.add_argument(
+        "--speaker-threshold",
+        type=float,
+        default=DEFAULT_SPEAKER_THRESHOLD,
+        help=f"Minimum cosine similarity to a registered voice to use its name "
+             f"(default: {DEFAULT_SPEAKER_THRESHOLD})"
+    )
+
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Append segments to <output>.journal.jsonl as they are decoded "
+             "(bounded memory, partial results survive a crash)"
+    )
+
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Run Whisper and pyannote at the same time in separate worker processes"
+    )
+
+    parser.add_argument(
+        "--asr-threads",
+        type=int,
+        help="Whisper CPU threads (default: tuned profile or library default; in concurrent mode "
+             f"{int(DEFAULT_ASR_CPU_SHARE * 100)}%% of CPUs)"
+    )
+
+    parser.add_argument(
+        "--diarization-threads",
+        type=int,
+        help="Torch threads for diarization (default: tuned profile or library default; in "
+             "concurrent mode the CPUs not given to Whisper)"
+    )
+
+    parser.add_argument(
+        "--diarization-window",
+        type=int,
+        default=0,
+        metavar="SECONDS",
+        help="Diarize in overlapping windows of about SECONDS (e.g. 1200) and link speakers across "
+             "windows, so memory stays flat on multi-hour sessions (default: 0, whole recording)"
+    )
+
+    parser.add_argument(
+        "--diarization-workers",
+        type=int,
+        default=1,
+        help="Windowed diarization: windows diarized at the same time in worker processes (default: 1)"
+    )
+
+    parser.add_argument(
+        "--diarization-runtime",
+        type=str,
+        default="torch",
+        choices=DIARIZATION_RUNTIMES,
+        help="Run pyannote's segmentation model with torch, or exported to ONNX (optionally "
+             "int8-quantized) with onnxruntime; the speaker embedding stays on torch (default: torch)"
+    )
+
+    parser.add_argument(
+        "--no-audio-cache",
+        action="store_true",
+        help="Do not decode audio once into a cached PCM file next to the output; "
+             "each stage decodes the audio file itself"
+    )
+
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=0,
+        help="Split audio at silences and transcribe chunks in N worker processes; "
+             "--asr-threads is divided between them (default: 0, sequential)"
+    )
+
+    parser.add_argument(
+        "--batched",
+        action="store_true",
+        help="Use faster-whisper batched inference over VAD-delimited windows"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Batch size for --batched (default: {DEFAULT_BATCH_SIZE})"
+    )
+
+    parser.add_argument(
+        "--compare-modes",
+        type=int,
+        default=0,
+        metavar="SECONDS",
+        help="Before the run, decode SECONDS of audio sequentially and batched "
+             "and print both real-time factors"
+    )
+
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Remove silence and non-speech before decoding and diarization"
+    )
+
+    parser.add_argument(
+        "--vad-threshold",
+        type=float,
+        default=DEFAULT_VAD_THRESHOLD,
+        help=f"VAD speech probability threshold (default: {DEFAULT_VAD_THRESHOLD})"
+    )
+
+    parser.add_argument(
+        "--vad-min-speech-ms",
+        type=int,
+        default=DEFAULT_VAD_MIN_SPEECH_MS,
+        help=f"Drop speech shorter than this (default: {DEFAULT_VAD_MIN_SPEECH_MS})"
+    )
+
+    parser.add_argument(
+        "--vad-min-silence-ms",
+        type=int,
+        default=DEFAULT_VAD_MIN_SILENCE_MS,
+        help=f"Only cut silences at least this long (default: {DEFAULT_VAD_MIN_SILENCE_MS})"
+    )
+
+    parser.add_argument(
+        "--vad-speech-pad-ms",
+        type=int,
+        default=DEFAULT_VAD_SPEECH_PAD_MS,
+        help=f"Padding kept around speech (default: {DEFAULT_VAD_SPEECH_PAD_MS})"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from <output>.checkpoint.json and the "
+             "segment journal (implies --streaming)"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Result cache directory (default: {DEFAULT_CACHE_DIR})"
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=DEFAULT_CACHE_SIZE_GB,
+        help=f"Result cache size limit in GB (default: {DEFAULT_CACHE_SIZE_GB})"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the transcription/diarization result cache"
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a daemon that keeps models loaded and accepts jobs on --socket"
+    )
+
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=DEFAULT_DAEMON_SOCKET,
+        help=f"Daemon Unix socket (default: {DEFAULT_DAEMON_SOCKET})"
+    )
+
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Run locally even if a daemon is listening on --socket"
+    )
+
+    parser.add_argument(
+        "--job-status",
+        metavar="JOB_ID",
+        help="Print status of a daemon job"
+    )
+
+    parser.add_argument(
+        "--cancel-job",
+        metavar="JOB_ID",
+        help="Cancel a queued or running daemon job"
+    )
+
+    parser.add_argument(
+        "--list-jobs",
+        action="store_true",
+        help="List daemon jobs"
+    )
+
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Transcribe a recording while it grows: follow the --audio file, or read an ffmpeg pipe "
+             "on stdin with --audio -, and append segments to --output as speakers are known"
+    )
+
+    parser.add_argument(
+        "--live-replay",
+        action="store_true",
+        help="Live mode: replay a finished --audio file at real-time speed (for testing)"
+    )
+
+    parser.add_argument(
+        "--live-window",
+        type=int,
+        default=LIVE_WINDOW,
+        help=f"Live mode: seconds of audio per Whisper window (default: {LIVE_WINDOW})"
+    )
+
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        default=os.environ.get("TRANSCRIBER_MODEL_DIR"),
+        help="Offline model bundle made by --bundle-models; models load from it without network "
+             "access or HF_TOKEN"
+    )
+
+    parser.add_argument(
+        "--bundle-models",
+        action="store_true",
+        help="Download --model (and --draft-model, --redecode-model) and the pyannote models into "
+             "--model-dir, then exit"
+    )
+
+    parser.add_argument(
+        "--no-diarize",
+        action="store_true",
+        help="Skip speaker diarization: segments are labeled UNKNOWN, torch is never loaded and no "
+             "HF_TOKEN is needed"
+    )
+
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        help="Benchmark compute types, beam sizes and thread counts on a sample of --audio "
+             "and save the fastest as this host's profile in --cache-dir"
+    )
+
+    parser.add_argument(
+        "--autotune-seconds",
+        type=int,
+        default=AUTOTUNE_SAMPLE_SECONDS,
+        help=f"Length of the autotune sample in seconds (default: {AUTOTUNE_SAMPLE_SECONDS})"
+    )
+
+    parser.add_argument(
+        "--no-profile",
+        action="store_true",
+        help="Ignore the tuned profile saved by --autotune"
     )
 
     args = parser.parse_args()
 
     # Get HuggingFace token from environment
     hf_token = os.environ.get("HF_TOKEN")
-    if not hf_token:
-        parser.error("HF_TOKEN environment variable is required. Get your token at https://huggingface.co/settings/tokens")
+    token_error = "HF_TOKEN environment variable is required. Get your token at https://huggingface.co/settings/tokens"
+
+    if args.bundle_models:
+        if not args.model_dir:
+            parser.error("--bundle-models needs --model-dir")
+        if not hf_token:
+            parser.error(token_error)
+        whisper_models = [args.model] + [m for m in (args.draft_model, args.redecode_model) if m]
+        try:
+            bundle_models(args.model_dir, whisper_models, hf_token)
+        except Exception as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    # Worker processes and daemon jobs find the bundle through the environment
+    offline = args.model_dir is not None
+    if offline:
+        if not args.model_dir.is_dir():
+            parser.error(f"--model-dir not found: {args.model_dir}")
+        os.environ["TRANSCRIBER_MODEL_DIR"] = str(args.model_dir.resolve())
+        os.environ["HF_HUB_OFFLINE"] = "1"
+    if args.no_diarize and args.speakers:
+        parser.error("--speakers needs diarization, drop --no-diarize")
+    needs_token = not offline and not args.no_diarize
+
+    if args.autotune:
+        if not args.audio:
+            parser.error("--autotune needs a sample recording in --audio")
+        if not hf_token and not offline:
+            parser.error(token_error)
+        try:
+            audio_paths = _expand_audio_paths(args.audio)
+            autotune(audio_paths[0], args.model, args.device, hf_token, args.cache_dir, args.autotune_seconds,
+                     args.diarization_runtime)
+        except Exception as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    # Command line flags win over the tuned profile, which wins over defaults
+    profile = None if args.no_profile else _load_tuned_profile(args.cache_dir, args.model, args.device)
+    tuned = profile["whisper"] if profile else {}
+    if profile:
+        print(f"▶ Using tuned profile {profile['fingerprint']} (--no-profile to ignore)")
+    if args.compute_type is None:
+        args.compute_type = tuned.get("compute_type", DEFAULT_COMPUTE_TYPE)
+    if args.beam_size is None:
+        args.beam_size = tuned.get("beam_size", DEFAULT_BEAM_SIZE)
+    if args.parallel_files is None:
+        args.parallel_files = profile["parallel_files"] if profile else 1
+    # Tuned thread counts assume the whole host; concurrent and chunked modes split CPUs themselves
+    split = args.concurrent or args.chunk_workers
+    tuned_asr_threads = args.asr_threads is None and profile is not None and not split
+    if args.asr_threads is None:
+        args.asr_threads = tuned["cpu_threads"] if tuned_asr_threads else 0
+    if args.diarization_threads is None:
+        # Thread counts are tuned per diarization runtime
+        tuned_diarization = profile["diarization"] if profile else None
+        if tuned_diarization and tuned_diarization.get("runtime", "torch") != args.diarization_runtime:
+            tuned_diarization = None
+        args.diarization_threads = tuned_diarization["num_threads"] if tuned_diarization and not split else 0
+
+    # Daemon management
+    if args.serve:
+        if not hf_token and not offline:
+            parser.error(token_error)
+        _serve(args.socket, transcribe_audio, hf_token, args.model, args.device, args.compute_type, args.asr_threads)
+        return
+
+    if args.job_status or args.cancel_job or args.list_jobs:
+        if args.list_jobs:
+            request = {"action": "list"}
+        elif args.cancel_job:
+            request = {"action": "cancel", "job_id": args.cancel_job}
+        else:
+            request = {"action": "status", "job_id": args.job_status}
+        try:
+            response = _daemon_request(args.socket, request)
+        except OSError as e:
+            print(f"❌ Error: no daemon on {args.socket}: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+        sys.exit(0 if response.get("ok") else 1)
+
+    if not args.audio:
+        parser.error("--audio is required")
+
+    # Live mode runs locally; --audio may be "-" for stdin
+    if args.live or args.live_replay:
+        if not args.output:
+            parser.error("--output is required")
+        if args.no_diarize:
+            parser.error("Live mode needs diarization, drop --no-diarize")
+        if not hf_token and not offline:
+            parser.error(token_error)
+        try:
+            transcribe_live(args.audio[0], args.output, args.model, hf_token, device=args.device,
+                            compute_type=args.compute_type, replay=args.live_replay, cpu_threads=args.asr_threads,
+                            beam_size=args.beam_size, attribution=args.attribution, window=args.live_window,
+                            diarization_runtime=args.diarization_runtime,
+                            diarization_threads=args.diarization_threads, cache_dir=str(args.cache_dir))
+        except Exception as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        audio_paths = _expand_audio_paths(args.audio)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    batch = args.outdir is not None or len(audio_paths) > 1
+    if batch and not args.outdir:
+        parser.error("--outdir is required for several audio files")
+    if not batch and not args.output:
+        parser.error("--output is required")
+    if batch and tuned_asr_threads and args.parallel_files > 1:
+        # Files decoded side by side share the host, same split as the autotune worker trial
+        args.asr_threads = max(1, (os.cpu_count() or 1) // args.parallel_files)
+
+    vad_options = None
+    if args.vad:
+        vad_options = {
+            "threshold": args.vad_threshold,
+            "min_speech_duration_ms": args.vad_min_speech_ms,
+            "min_silence_duration_ms": args.vad_min_silence_ms,
+            "speech_pad_ms": args.vad_speech_pad_ms,
+        }
+
+    options = dict(
+        whisper_model=args.model,
+        device=args.device,
+        compute_type=args.compute_type,
+        beam_size=args.beam_size,
+        draft_model=args.draft_model,
+        redecode_model=args.redecode_model,
+        redecode_thresholds={
+            "avg_logprob": args.redecode_logprob,
+            "no_speech_prob": args.redecode_no_speech,
+            "compression_ratio": args.redecode_compression,
+        },
+        attribution=args.attribution,
+        segments_jsonl=args.jsonl,
+        word_timestamps=args.word_timestamps,
+        speaker_registry=str(args.speakers.resolve()) if args.speakers else None,
+        speaker_threshold=args.speaker_threshold,
+        diarization_window=args.diarization_window,
+        diarization_workers=args.diarization_workers,
+        diarization_runtime=args.diarization_runtime,
+        diarize=not args.no_diarize,
+        loop_guard=not args.no_loop_guard,
+        streaming=args.streaming,
+        concurrent=args.concurrent,
+        asr_threads=args.asr_threads,
+        diarization_threads=args.diarization_threads,
+        audio_cache=not args.no_audio_cache,
+        chunk_workers=args.chunk_workers,
+        batch_size=args.batch_size if args.batched else 0,
+        compare_seconds=args.compare_modes,
+        vad_options=vad_options,
+        resume=args.resume,
+        cache_dir=None if args.no_cache else str(args.cache_dir),
+        cache_size_gb=args.cache_size
+    )
+
+    # Batch mode runs locally, loading models once for all files
+    if batch:
+        if not hf_token and needs_token:
+            parser.error(token_error)
+        try:
+            transcribe_batch(audio_paths, args.outdir, hf_token, parallel_files=args.parallel_files, **options)
+        except Exception as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    # Absolute paths, since a daemon may run in another working directory
+    options.update(audio_path=str(audio_paths[0]), output_path=str(args.output.resolve()), started_at=_STARTED_AT)
+
+    # Submit to a running daemon if there is one
+    if not args.no_daemon:
+        try:
+            response = _daemon_request(args.socket, {"action": "submit", "options": options})
+        except OSError:
+            response = None
+        if response is not None:
+            if not response.get("ok"):
+                print(f"❌ Error: {response.get('error')}", file=sys.stderr)
+                sys.exit(1)
+            job_id = response["job"]["id"]
+            print(f"▶ Submitted job {job_id} to daemon on {args.socket}")
+            try:
+                job = _wait_for_job(args.socket, job_id)
+            except KeyboardInterrupt:
+                _daemon_request(args.socket, {"action": "cancel", "job_id": job_id})
+                print(f"▶ Cancelled job {job_id}")
+                sys.exit(1)
+            if job["state"] != "done":
+                detail = f": {job['error']}" if job["error"] else ""
+                print(f"❌ Error: job {job_id} {job['state']}{detail}", file=sys.stderr)
+                sys.exit(1)
+            print("✅ Transcription complete!")
+            return
+
+    if not hf_token and needs_token:
+        parser.error(token_error)
 
     # Run transcription
     try:
-        transcribe_audio(
-            audio_path=args.audio,
-            output_path=args.output,
-            whisper_model=args.model,
-            hf_token=hf_token,
-            device=args.device,
-            compute_type=args.compute_type
-        )
+        transcribe_audio(**options, hf_token=hf_token)
     except Exception as e:
         print(f"❌ Error: {e}", file=sys.stderr)
         sys.exit(1)